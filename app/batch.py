@@ -0,0 +1,62 @@
+# app/batch.py
+"""Generate plans for a whole cohort without going through HTTP.
+
+    python -m app.batch requests.jsonl [-o plans.jsonl] [--concurrency 8]
+
+Input is a JSON array or JSON lines of PlanRequest objects ({"goal": ..., "profile": {...}}).
+Output is NDJSON, the same events /plan/batch streams, in completion order.
+"""
+import argparse, asyncio, json, sys, time
+from typing import List
+
+from app.config import PLAN_BATCH_CONCURRENCY
+from app.rag.cache import normalize_key
+from app.schemas import PlanRequest, enrich_goal, profile_dict
+
+
+def read_requests(path: str) -> List[PlanRequest]:
+    with (sys.stdin if path == "-" else open(path, "r", encoding="utf-8")) as f:
+        raw = f.read().strip()
+    rows = json.loads(raw) if raw.startswith("[") else [json.loads(line) for line in raw.splitlines() if line.strip()]
+    return [PlanRequest(**row) for row in rows]
+
+
+async def run(requests: List[PlanRequest], out, concurrency: int) -> None:
+    from app.rag.pipeline import get_planner
+
+    planner = get_planner()
+    t0 = time.perf_counter()
+    items = [(enrich_goal(r), profile_dict(r)) for r in requests]
+    n_ok = n_err = 0
+    async for event in planner.abatch_plan(items, concurrency):
+        if event["type"] == "plan":
+            n_ok += 1
+        else:
+            n_err += 1
+        out.write(json.dumps(event) + "\n")
+        out.flush()
+    elapsed = time.perf_counter() - t0
+    print(
+        f"[batch] {n_ok} plans, {n_err} errors, {len({normalize_key(g) for g, _ in items})} unique goals "
+        f"in {elapsed:.1f}s ({len(items) / max(elapsed, 1e-9):.2f} req/s)",
+        file=sys.stderr,
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Batch plan generation")
+    ap.add_argument("input", help="JSON array or JSONL of PlanRequest objects ('-' for stdin)")
+    ap.add_argument("-o", "--output", default="-", help="NDJSON output file (default stdout)")
+    ap.add_argument("--concurrency", type=int, default=PLAN_BATCH_CONCURRENCY)
+    args = ap.parse_args()
+
+    requests = read_requests(args.input)
+    if args.output == "-":
+        asyncio.run(run(requests, sys.stdout, args.concurrency))
+    else:
+        with open(args.output, "w", encoding="utf-8") as out:
+            asyncio.run(run(requests, out, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,15 @@ load_dotenv()
 
 # === OpenAI ===
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  # expects sk-proj-... or sk-live-...
-if not OPENAI_API_KEY:
-    raise RuntimeError("OPENAI_API_KEY is not set in environment/.env")
+# OpenAI-compatible endpoint for chat + embeddings (e.g. benchmarks/fake_openai.py); unset → api.openai.com
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+def require_openai_key() -> str:
+    """The API key, or RuntimeError. Checked when the planner is built, not at import,
+    so tests, /health and tooling can import the app without one."""
+    if not OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY is not set in environment/.env")
+    return OPENAI_API_KEY
 
 # Models (safe, inexpensive defaults)
 CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4o-mini")
@@ -16,9 +23,69 @@ EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
 
 # === Retrieval / Storage ===
 TOP_K = int(os.getenv("TOP_K", "4"))
+# Upper bound on candidates fetched while looking for TOP_K clean snippets
+RETRIEVE_MAX_FETCH_K = int(os.getenv("RETRIEVE_MAX_FETCH_K", "256"))
+# "hybrid" (BM25 + vector, reciprocal rank fusion), "vector", or "lexical" (BM25 only, no query embedding)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Query embeddings slower than this fail over to lexical-only retrieval (when the BM25 index exists)
+EMBED_QUERY_TIMEOUT_S = float(os.getenv("EMBED_QUERY_TIMEOUT_S", "10"))
+# After this many query-embedding failures in a row, skip embedding (lexical-only) for EMBED_BREAKER_COOLDOWN_S
+EMBED_BREAKER_FAILURES = int(os.getenv("EMBED_BREAKER_FAILURES", "3"))
+EMBED_BREAKER_COOLDOWN_S = float(os.getenv("EMBED_BREAKER_COOLDOWN_S", "30"))
 CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", ".chroma_store")
+# Reindexing builds a new version under CHROMA_PERSIST_DIR/versions; this many previous ones are kept for rollback
+# (the version a reindex replaces is always kept)
+INDEX_KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "2"))
+# "chroma" (LangChain Chroma) or "numpy" (in-process float32 matrix, see app/rag/vectorstore.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+# numpy backend only: approximate HNSW search (needs hnswlib) once the corpus has this many chunks
+VECTOR_ANN = os.getenv("VECTOR_ANN", "0").lower() in ("1", "true", "yes")
+VECTOR_ANN_MIN_ROWS = int(os.getenv("VECTOR_ANN_MIN_ROWS", "20000"))
+
+# === Embedding cache (shared by ingest and queries) ===
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", ".embed_cache.sqlite3")
+EMBED_CACHE_LRU = int(os.getenv("EMBED_CACHE_LRU", "10000"))
+
+# === Plan response cache ===
+PLAN_CACHE_TTL_S = float(os.getenv("PLAN_CACHE_TTL_S", "3600"))
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "1024"))
+PLAN_CACHE_SIM_THRESHOLD = float(os.getenv("PLAN_CACHE_SIM_THRESHOLD", "0.95"))
+
+# === Batch planning (/plan/batch, python -m app.batch) ===
+# Plans generated concurrently (each is two chat completions); requests beyond BATCH_MAX are rejected
+PLAN_BATCH_CONCURRENCY = int(os.getenv("PLAN_BATCH_CONCURRENCY", "8"))
+PLAN_BATCH_MAX = int(os.getenv("PLAN_BATCH_MAX", "1000"))
+
+# === Startup ===
+# Building the planner (OpenAI clients, vector store, BM25 index) on app startup:
+# "background" (serve /health at once, /ready flips when done), "blocking", or "off" (first request)
+PLANNER_WARMUP = os.getenv("PLANNER_WARMUP", "background").lower()
+
+# === Metrics (GET /metrics) ===
+# 0 turns every record call into an early return and skips the HTTP middleware
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+
+# === Ingestion ===
+# Processes used to parse corpus files (0 = one per CPU, 1 = parse inline)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0"))
+# Loaded sources held between the load and split stages (bounds ingest memory)
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+# Near-duplicate chunks (MinHash estimate of shingle Jaccard >= threshold) are not embedded; 0 disables
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.85"))
+NEAR_DUP_NUM_PERM = int(os.getenv("NEAR_DUP_NUM_PERM", "128"))
+# urls.txt fetching: concurrent workers, per-host request rate, conditional-GET cache
+URL_FETCH_WORKERS = int(os.getenv("URL_FETCH_WORKERS", "8"))
+URL_FETCH_PER_HOST_RPS = float(os.getenv("URL_FETCH_PER_HOST_RPS", "2"))
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", ".http_cache")
+# Embedding stage: inputs and tokens per request, requests in flight, retries on 429/5xx
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "100000"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
 
 # Project roots
 ROOT_DIR = Path(__file__).resolve().parents[1]
-DATA_DIR = ROOT_DIR / "app" / "data"
+# Corpus + recipes.json (benchmarks point this at a generated corpus)
+DATA_DIR = Path(os.getenv("DATA_DIR") or ROOT_DIR / "app" / "data")
 DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -1,11 +1,34 @@
-import os, re
-from langchain_community.vectorstores import Chroma
+import hashlib, json, logging, os, random, re, time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
-from app.config import CHROMA_PERSIST_DIR, EMBED_MODEL, DATA_DIR
-from app.ingest.loaders import load_folder, load_urls
+from langchain_core.documents import Document
+from app import metrics
+from app.config import (
+    EMBED_MODEL, DATA_DIR, INGEST_WORKERS,
+    EMBED_BATCH_SIZE, EMBED_BATCH_TOKENS, EMBED_CONCURRENCY, EMBED_MAX_RETRIES, VECTOR_BACKEND,
+    HTTP_CACHE_DIR, URL_FETCH_WORKERS, URL_FETCH_PER_HOST_RPS, INGEST_QUEUE_SIZE,
+    NEAR_DUP_THRESHOLD, NEAR_DUP_NUM_PERM,
+)
+from app.ingest.fetch import UrlFetcher
+from app.ingest.near_dup import NEAR_DUP_FILE, MinHashLSH
+from app.rag.embedding_store import embedding_store, get_embeddings
+from app.rag.index_versions import active_dir
+from app.rag.lexical import LEXICAL_SUBDIR, LexicalIndex
+from app.rag.quality import quality_flags
+from app.rag.text_filter import AD_CHUNKS, count_alpha
+from app.rag.vectorstore import open_vector_store
+from app.ingest.loaders import hash_file, html_to_text, iter_urls, list_corpus_files, load_files
+from app.ingest.streaming import iter_batches, prefetch
+
+logger = logging.getLogger(__name__)
 
 URLS_FILE = "urls.txt"  # optional file in app/data
+MANIFEST_FILE = "ingest_manifest.json"  # stored inside the index directory
+MANIFEST_VERSION = 3  # 2: chunks carry quality metadata (see enrich_chunks); 3: sources named relative to DATA_DIR
+UPSERT_ROWS = 4096  # embedded chunks buffered per store.upsert (NumpyBackend copies its matrix per call)
+
+EmbedFn = Callable[[List[str]], List[List[float]]]
 
 _WS = re.compile(r"\s+")
 _URL = re.compile(r"https?://\S+")
@@ -18,64 +41,407 @@ def _norm_sig(s: str) -> str:
     s = _NONALNUM.sub(" ", s)
     return s.strip()
 
-AD_TOKENS = {"myplate", "available at", "subscribe", "sign up", "cookie", "privacy policy", "newsletter", "back to top", "sponsored"}
-
 def _bad_chunk(txt: str) -> bool:
     low = txt.lower()
     if len(low) < 250:
         return True
     if low.count("http") >= 2:
         return True
-    letters = sum(c.isalpha() for c in low)
-    if letters < 100:
+    if AD_CHUNKS.search(low):
         return True
-    if any(t in low for t in AD_TOKENS):
+    return count_alpha(low) < 100
+
+def enrich_chunks(chunks: Sequence[Document]) -> None:
+    """Add clipped_text / is_boilerplate / is_case_study to each chunk's metadata, in place."""
+    for c in chunks:
+        c.metadata = {**(c.metadata or {}), **quality_flags(c.page_content)}
+
+def _chunk_id(c: Document) -> str:
+    """Content hash of a chunk; identical to the dedup signature, so one id per unique chunk."""
+    m = c.metadata or {}
+    sig = f"{m.get('source')}\x1f{m.get('page')}\x1f{_norm_sig(c.page_content)[:400]}"
+    return hashlib.sha1(sig.encode("utf-8", "ignore")).hexdigest()
+
+# --- Embedding stage ---
+
+def _token_counter() -> Callable[[str], int]:
+    """tiktoken length for EMBED_MODEL; falls back to ~4 chars/token if the encoding can't be loaded."""
+    try:
+        import tiktoken
+        try:
+            enc = tiktoken.encoding_for_model(EMBED_MODEL)
+        except KeyError:
+            enc = tiktoken.get_encoding("cl100k_base")
+        return lambda t: len(enc.encode(t, disallowed_special=()))
+    except Exception:
+        return lambda t: len(t) // 4 + 1
+
+def _is_retryable(e: Exception) -> bool:
+    status = getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+    if status in (408, 409, 429) or (isinstance(status, int) and status >= 500):
         return True
-    return False
+    return type(e).__name__ in {"RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError", "Timeout", "ConnectionError"}
 
-def build_index():
-    base_dir = os.fspath(DATA_DIR)
-    print(f"[ingest] corpus dir: {base_dir}")
+def _retry_after(e: Exception) -> Optional[float]:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def _embed_with_backoff(embed_fn: EmbedFn, texts: List[str], max_retries: int = EMBED_MAX_RETRIES) -> List[List[float]]:
+    delay = 1.0
+    for attempt in range(max_retries + 1):
+        try:
+            return embed_fn(texts)
+        except Exception as e:
+            if attempt == max_retries or not _is_retryable(e):
+                raise
+            wait = _retry_after(e) or delay * (1 + random.random())
+            print(f"[ingest] embed batch of {len(texts)} failed ({type(e).__name__}); retrying in {wait:.1f}s")
+            time.sleep(wait)
+            delay = min(delay * 2, 60.0)
+    raise RuntimeError("unreachable")
+
+def embed_and_upsert(
+    chunks: Iterable[Tuple[str, Document]],
+    store: Any,
+    embed_fn: EmbedFn,
+    batch_size: int = EMBED_BATCH_SIZE,
+    batch_tokens: int = EMBED_BATCH_TOKENS,
+    concurrency: int = EMBED_CONCURRENCY,
+    count_tokens: Optional[Callable[[str], int]] = None,
+) -> int:
+    """Embed a stream of (id, chunk) in token-aware batches and upsert them as they finish.
 
-    docs = load_folder(base_dir)
+    At most `concurrency` batches are in flight, and finished vectors are buffered
+    only up to UPSERT_ROWS before being written. Memory therefore doesn't grow with
+    the stream, and embedding runs while upstream stages are still parsing.
+    `embed_fn` is e.g. the cached OpenAIEmbeddings.embed_documents, so every
+    finished batch also lands in the embedding store. A rerun after a crash
+    re-embeds nothing that already succeeded. Returns the number of chunks upserted.
+    """
+    count_tokens = count_tokens or _token_counter()
+    concurrency = max(1, concurrency)
+    buf: List[Tuple[List[Tuple[str, Document]], List[List[float]]]] = []
+    buffered = upserted = n_batches = 0
+    t0 = time.time()
 
+    def flush() -> None:
+        nonlocal buffered, upserted
+        if not buf:
+            return
+        rows = [row for batch, _ in buf for row in batch]
+        vectors = [v for _, vecs in buf for v in vecs]
+        store.upsert([cid for cid, _ in rows], vectors, [c.page_content for _, c in rows], [c.metadata for _, c in rows])
+        upserted += len(rows)
+        buf.clear()
+        buffered = 0
+
+    def run(batch: List[Tuple[str, Document]]) -> Tuple[List[Tuple[str, Document]], List[List[float]]]:
+        with metrics.timed(metrics.INGEST_SECONDS, phase="embed_batch"):
+            return batch, _embed_with_backoff(embed_fn, [c.page_content for _, c in batch])
+
+    def collect(done: Iterable[Future]) -> None:
+        nonlocal buffered
+        for fut in done:
+            batch, vectors = fut.result()
+            metrics.INGEST_CHUNKS.inc(len(batch), stage="embedded")
+            buf.append((batch, vectors))
+            buffered += len(batch)
+        if buffered >= UPSERT_ROWS:
+            flush()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        in_flight: Set[Future] = set()
+        for batch in iter_batches(chunks, lambda row: row[1].page_content, batch_size, batch_tokens, count_tokens):
+            in_flight.add(pool.submit(run, batch))
+            n_batches += 1
+            if len(in_flight) >= concurrency:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(wait(in_flight).done)
+    flush()
+
+    elapsed = time.time() - t0
+    if upserted:
+        print(f"[ingest] embedded {upserted} chunks in {n_batches} batches, {elapsed:.1f}s ({upserted / max(elapsed, 1e-9):.1f} chunks/s)")
+    return upserted
+
+def _load_manifest(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_manifest(path: str, manifest: Dict[str, Any]) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+def _scan_files(base_dir: str, old: Dict[str, Any], sources: Dict[str, Any]) -> List[str]:
+    """Fill `sources` with a manifest entry per corpus file; returns the paths that need parsing.
+
+    Unchanged files are detected by (mtime, size) first and by sha1 if those
+    differ, and are never parsed.
+    """
+    to_parse: List[str] = []
+    for path in list_corpus_files(base_dir):
+        key = os.path.relpath(path, base_dir)
+        st = os.stat(path)
+        prev = old.get(key)
+        if prev and prev.get("mtime") == st.st_mtime and prev.get("size") == st.st_size:
+            sources[key] = prev
+            continue
+        sha = hash_file(path)
+        if prev and prev.get("sha") == sha:
+            sources[key] = {**prev, "mtime": st.st_mtime, "size": st.st_size}
+            continue
+        sources[key] = {"mtime": st.st_mtime, "size": st.st_size, "sha": sha, "chunk_ids": []}
+        to_parse.append(path)
+    return to_parse
+
+def _read_urls(base_dir: str) -> List[str]:
+    """URLs listed in app/data/urls.txt (blank lines and # comments skipped)."""
     urls_path = os.path.join(base_dir, URLS_FILE)
-    if os.path.exists(urls_path):
-        with open(urls_path, "r", encoding="utf-8") as f:
-            url_docs = load_urls(f.readlines())
-            docs.extend(url_docs)
-            print(f"[ingest] loaded {len(url_docs)} docs from URLs")
+    if not os.path.exists(urls_path):
+        return []
+    with open(urls_path, "r", encoding="utf-8") as f:
+        return [u for u in (line.strip() for line in f) if u and not u.startswith("#")]
 
-    if not docs:
-        raise SystemExit("No supported documents found. Add PDFs, DOCX, MD/HTML/TXT, or URLs.")
+def _iter_changed(base_dir: str, paths: List[str], urls: List[str], old: Dict[str, Any], sources: Dict[str, Any],
+                  force: bool = False) -> Iterator[Tuple[str, List[Document]]]:
+    """Load stage: yield (source key, documents) for every file in `paths`, then every changed URL.
 
+    URLs are only known once fetched, so their manifest entries are added to
+    `sources` here, and pages whose sha1 matches `old` are skipped (unless `force`).
+    Files that fail to parse keep their `old` entry.
+    """
+    for path, docs in load_files(paths, INGEST_WORKERS, base_dir=base_dir):
+        key = os.path.relpath(path, base_dir)
+        if docs is None:
+            # Keep the source's previous chunks and manifest entry; its new sha isn't recorded, so the next run retries
+            prev = old.get(key)
+            if prev is not None:
+                sources[key] = prev
+            else:
+                sources.pop(key, None)
+            logger.warning("could not parse %s; keeping its %d indexed chunks until it parses",
+                           key, len(prev.get("chunk_ids", [])) if prev else 0)
+            continue
+        yield key, docs
+
+    if not urls:
+        return
+    fetcher = UrlFetcher(
+        parse=html_to_text,
+        cache_dir=HTTP_CACHE_DIR,
+        workers=URL_FETCH_WORKERS,
+        per_host_rps=URL_FETCH_PER_HOST_RPS,
+    )
+    for d in iter_urls(urls, fetcher):
+        key = d.metadata["source"]
+        sha = hashlib.sha1(d.page_content.encode("utf-8", "ignore")).hexdigest()
+        prev = old.get(key)
+        if prev and prev.get("sha") == sha and not force:
+            sources[key] = prev
+            continue
+        sources[key] = {"mtime": None, "size": len(d.page_content), "sha": sha, "chunk_ids": []}
+        yield key, [d]
+
+def _open_near_dup(store: Any, persist_dir: str, old: Dict[str, Any]) -> MinHashLSH:
+    """The saved near-duplicate index if it covers exactly the stored chunks, else one rebuilt from the store."""
+    stored = {cid for entry in old.values() for cid in entry.get("chunk_ids", [])}
+    index = MinHashLSH.load(os.path.join(persist_dir, NEAR_DUP_FILE), NEAR_DUP_THRESHOLD, NEAR_DUP_NUM_PERM)
+    if index is not None and set(index.ids()) == stored:
+        return index
+    if not stored:
+        return MinHashLSH(NEAR_DUP_THRESHOLD, NEAR_DUP_NUM_PERM)
+    t = time.time()
+    ids, texts, _ = store.get_all()
+    keep = [i for i, cid in enumerate(ids) if cid in stored]
+    index = MinHashLSH.build([ids[i] for i in keep], [_norm_sig(texts[i]) for i in keep], NEAR_DUP_THRESHOLD, NEAR_DUP_NUM_PERM)
+    print(f"[ingest] near-dup index rebuilt from {len(index)} stored chunks in {time.time() - t:.1f}s")
+    return index
+
+def build_lexical_index(store: Any, persist_dir: str) -> None:
+    """Rebuild the BM25 index over every non-boilerplate chunk in the store (no embedding calls)."""
+    t = time.time()
+    ids, texts, metadatas = store.get_all()
+    keep = [i for i, m in enumerate(metadatas) if not m.get("is_boilerplate")]
+    index = LexicalIndex.build([ids[i] for i in keep], [texts[i] for i in keep])
+    index.save(os.path.join(persist_dir, LEXICAL_SUBDIR))
+    print(f"[ingest] lexical index: {len(keep)} chunks, {len(index.vocab)} terms in {time.time() - t:.1f}s")
+
+def build_index(full: bool = False, persist_dir: Optional[str] = None) -> None:
+    """Incrementally sync the vector store with app/data (and urls.txt).
+
+    A manifest next to the vector index records every source's mtime/size/sha1
+    and the content-hash ids of its chunks. Only chunks that are new are
+    embedded; chunks of changed or removed sources that no longer exist are
+    deleted. `full=True` (or a missing/incompatible manifest) rebuilds from scratch.
+
+    Writes into `persist_dir` (default: the active index directory, in place). The
+    server and CLI go through app/ingest/reindex.py instead, which builds a new
+    version directory and swaps it in.
+    """
+    persist_dir = persist_dir or active_dir()
+    t0 = time.time()
+    base_dir = os.fspath(DATA_DIR)
+    print(f"[ingest] corpus dir: {base_dir}")
+
+    os.makedirs(persist_dir, exist_ok=True)
+    manifest_path = os.path.join(persist_dir, MANIFEST_FILE)
+    manifest = {} if full else _load_manifest(manifest_path)
+    if (manifest.get("version") != MANIFEST_VERSION or manifest.get("embed_model") != EMBED_MODEL
+            or manifest.get("vector_backend", "chroma") != VECTOR_BACKEND):
+        manifest = {}
+    old: Dict[str, Any] = manifest.get("sources", {})
+
+    # Retries/backoff are handled per batch by embed_and_upsert; unchanged texts come from the embedding store
+    embeddings = get_embeddings(EMBED_MODEL, max_retries=0)
+    store = open_vector_store(embeddings, persist_dir=persist_dir)
+    if not old and store.count():
+        # Vectors without a manifest can't be diffed (and would be duplicated) → start clean
+        print(f"[ingest] no usable manifest; rebuilding the {store.name} index from scratch")
+        store.clear()
+
+    sources: Dict[str, Any] = {}
+    to_parse = _scan_files(base_dir, old, sources)
+    urls = _read_urls(base_dir)
     splitter = RecursiveCharacterTextSplitter(
     chunk_size=700,
     chunk_overlap=120,
     separators=["\n\n", "\n", ". ", "? ", "! ", "; ", "• ", " - "]
     )
+    near_dup = _open_near_dup(store, persist_dir, old) if NEAR_DUP_THRESHOLD > 0 else None
+    if near_dup is not None:
+        # Sources known to be gone can't be canonical for new chunks
+        live = set(sources) | set(urls)
+        near_dup.remove(cid for key, entry in old.items() if key not in live for cid in entry.get("chunk_ids", []))
+    changed: Set[str] = set()
+    n_chunks = n_added = n_deleted = n_near = n_cross = 0
 
-    chunks = splitter.split_documents(docs)
+    def new_chunks(stream: Iterator[Tuple[str, List[Document]]], prev_entries: Dict[str, Any]) -> Iterator[Tuple[str, Document]]:
+        """Split → quality filter → dedup, one source at a time; yields (id, chunk) for chunks not yet in the store.
 
-    # Deduplicate + quality filter
-    seen = set()
-    unique_chunks = []
-    for c in chunks:
-        if _bad_chunk(c.page_content or ""):
-            continue
-        m = c.metadata or {}
-        sig = (m.get("source"), m.get("page"), _norm_sig(c.page_content)[:400])
-        if sig in seen:
-            continue
-        seen.add(sig)
-        unique_chunks.append(c)
+        Exact duplicates share a chunk id; chunk ids hash the source, so those can only
+        come from the same source. Near-duplicates (any source) are recorded in the
+        source's manifest entry as {chunk id: canonical chunk id} and not embedded.
+        The canonical chunk is the one indexed first, and its source is the one cited.
+        """
+        nonlocal n_chunks, n_deleted, n_near, n_cross
+        for key, docs in stream:
+            changed.add(key)
+            prev_ids = set(prev_entries.get(key, {}).get("chunk_ids", []))
+            if near_dup is not None:
+                near_dup.remove(prev_ids)
+            ids: List[str] = []
+            dups: Dict[str, str] = {}
+            fresh: List[Document] = []
+            seen: Set[str] = set()
+            for c in splitter.split_documents(docs):
+                n_chunks += 1
+                if _bad_chunk(c.page_content or ""):
+                    continue
+                cid = _chunk_id(c)
+                if cid in seen:
+                    continue
+                seen.add(cid)
+                if near_dup is not None:
+                    sig = near_dup.signature(_norm_sig(c.page_content))
+                    hit = near_dup.query(sig)
+                    if hit is not None:
+                        dups[cid] = hit[0]
+                        n_near += 1
+                        n_cross += hit[0] not in seen
+                        continue
+                    near_dup.add(cid, sig)
+                ids.append(cid)
+                if cid not in prev_ids:
+                    fresh.append(c)
+            sources[key]["chunk_ids"] = ids
+            sources[key]["dups"] = dups
+            stale = list(prev_ids - set(ids))
+            if stale:
+                store.delete(stale)
+                n_deleted += len(stale)
+            enrich_chunks(fresh)
+            for c in fresh:
+                yield _chunk_id(c), c
+
+    # Stages run concurrently: loading on the prefetch thread (+ parse/fetch pools), splitting
+    # here, embedding on the embed pool. Each hand-off is bounded, so memory stays flat.
+    stream = prefetch(_iter_changed(base_dir, to_parse, urls, old, sources), INGEST_QUEUE_SIZE)
+    n_added = embed_and_upsert(new_chunks(stream, old), store, embeddings.embed_documents)
+    # Listed URLs only enter `sources` when fetched; one that failed this time (timeout, 5xx,
+    # rate limit) keeps its previous chunks. Only URLs dropped from urls.txt count as removed.
+    unfetched = [u for u in urls if u not in sources and u in old]
+    for u in unfetched:
+        sources[u] = old[u]
+    if unfetched:
+        logger.warning("%d listed URLs could not be fetched; keeping their indexed chunks: %s",
+                       len(unfetched), ", ".join(unfetched))
+    if not sources:
+        raise SystemExit("No supported documents found. Add PDFs, DOCX, MD/HTML/TXT, or URLs.")
 
-    print(f"[ingest] {len(docs)} base docs → {len(unique_chunks)} unique chunks (filtered from {len(chunks)})")
+    removed = [key for key in old if key not in sources]
+    stale = [cid for key in removed for cid in old[key].get("chunk_ids", [])]
+    if stale:
+        store.delete(stale)
+        n_deleted += len(stale)
+        if near_dup is not None:
+            near_dup.remove(stale)
 
-    embeddings = OpenAIEmbeddings(model=EMBED_MODEL)
-    vs = Chroma.from_documents(unique_chunks, embedding=embeddings, persist_directory=CHROMA_PERSIST_DIR)
-    vs.persist()
-    print(f"[ingest] ✅ index persisted at {CHROMA_PERSIST_DIR}")
+    # Sources whose near-duplicates point at chunks that were just deleted lost that
+    # text from the index; run them through again so it gets a new canonical chunk.
+    for _ in range(3):
+        live = {cid for entry in sources.values() for cid in entry["chunk_ids"]}
+        orphaned = {key: entry for key, entry in sources.items()
+                    if any(canonical not in live for canonical in entry.get("dups", {}).values())}
+        if not orphaned:
+            break
+        print(f"[ingest] near-dup: re-ingesting {len(orphaned)} sources whose canonical chunks were removed")
+        paths = [os.path.join(base_dir, key) for key, entry in orphaned.items() if entry.get("mtime") is not None]
+        stream = _iter_changed(base_dir, paths, [key for key, entry in orphaned.items() if entry.get("mtime") is None],
+                               orphaned, sources, force=True)
+        n_added += embed_and_upsert(new_chunks(stream, orphaned), store, embeddings.embed_documents)
+
+    print(
+        f"[ingest] sources: {len(sources) - len(changed)} unchanged, {len(changed)} new/changed, {len(removed)} removed; "
+        f"{n_chunks} chunks from changed sources"
+    )
+    metrics.INGEST_SOURCES.inc(len(sources) - len(changed), state="unchanged")
+    metrics.INGEST_SOURCES.inc(len(changed), state="changed")
+    metrics.INGEST_SOURCES.inc(len(removed), state="removed")
+    metrics.INGEST_CHUNKS.inc(n_chunks, stage="split")
+    if near_dup is not None:
+        print(f"[ingest] near-dup (threshold {NEAR_DUP_THRESHOLD}, {near_dup.bands}x{near_dup.rows} LSH): "
+              f"collapsed {n_near} chunks ({n_cross} from other sources) into their canonical chunks")
+        metrics.INGEST_CHUNKS.inc(n_near, stage="near_duplicate")
+
+    store.persist()
+    build_lexical_index(store, persist_dir)
+    if near_dup is not None:
+        near_dup.save(os.path.join(persist_dir, NEAR_DUP_FILE))
+
+    _save_manifest(manifest_path, {
+        "version": MANIFEST_VERSION, "embed_model": EMBED_MODEL, "vector_backend": VECTOR_BACKEND, "sources": sources,
+    })
+    metrics.INGEST_CHUNKS.inc(n_added, stage="added")
+    metrics.INGEST_CHUNKS.inc(n_deleted, stage="deleted")
+    metrics.INGEST_SECONDS.observe(time.time() - t0, phase="total")
+    total = sum(len(entry["chunk_ids"]) for entry in sources.values())
+    print(
+        f"[ingest] +{n_added} / -{n_deleted} chunks, {total} total "
+        f"in {time.time() - t0:.1f}s"
+    )
+    print(f"[ingest] embedding cache: {embedding_store.stats()}")
+    print(f"[ingest] ✅ {store.name} index persisted at {persist_dir}")
 
 if __name__ == "__main__":
-    build_index()
+    from app.ingest.reindex import main
+
+    main()
@@ -0,0 +1,143 @@
+# app/ingest/fetch.py
+import hashlib, json, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.ingest.streaming import imap_bounded
+
+USER_AGENT = "lifesync-lite/1.0"
+
+
+class HostRateLimiter:
+    """Spaces out requests to the same host to at most `per_host_rps` per second."""
+
+    def __init__(self, per_host_rps: float = 2.0) -> None:
+        self.interval = 1.0 / per_host_rps if per_host_rps > 0 else 0.0
+        self._next: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str) -> None:
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, 0.0))
+            self._next[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class HttpCache:
+    """On-disk cache of fetched pages: validators (ETag / Last-Modified) plus the parsed text.
+
+    One `<sha1(url)>.json` file per URL, so a 304 answer needs neither a download nor a re-parse.
+    """
+
+    def __init__(self, cache_dir: str) -> None:
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url: str, entry: Dict[str, Any]) -> None:
+        path = self._path(url)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+
+
+class UrlFetcher:
+    """Concurrent page fetcher with a pooled Session, per-host rate limits and a conditional-GET cache.
+
+    `parse` turns a page's HTML into the text we index; its output is cached together
+    with the validators. Every fetch yields a report dict:
+    {"url", "status", "elapsed_ms", "from_cache", "bytes", "error"}.
+    """
+
+    def __init__(
+        self,
+        parse: Callable[[str], str] = lambda html: html,
+        cache_dir: Optional[str] = None,
+        workers: int = 8,
+        per_host_rps: float = 2.0,
+        timeout: float = 20.0,
+        session: Optional[requests.Session] = None,
+    ) -> None:
+        self.parse = parse
+        self.cache = HttpCache(cache_dir) if cache_dir else None
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.limiter = HostRateLimiter(per_host_rps)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=self.workers,
+                pool_maxsize=self.workers,
+                max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=(429, 502, 503, 504)),
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+        self.session = session
+
+    def fetch(self, url: str) -> Tuple[Dict[str, Any], Optional[str]]:
+        report: Dict[str, Any] = {"url": url, "status": None, "elapsed_ms": 0, "from_cache": False, "bytes": 0, "error": None}
+        cached = self.cache.get(url) if self.cache else None
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        self.limiter.wait(url)
+        t0 = time.perf_counter()
+        try:
+            r = self.session.get(url, timeout=self.timeout, headers=headers)
+            report["status"] = r.status_code
+            if r.status_code == 304 and cached:
+                report["from_cache"] = True
+                return report, cached.get("text")
+            r.raise_for_status()
+            report["bytes"] = len(r.content)
+            text = self.parse(r.text)
+            if self.cache and (r.headers.get("ETag") or r.headers.get("Last-Modified")):
+                self.cache.put(url, {
+                    "url": url,
+                    "etag": r.headers.get("ETag"),
+                    "last_modified": r.headers.get("Last-Modified"),
+                    "text": text,
+                })
+            return report, text
+        except Exception as e:
+            report["error"] = f"{type(e).__name__}: {e}"
+            return report, None
+        finally:
+            report["elapsed_ms"] = int((time.perf_counter() - t0) * 1000)
+
+    def iter_fetch(self, urls: Iterable[str]) -> Iterator[Tuple[Dict[str, Any], Optional[str]]]:
+        """Fetch URLs with the worker pool, yielding results in input order as they finish.
+
+        At most 2 × workers pages are fetched but not yet consumed.
+        """
+        if self.workers == 1:
+            for u in urls:
+                yield self.fetch(u)
+            return
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            yield from imap_bounded(pool, self.fetch, urls, 2 * self.workers)
@@ -1,9 +1,15 @@
-import os, glob, re, hashlib, html2text, markdown, requests
-from typing import List, Iterable
+import functools, logging, os, re, hashlib, html2text, markdown
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Iterable, Iterator, Optional, Sequence, Tuple
 from bs4 import BeautifulSoup
 from docx import Document as DocxDocument
 from pypdf import PdfReader
 from langchain_core.documents import Document
+from app.ingest.fetch import UrlFetcher
+from app.ingest.streaming import imap_bounded
+from app.rag.text_filter import AD_LINES, filter_lines
+
+logger = logging.getLogger(__name__)
 
 # Optional Readability extraction for articles (auto-disabled if missing)
 try:
@@ -18,36 +24,23 @@ DOCX_EXTS = {".docx"}
 PDF_EXTS  = {".pdf"}
 
 # Cleaning helpers
-AD_STOPWORDS = {
-    "subscribe", "sign up", "cookie", "privacy", "terms",
-    "share this", "available at:", "myplate.gov", "myplate plan",
-    "back to top", "newsletter", "sponsored"
-}
-URL_RE = re.compile(r"https?://\S+")
 MULTI_WS_RE = re.compile(r"\s+")
 
 def _norm_ws(s: str) -> str:
     return MULTI_WS_RE.sub(" ", s).strip()
 
-def _looks_like_boilerplate(line: str) -> bool:
-    low = line.lower()
-    if len(low) < 30:
-        return True
-    if URL_RE.search(low):
-        return True
-    if any(tok in low for tok in AD_STOPWORDS):
-        return True
-    alpha = sum(c.isalpha() for c in low)
-    return alpha < 10
-
 def _strip_boilerplate(text: str) -> str:
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
-    keep = [l for l in lines if not _looks_like_boilerplate(l)]
-    return _norm_ws("\n".join(keep))
+    """Drop short, link, ad/nav and mostly-non-letter lines (rules in app/rag/text_filter.py)."""
+    return _norm_ws("\n".join(filter_lines(text, AD_LINES)))
 
 def _hash_content(s: str) -> str:
     return hashlib.sha1(s.encode("utf-8", "ignore")).hexdigest()
 
+def _source_name(path: str, base_dir: Optional[str]) -> str:
+    """Citation/dedup key of a file: its path relative to `base_dir` (so same-named files in
+    different folders stay distinct), or the bare file name without one."""
+    return os.path.relpath(path, base_dir) if base_dir else os.path.basename(path)
+
 # --- Loaders ---
 
 def load_txt_like(path: str) -> str:
@@ -77,7 +70,8 @@ def load_docx(path: str) -> str:
             parts.append(p.text)
     return _strip_boilerplate("\n".join(parts))
 
-def load_pdf(path: str) -> Iterable[Document]:
+def load_pdf(path: str, base_dir: Optional[str] = None) -> Iterable[Document]:
+    source = _source_name(path, base_dir)
     reader = PdfReader(path)
     for i, page in enumerate(reader.pages):
         text = page.extract_text() or ""
@@ -86,15 +80,15 @@ def load_pdf(path: str) -> Iterable[Document]:
             continue
         yield Document(
             page_content=text,
-            metadata={"source": os.path.basename(path), "type": "pdf", "page": i + 1},
+            metadata={"source": source, "type": "pdf", "page": i + 1},
         )
 
-def load_file(path: str) -> Iterable[Document]:
+def load_file(path: str, base_dir: Optional[str] = None) -> Iterable[Document]:
     ext = os.path.splitext(path)[1].lower()
-    name = os.path.basename(path)
+    name = _source_name(path, base_dir)
 
     if ext in PDF_EXTS:
-        yield from load_pdf(path)
+        yield from load_pdf(path, base_dir)
         return
 
     if ext in DOCX_EXTS:
@@ -110,44 +104,105 @@ def load_file(path: str) -> Iterable[Document]:
             metadata={"source": name, "type": ext.lstrip(".")},
         )
 
-def load_folder(corpus_dir: str) -> List[Document]:
-    patterns = ["**/*.pdf", "**/*.docx", "**/*.txt", "**/*.md", "**/*.markdown", "**/*.html", "**/*.htm"]
-    docs: List[Document] = []
+SUPPORTED_EXTS = PDF_EXTS | DOCX_EXTS | TEXT_EXTS
+
+def list_corpus_files(corpus_dir: str) -> List[str]:
+    """All supported files under corpus_dir from a single tree walk, in sorted (deterministic) order.
+
+    Hidden files and directories are skipped, like glob's ** does.
+    """
+    paths: List[str] = []
+    for root, dirs, files in os.walk(corpus_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            if not name.startswith(".") and os.path.splitext(name)[1].lower() in SUPPORTED_EXTS:
+                paths.append(os.path.join(root, name))
+    return paths
+
+def hash_file(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _parse_file(path: str, base_dir: Optional[str] = None) -> Optional[List[Tuple[str, Dict[str, Any]]]]:
+    """Worker-side parse: plain (text, metadata) tuples are cheaper to pickle than Documents. None if parsing failed."""
+    try:
+        return [(d.page_content, d.metadata) for d in load_file(path, base_dir)]
+    except Exception as e:
+        logger.warning("failed to parse %s: %s: %s", path, type(e).__name__, e)
+        return None
+
+def _to_documents(parsed: Optional[List[Tuple[str, Dict[str, Any]]]]) -> Optional[List[Document]]:
+    """Documents for one file's pages, minus repeats of the same (source, page, content hash)."""
+    if parsed is None:
+        return None
     seen = set()
-    for pat in patterns:
-        for path in glob.glob(os.path.join(corpus_dir, pat), recursive=True):
-            for d in load_file(path):
-                key = (d.metadata.get("source"), d.metadata.get("page"), _hash_content(d.page_content[:1200]))
-                if key in seen:
-                    continue
-                seen.add(key)
-                docs.append(d)
+    docs: List[Document] = []
+    for text, meta in parsed:
+        key = (meta.get("source"), meta.get("page"), _hash_content(text[:1200]))
+        if key in seen:
+            continue
+        seen.add(key)
+        docs.append(Document(page_content=text, metadata=meta))
     return docs
 
-def load_urls(urls: Iterable[str]) -> List[Document]:
-    out: List[Document] = []
-    for url in urls:
-        url = url.strip()
-        if not url or url.startswith("#"):
-            continue
-        try:
-            r = requests.get(url, timeout=20, headers={"User-Agent": "lifesync-lite/1.0"})
-            r.raise_for_status()
-            html = r.text
-
-            if _HAS_READABILITY:
-                article_html = ReadabilityDoc(html).summary(html_partial=True)
-                soup = BeautifulSoup(article_html, "html.parser")
-            else:
-                soup = BeautifulSoup(html, "html.parser")
-                for tag in soup(["script", "style", "noscript", "header", "footer", "nav", "aside"]):
-                    tag.decompose()
-
-            text = soup.get_text(separator=" ")
-            text = _strip_boilerplate(text)
-            if text:
-                out.append(Document(page_content=text, metadata={"source": url, "type": "url"}))
-        except Exception:
-            # Skip bad URLs silently
-            pass
-    return out
+def load_files(paths: Sequence[str], workers: Optional[int] = None,
+               base_dir: Optional[str] = None) -> Iterator[Tuple[str, Optional[List[Document]]]]:
+    """Parse files, yielding (path, page-level Documents) in input order as each file finishes.
+
+    Documents is None for a file that failed to parse, so callers can tell that
+    apart from a file with no text. Sources are named relative to `base_dir` (see
+    _source_name) and pages are deduplicated by (source, page, content hash), so the
+    output is the same for any worker count. CPU-bound parsing (pypdf, python-docx,
+    BeautifulSoup) runs in a process pool of `workers` processes (default: CPU
+    count); workers <= 1 parses inline. At most 2 × workers parsed files wait for
+    the consumer, however many paths there are.
+    """
+    parse = functools.partial(_parse_file, base_dir=base_dir)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield path, _to_documents(parse(path))
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        for path, parsed in zip(paths, imap_bounded(pool, parse, paths, 2 * workers)):
+            yield path, _to_documents(parsed)
+
+def iter_folder(corpus_dir: str, workers: Optional[int] = None) -> Iterator[Document]:
+    """Every page-level Document under corpus_dir, in list_corpus_files order, as files finish parsing."""
+    for _, docs in load_files(list_corpus_files(corpus_dir), workers, base_dir=corpus_dir):
+        yield from docs or []
+
+def load_folder(corpus_dir: str, workers: Optional[int] = None) -> List[Document]:
+    return list(iter_folder(corpus_dir, workers))
+
+def html_to_text(html: str) -> str:
+    if _HAS_READABILITY:
+        article_html = ReadabilityDoc(html).summary(html_partial=True)
+        soup = BeautifulSoup(article_html, "html.parser")
+    else:
+        soup = BeautifulSoup(html, "html.parser")
+        for tag in soup(["script", "style", "noscript", "header", "footer", "nav", "aside"]):
+            tag.decompose()
+
+    text = soup.get_text(separator=" ")
+    return _strip_boilerplate(text)
+
+def iter_urls(urls: Iterable[str], fetcher: Optional[UrlFetcher] = None) -> Iterator[Document]:
+    """Fetch URLs concurrently, yielding one Document per page with usable text, in input order.
+
+    Prints a status/timing line per URL; failures are reported and skipped.
+    """
+    urls = (u.strip() for u in urls)
+    fetcher = fetcher or UrlFetcher(parse=html_to_text)
+    for report, text in fetcher.iter_fetch(u for u in urls if u and not u.startswith("#")):
+        flag = " (not modified)" if report["from_cache"] else ""
+        err = f" {report['error']}" if report["error"] else ""
+        print(f"[ingest] url {report['url']} → {report['status']} in {report['elapsed_ms']}ms{flag}{err}")
+        if text:
+            yield Document(page_content=text, metadata={"source": report["url"], "type": "url"})
+
+def load_urls(urls: Iterable[str], fetcher: Optional[UrlFetcher] = None) -> List[Document]:
+    return list(iter_urls(urls, fetcher))
@@ -0,0 +1,151 @@
+# app/ingest/near_dup.py
+"""MinHash + LSH index of chunk texts, for near-duplicate detection during ingest.
+
+Each chunk becomes a MinHash signature of its word shingles: `num_perm` uint32
+minimums, one per hash function. The fraction of positions where two signatures
+agree estimates the Jaccard similarity of their shingle sets. The signatures are
+split into `bands` bands of `rows` values, and each band is bucketed by its bytes.
+Two chunks become candidates if they share a bucket in any band, and a candidate
+counts as a duplicate only if its estimated similarity is >= threshold. A query
+touches `bands` buckets, not the whole corpus, so building the index stays
+roughly linear.
+
+Saved next to the index (NEAR_DUP_FILE) so incremental runs compare new chunks
+against everything already stored.
+"""
+import os, zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+NEAR_DUP_FILE = "near_dup.npz"  # stored inside the index directory
+SHINGLE_WORDS = 5
+
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+def lsh_params(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """(bands, rows) with bands * rows <= num_perm, minimizing false positives + false negatives at `threshold`.
+
+    P(candidate | similarity s) = 1 - (1 - s**rows)**bands; the two error areas are
+    averaged over a grid on either side of the threshold.
+    """
+    s = np.linspace(0.0, 1.0, 201)
+    best, best_err = (1, num_perm), float("inf")
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        p = 1.0 - (1.0 - s ** rows) ** bands
+        err = np.where(s < threshold, p, 1.0 - p).mean()
+        if err < best_err:
+            best, best_err = (bands, rows), err
+    return best
+
+
+def shingles(text: str, k: int = SHINGLE_WORDS) -> List[str]:
+    """Word k-grams of already-normalized text (the whole text if it is shorter than k words)."""
+    words = text.split()
+    if len(words) <= k:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + k]) for i in range(len(words) - k + 1)]
+
+
+class MinHashLSH:
+    """Near-duplicate index: chunk id → MinHash signature, banded into LSH buckets."""
+
+    def __init__(self, threshold: float, num_perm: int = 128, seed: int = 1) -> None:
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.seed = seed
+        self.bands, self.rows = lsh_params(num_perm, threshold)
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: h_i(x) = (a_i * x + b_i) >> 32, in wrapping uint64 arithmetic
+        self._a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        self._sigs: Dict[str, np.ndarray] = {}
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(self.bands)]
+
+    def __len__(self) -> int:
+        return len(self._sigs)
+
+    def __contains__(self, cid: str) -> bool:
+        return cid in self._sigs
+
+    def ids(self) -> List[str]:
+        return list(self._sigs)
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature (uint32[num_perm]) of normalized text."""
+        grams = shingles(text)
+        if not grams:
+            return np.full(self.num_perm, 0xFFFFFFFF, dtype=np.uint32)
+        x = np.fromiter((zlib.crc32(g.encode("utf-8", "ignore")) for g in grams), dtype=np.uint64, count=len(grams))
+        with np.errstate(over="ignore"):
+            h = (x[:, None] * self._a + self._b) >> np.uint64(32)
+        return (h & _MASK32).min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, sig: np.ndarray) -> List[bytes]:
+        r = self.rows
+        return [sig[i * r:(i + 1) * r].tobytes() for i in range(self.bands)]
+
+    def query(self, sig: np.ndarray) -> Optional[Tuple[str, float]]:
+        """The most similar indexed chunk with estimated Jaccard >= threshold, as (id, similarity)."""
+        candidates = set()
+        for bucket, key in zip(self._buckets, self._band_keys(sig)):
+            candidates.update(bucket.get(key, ()))
+        best: Optional[Tuple[str, float]] = None
+        for cid in candidates:
+            sim = float(np.count_nonzero(self._sigs[cid] == sig)) / self.num_perm
+            if sim >= self.threshold and (best is None or sim > best[1] or (sim == best[1] and cid < best[0])):
+                best = (cid, sim)
+        return best
+
+    def add(self, cid: str, sig: np.ndarray) -> None:
+        if cid in self._sigs:
+            return
+        self._sigs[cid] = sig
+        for bucket, key in zip(self._buckets, self._band_keys(sig)):
+            bucket.setdefault(key, []).append(cid)
+
+    def remove(self, ids: Iterable[str]) -> None:
+        for cid in ids:
+            sig = self._sigs.pop(cid, None)
+            if sig is None:
+                continue
+            for bucket, key in zip(self._buckets, self._band_keys(sig)):
+                members = bucket.get(key)
+                if members is not None:
+                    members.remove(cid)
+                    if not members:
+                        del bucket[key]
+
+    def save(self, path: str) -> None:
+        ids = list(self._sigs)
+        sigs = np.stack([self._sigs[c] for c in ids]) if ids else np.zeros((0, self.num_perm), dtype=np.uint32)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, ids=np.array(ids, dtype=str), sigs=sigs,
+                 params=np.array([self.threshold, self.num_perm, self.seed, SHINGLE_WORDS], dtype=np.float64))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, threshold: float, num_perm: int = 128, seed: int = 1) -> Optional["MinHashLSH"]:
+        """The index saved at `path`, or None if there isn't one or it was built with other parameters."""
+        try:
+            with np.load(path) as data:
+                params, ids, sigs = data["params"].tolist(), data["ids"].tolist(), data["sigs"]
+        except (OSError, ValueError, KeyError):
+            return None
+        if params != [threshold, num_perm, seed, SHINGLE_WORDS]:
+            return None
+        index = cls(threshold, num_perm, seed)
+        for cid, sig in zip(ids, sigs):
+            index.add(cid, sig)
+        return index
+
+    @classmethod
+    def build(cls, ids: Sequence[str], texts: Sequence[str], threshold: float, num_perm: int = 128,
+              seed: int = 1) -> "MinHashLSH":
+        """Index already-normalized texts (e.g. every chunk in the store)."""
+        index = cls(threshold, num_perm, seed)
+        for cid, text in zip(ids, texts):
+            index.add(cid, index.signature(text))
+        return index
@@ -0,0 +1,153 @@
+# app/ingest/reindex.py
+"""Build a new index version and swap it in, as a background job or from the CLI.
+
+    python -m app.ingest.reindex [--full]          # build + activate a new version
+    python -m app.ingest.reindex --list
+    python -m app.ingest.reindex --rollback [VERSION]
+
+A build never touches the active version: it copies it into a fresh version
+directory, syncs that with app/data, then flips CURRENT (see app/rag/index_versions.py).
+Running servers pick it up through the `on_swap` callback (POST /admin/reindex) or
+on restart.
+"""
+import argparse, threading, time, uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from app.config import INDEX_KEEP_VERSIONS
+from app.ingest.build_index import build_index
+from app.rag.index_versions import (
+    activate, current_version, discard, list_versions, new_version, prune, version_dir,
+)
+
+SwapFn = Callable[[str], None]
+
+
+class ReindexBusy(RuntimeError):
+    """A reindex or rollback is already running."""
+
+
+def build_version(full: bool = False, keep: int = INDEX_KEEP_VERSIONS, on_swap: Optional[SwapFn] = None) -> str:
+    """Build a new index version, make it active and prune old ones. Returns its name.
+
+    `on_swap` (e.g. reopening the planner's indexes) runs before pruning, so readers
+    have left the old version first; the previously active version is always kept
+    for rollback.
+    """
+    previous = current_version()
+    name = new_version()
+    try:
+        build_index(full=full, persist_dir=version_dir(name))
+    except BaseException:
+        discard(name)
+        raise
+    activate(name)
+    if on_swap is not None:
+        on_swap(name)
+    removed = prune(keep, protect=[previous])
+    print(f"[ingest] active index version: {name}" + (f" (pruned {', '.join(removed)})" if removed else ""))
+    return name
+
+
+def rollback_version(version: Optional[str] = None) -> str:
+    """Activate `version`, or the newest version older than the active one. Returns its name."""
+    versions = list_versions()
+    current = current_version()
+    if version is None:
+        older = [v for v in versions if current is None or v < current]
+        if not older:
+            raise ValueError("No previous index version to roll back to")
+        version = older[-1]
+    elif version not in versions:
+        raise ValueError(f"No index version {version!r}")
+    activate(version)
+    print(f"[ingest] rolled back active index version: {current} → {version}")
+    return version
+
+
+class ReindexJobs:
+    """One reindex (or rollback) at a time, run on a daemon thread, with a short job history."""
+
+    def __init__(self, history: int = 20) -> None:
+        self.history = history
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._running: Optional[str] = None
+
+    def _new(self, kind: str, **fields: Any) -> Dict[str, Any]:
+        if self._running is not None:
+            raise ReindexBusy(self._running)
+        job = {"id": uuid.uuid4().hex[:12], "kind": kind, "status": "queued", "version": None, "error": None,
+               "created_at": time.time(), "started_at": None, "finished_at": None, **fields}
+        self._jobs[job["id"]] = job
+        while len(self._jobs) > self.history:
+            self._jobs.popitem(last=False)
+        self._running = job["id"]
+        return job
+
+    def _run(self, job: Dict[str, Any], fn: Callable[[], str], on_swap: Optional[SwapFn]) -> None:
+        job.update(status="running", started_at=time.time())
+        try:
+            job["version"] = fn()
+            if on_swap is not None:
+                on_swap(job["version"])
+            job["status"] = "succeeded"
+        except BaseException as e:
+            job.update(status="failed", error=f"{type(e).__name__}: {e}")
+            print(f"[ingest] {job['kind']} job {job['id']} failed: {job['error']}")
+        finally:
+            job["finished_at"] = time.time()
+            with self._lock:
+                self._running = None
+
+    def start(self, full: bool = False, on_swap: Optional[SwapFn] = None) -> Dict[str, Any]:
+        """Queue a background build; raises ReindexBusy if one is running."""
+        with self._lock:
+            job = self._new("reindex", full=full)
+        threading.Thread(target=self._run, args=(job, lambda: build_version(full, on_swap=on_swap), None),
+                         name=f"reindex-{job['id']}", daemon=True).start()
+        return dict(job)
+
+    def rollback(self, version: Optional[str] = None, on_swap: Optional[SwapFn] = None) -> Dict[str, Any]:
+        """Switch back to an earlier version now (no build); raises ReindexBusy during a reindex."""
+        with self._lock:
+            job = self._new("rollback")
+        self._run(job, lambda: rollback_version(version), on_swap)
+        return dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        """Recent jobs, newest first."""
+        return [dict(j) for j in reversed(list(self._jobs.values()))]
+
+    def running(self) -> Optional[str]:
+        return self._running
+
+
+reindex_jobs = ReindexJobs()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Build and activate a new index version")
+    ap.add_argument("--full", action="store_true", help="re-embed everything instead of syncing changes")
+    ap.add_argument("--list", action="store_true", help="list index versions and exit")
+    ap.add_argument("--rollback", nargs="?", const="", metavar="VERSION",
+                    help="activate VERSION (default: the previous one) instead of building")
+    args = ap.parse_args()
+
+    if args.list:
+        current = current_version()
+        for v in list_versions():
+            print(("* " if v == current else "  ") + v)
+        return
+    if args.rollback is not None:
+        rollback_version(args.rollback or None)
+        return
+    build_version(full=args.full)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# app/ingest/streaming.py
+"""Bounded-memory building blocks for the ingest pipeline.
+
+Each helper holds at most a fixed number of items between a producer and its
+consumer. The pipeline's peak memory is then set by these bounds, not by the
+corpus size:
+
+    prefetch(gen, maxsize)      run a generator on its own thread, queue.Queue(maxsize) in between
+    imap_bounded(pool, fn, xs)  executor map with at most `window` results outstanding, in input order
+    iter_batches(items, ...)    greedy count/token-bounded batching of a stream
+"""
+import queue, threading
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Deque, Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, exc: BaseException) -> None:
+        self.exc = exc
+
+
+def prefetch(items: Iterable[T], maxsize: int) -> Iterator[T]:
+    """Iterate `items` on a daemon thread, at most `maxsize` items ahead of the consumer.
+
+    Exceptions in the producer are re-raised in the consumer. If the consumer stops
+    early, the producer is told to stop at its next put, and `items` is closed.
+    """
+    q: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_Failure(e))
+            return
+        finally:
+            # run the source generator's cleanup (e.g. load_files' process pool) on early stop too
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+        put(_DONE)
+
+    threading.Thread(target=produce, name="ingest-prefetch", daemon=True).start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+
+
+def imap_bounded(pool: Executor, fn: Callable[[T], R], items: Iterable[T], window: int) -> Iterator[R]:
+    """pool.map(fn, items), but with at most `window` tasks submitted and not yet consumed."""
+    pending: Deque[Future] = deque()
+    it = iter(items)
+    for item in it:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= window:
+            break
+    while pending:
+        result = pending.popleft().result()
+        for item in it:
+            pending.append(pool.submit(fn, item))
+            break
+        yield result
+
+
+def iter_batches(
+    items: Iterable[T],
+    text: Callable[[T], str],
+    max_items: int,
+    max_tokens: int,
+    count_tokens: Callable[[str], int],
+) -> Iterator[List[T]]:
+    """Greedily group a stream into batches bounded by both item count and token total."""
+    cur: List[T] = []
+    cur_tokens = 0
+    for item in items:
+        n = count_tokens(text(item))
+        if cur and (len(cur) >= max_items or cur_tokens + n > max_tokens):
+            yield cur
+            cur, cur_tokens = [], 0
+        cur.append(item)
+        cur_tokens += n
+    if cur:
+        yield cur
@@ -1,17 +1,55 @@
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
-import os
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
+from typing import Dict, Any
+import asyncio, json, time
 
-from app.rag.pipeline import planner
-from app.ingest.build_index import build_index
+from app import metrics
+from app.config import METRICS_ENABLED, PLAN_BATCH_CONCURRENCY, PLAN_BATCH_MAX, PLANNER_WARMUP
+# The planner (OpenAI, LangChain, Chroma) is built lazily; see get_planner and lifespan below
+from app.rag.pipeline import RagPlanner, get_planner, planner_ready
+from app.rag.recipes import catalog
+from app.rag.restrictions import NoMatchingRecipes
+from app.schemas import BatchPlanRequest, PlanRequest, enrich_goal, profile_dict
+from app.rag.cache import plan_cache, plan_flights
+from app.rag.embedding_store import embedding_store
 
 from fastapi import FastAPI, HTTPException
+from starlette.routing import Match
 
 
-app = FastAPI(title="LifeSync Lite API", version="0.2.0")
+_warmup: Dict[str, Any] = {"state": "pending", "error": None}
+
+def warm_up() -> None:
+    """Build the planner and load the recipe catalog so the first request doesn't pay for them."""
+    _warmup.update(state="starting", error=None)
+    try:
+        get_planner()
+        catalog.maybe_reload()
+        _warmup["state"] = "ready"
+    except Exception as e:
+        _warmup.update(state="error", error=f"{type(e).__name__}: {e}")
+        print(f"[app] warm-up failed ({_warmup['error']}); requests will retry")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if PLANNER_WARMUP == "blocking":
+        await asyncio.to_thread(warm_up)
+    elif PLANNER_WARMUP == "background":
+        asyncio.get_running_loop().run_in_executor(None, warm_up)
+    yield
+
+async def _planner() -> RagPlanner:
+    """get_planner() without blocking the event loop on first use; 503 while it can't be built."""
+    if planner_ready():
+        return get_planner()
+    try:
+        return await asyncio.to_thread(get_planner)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Planner unavailable: {e}")
+
+
+app = FastAPI(title="LifeSync Lite API", version="0.2.0", lifespan=lifespan)
 
 # CORS: open in dev; tighten in prod
 app.add_middleware(
@@ -22,15 +60,44 @@ app.add_middleware(
     allow_credentials=True,
 )
 
-class HealthProfile(BaseModel):
-    age: Optional[int] = None
-    weight_kg: Optional[float] = None
-    height_cm: Optional[float] = None
-    restrictions: Optional[str] = None
+class MetricsMiddleware:
+    """Per-route request count, latency and in-flight gauge.
+
+    Plain ASGI rather than @app.middleware("http"): the request only counts as done
+    once the last body chunk is sent, so NDJSON streams stay in flight while they run.
+    Routes are labelled by their template; anything unrouted is "unmatched".
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    @staticmethod
+    def _route(scope: Dict[str, Any]) -> str:
+        for r in app.router.routes:
+            if r.matches(scope)[0] == Match.FULL:
+                return getattr(r, "path", "unmatched")
+        return "unmatched"
 
-class PlanRequest(BaseModel):
-    goal: str = Field(..., description="User's goal (e.g., '3-day muscle gain plan under 2200 kcal')")
-    profile: Optional[HealthProfile] = None
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        route, status = self._route(scope), [500]
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        t = time.perf_counter()
+        with metrics.in_flight(metrics.HTTP_IN_FLIGHT, route=route):
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                metrics.HTTP_REQUESTS.inc(route=route, method=scope.get("method", ""), status=status[0])
+                metrics.HTTP_SECONDS.observe(time.perf_counter() - t, route=route)
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 @app.get("/")
 def root():
@@ -39,34 +106,110 @@ def root():
 
 @app.get("/health")
 def health():
+    """Liveness: the process is serving. Doesn't touch OpenAI or the index."""
     return {"status": "ok"}
 
+@app.get("/ready")
+def ready():
+    """Readiness: 200 once the planner is built, 503 while warming up or if warm-up failed."""
+    if planner_ready():
+        return {"status": "ready"}
+    return JSONResponse(status_code=503, content={"status": _warmup["state"], "detail": _warmup["error"]})
+
 @app.post("/plan")
-def generate_plan(req: PlanRequest) -> Dict[str, Any]:
-    enriched = req.goal
-    if req.profile:
-        tags = []
-        if req.profile.age is not None:        tags.append(f"Age {req.profile.age}")
-        if req.profile.weight_kg is not None:  tags.append(f"Weight {req.profile.weight_kg} kg")
-        if req.profile.height_cm is not None:  tags.append(f"Height {req.profile.height_cm} cm")
-        if req.profile.restrictions:           tags.append(f"Diet {req.profile.restrictions}")
-        if tags:
-            enriched += " | Profile: " + ", ".join(tags)
-    
-    # Convert profile to dict for the planner
-    profile_dict = None
-    if req.profile:
-        profile_dict = {
-            "age": req.profile.age,
-            "weight_kg": req.profile.weight_kg,
-            "height_cm": req.profile.height_cm,
-            "restrictions": req.profile.restrictions
-        }
-    
-    return planner.plan(enriched, profile_dict)
-
-@app.post("/admin/reindex")
-def reindex():
-    build_index()
-    return {"status": "ok", "message": "Index rebuilt"}
+async def generate_plan(req: PlanRequest) -> Dict[str, Any]:
+    planner = await _planner()
+    try:
+        return await planner.aplan(enrich_goal(req), profile_dict(req))
+    except NoMatchingRecipes as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.post("/plan/stream")
+async def stream_plan(req: PlanRequest) -> StreamingResponse:
+    """Same plan as /plan, emitted as NDJSON events while it is generated."""
+    planner = await _planner()
+    async def events():
+        try:
+            async for event in planner.astream_plan(enrich_goal(req), profile_dict(req)):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/plan/batch")
+async def batch_plans(req: BatchPlanRequest) -> StreamingResponse:
+    """Plans for many requests as NDJSON, one {"index", "type": "plan"|"error", ...} line each, in completion order."""
+    if len(req.requests) > PLAN_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {PLAN_BATCH_MAX} requests per batch")
+    items = [(enrich_goal(r), profile_dict(r)) for r in req.requests]
+    concurrency = min(req.concurrency or PLAN_BATCH_CONCURRENCY, PLAN_BATCH_CONCURRENCY)
+    planner = await _planner()
+
+    async def events():
+        try:
+            async for event in planner.abatch_plan(items, concurrency):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+def _swap_indexes(version: str) -> None:
+    """Called by reindex/rollback jobs once `version` is active: reopen the planner's indexes."""
+    if planner_ready():
+        get_planner().reload_indexes()
+    plan_cache.clear()
+
+@app.post("/admin/reindex", status_code=202)
+def reindex(full: bool = False) -> Dict[str, Any]:
+    """Start building a new index version in the background; poll GET /admin/reindex/{id}.
+
+    Queries keep using the active version until the new one is complete and swapped in.
+    """
+    from app.ingest.reindex import ReindexBusy, reindex_jobs  # loaders + text splitter; admin-only
+
+    try:
+        return reindex_jobs.start(full=full, on_swap=_swap_indexes)
+    except ReindexBusy as e:
+        raise HTTPException(status_code=409, detail=f"Reindex job {e} is still running")
+
+@app.get("/admin/reindex")
+def reindex_status() -> Dict[str, Any]:
+    from app.ingest.reindex import reindex_jobs
+    from app.rag.index_versions import current_version, list_versions
+
+    return {"running": reindex_jobs.running(), "current": current_version(),
+            "versions": list_versions(), "jobs": reindex_jobs.jobs()}
+
+@app.get("/admin/reindex/{job_id}")
+def reindex_job(job_id: str) -> Dict[str, Any]:
+    from app.ingest.reindex import reindex_jobs
+
+    job = reindex_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No reindex job {job_id!r}")
+    return job
+
+@app.post("/admin/reindex/rollback")
+def reindex_rollback(version: str | None = None) -> Dict[str, Any]:
+    """Re-activate `version` (default: the one before the active version) and reopen the planner."""
+    from app.ingest.reindex import ReindexBusy, reindex_jobs
+
+    try:
+        job = reindex_jobs.rollback(version, on_swap=_swap_indexes)
+    except ReindexBusy as e:
+        raise HTTPException(status_code=409, detail=f"Reindex job {e} is still running")
+    if job["status"] != "succeeded":
+        raise HTTPException(status_code=400, detail=job["error"])
+    return job
+
+@app.get("/metrics")
+def metrics_endpoint() -> PlainTextResponse:
+    """Prometheus text exposition of app.metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/cache")
+def cache_stats() -> Dict[str, Any]:
+    return {**plan_cache.stats(), "coalesced": plan_flights.stats(), "embeddings": embedding_store.stats()}
 
@@ -0,0 +1,262 @@
+# app/metrics.py
+"""In-process, Prometheus-style metrics served as text by GET /metrics.
+
+Metrics are module-level singletons (like plan_cache / embedding_store) so any
+module can record without wiring. With METRICS_ENABLED=0 every record call returns
+immediately, and `timed(...)` used as a decorator hands back the undecorated function.
+Modules that keep their own counters (the caches) register an `on_collect` hook that
+copies them into metrics at scrape time instead of counting on the hot path.
+
+    with timed(STAGE_SECONDS, stage="vector_search"):
+        ...
+
+    @timed(STAGE_SECONDS, stage="parse_json")
+    def parse(...): ...
+"""
+import bisect, functools, inspect, threading, time
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from app.config import METRICS_ENABLED
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry: List["_Metric"] = []
+_collect_hooks: List[Callable[[], None]] = []
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def _labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")).replace('"', "'") for n in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in sorted(self._values.items())]
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        if not METRICS_ENABLED:
+            return
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0) + amount
+
+    def set_total(self, value: float, **labels: Any) -> None:
+        """Copy a total that is counted elsewhere (see on_collect)."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        if not METRICS_ENABLED:
+            return
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        if not METRICS_ENABLED:
+            return
+        k = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(k)
+            if row is None:
+                # per-bucket counts (+Inf last), sum
+                row = self._values[k] = [[0] * (len(self.buckets) + 1), 0.0]
+            row[0][i] += 1
+            row[1] += value
+
+    def _samples(self) -> List[str]:
+        out: List[str] = []
+        with self._lock:
+            items = sorted((k, (list(counts), total)) for k, (counts, total) in self._values.items())
+        for k, (counts, total) in items:
+            cum = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                cum += c
+                le_label = 'le="%s"' % _fmt(le)
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, k, le_label)} {cum}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, k)} {_fmt(total)}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, k)} {cum}")
+        return out
+
+
+class _Timer:
+    """Context manager (and decorator) observing elapsed seconds into a Histogram."""
+
+    __slots__ = ("metric", "labels", "t")
+
+    def __init__(self, metric: Histogram, labels: Dict[str, Any]) -> None:
+        self.metric = metric
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.t = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> bool:
+        self.metric.observe(time.perf_counter() - self.t, **self.labels)
+        return False
+
+    def __call__(self, fn: Callable) -> Callable:
+        metric, labels = self.metric, self.labels
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def awrapper(*args: Any, **kwargs: Any) -> Any:
+                with _Timer(metric, labels):
+                    return await fn(*args, **kwargs)
+            return awrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with _Timer(metric, labels):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+class _Noop:
+    __slots__ = ()
+
+    def __enter__(self) -> "_Noop":
+        return self
+
+    def __exit__(self, *exc: Any) -> bool:
+        return False
+
+    def __call__(self, fn: Callable) -> Callable:
+        return fn
+
+
+_NOOP = _Noop()
+
+
+def timed(metric: Histogram, **labels: Any) -> Any:
+    """Time a block (`with timed(...)`) or every call of a function (`@timed(...)`)."""
+    return _Timer(metric, labels) if METRICS_ENABLED else _NOOP
+
+
+class _Tracked:
+    __slots__ = ("gauge", "labels")
+
+    def __init__(self, gauge: Gauge, labels: Dict[str, Any]) -> None:
+        self.gauge = gauge
+        self.labels = labels
+
+    def __enter__(self) -> "_Tracked":
+        self.gauge.inc(**self.labels)
+        return self
+
+    def __exit__(self, *exc: Any) -> bool:
+        self.gauge.dec(**self.labels)
+        return False
+
+
+def in_flight(gauge: Gauge, **labels: Any) -> Any:
+    """Context manager holding `gauge` one higher while the block runs."""
+    return _Tracked(gauge, labels) if METRICS_ENABLED else _NOOP
+
+
+def on_collect(fn: Callable[[], None]) -> Callable[[], None]:
+    """Register a hook run before each scrape (e.g. to copy cache counters into metrics)."""
+    _collect_hooks.append(fn)
+    return fn
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (0.0.4)."""
+    if METRICS_ENABLED:
+        for hook in _collect_hooks:
+            hook()
+    lines: List[str] = []
+    for m in _registry:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+def record_usage(call: str, model: str, usage: Any) -> None:
+    """Count prompt/completion tokens from an OpenAI response's `usage`, if present."""
+    if not METRICS_ENABLED or usage is None:
+        return
+    OPENAI_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, call=call, model=model, kind="prompt")
+    OPENAI_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, call=call, model=model, kind="completion")
+    OPENAI_REQUESTS.inc(call=call, model=model)
+
+
+# --- Metric definitions ---
+
+STAGE_SECONDS = Histogram(
+    "healthtrack_stage_seconds",
+    "Latency of plan stages (embed, retrieve, summarize, generate, fill_meals, coalesced) and hot-path "
+    "operations inside them (vector_search, lexical_search, parse_json).",
+    ["stage"],
+)
+OPENAI_TOKENS = Counter("healthtrack_openai_tokens_total", "OpenAI tokens reported in resp.usage.",
+                        ["call", "model", "kind"])
+OPENAI_REQUESTS = Counter("healthtrack_openai_requests_total", "OpenAI chat completions with usage reported.",
+                          ["call", "model"])
+CACHE_LOOKUPS = Counter("healthtrack_cache_lookups_total", "Cache lookups by cache and result.",
+                        ["cache", "result"])
+UPSTREAM_CALLS_SAVED = Counter("healthtrack_upstream_calls_saved_total",
+                               "Embedding, vector search and LLM calls skipped by coalescing identical in-flight plans.",
+                               ["call"])
+CACHE_HIT_RATIO = Gauge("healthtrack_cache_hit_ratio", "Hits / lookups since start, per cache.", ["cache"])
+CACHE_ENTRIES = Gauge("healthtrack_cache_entries", "Entries currently held, per cache.", ["cache"])
+HTTP_IN_FLIGHT = Gauge("healthtrack_http_requests_in_flight", "HTTP requests being served (streams until the last byte).",
+                       ["route"])
+HTTP_REQUESTS = Counter("healthtrack_http_requests_total", "HTTP requests served.", ["route", "method", "status"])
+HTTP_SECONDS = Histogram("healthtrack_http_request_seconds", "HTTP request latency, full body included.", ["route"])
+INGEST_CHUNKS = Counter("healthtrack_ingest_chunks_total",
+                        "Chunks processed by build_index (split, near_duplicate, added, deleted, embedded).", ["stage"])
+INGEST_SOURCES = Counter("healthtrack_ingest_sources_total", "Sources seen by build_index.", ["state"])
+INGEST_SECONDS = Histogram("healthtrack_ingest_seconds", "build_index run time and per-batch embedding time.",
+                           ["phase"], buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0))
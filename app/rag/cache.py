@@ -0,0 +1,265 @@
+# app/rag/cache.py
+import asyncio, copy, re, threading, time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app import metrics
+from app.config import PLAN_CACHE_MAX_ENTRIES, PLAN_CACHE_SIM_THRESHOLD, PLAN_CACHE_TTL_S
+
+_WS = re.compile(r"\s+")
+
+def normalize_key(text: str) -> str:
+    return _WS.sub(" ", (text or "").strip().lower())
+
+def flight_key(goal: str, restrictions: Optional[str]) -> str:
+    """Identity of a plan request: the normalized goal plus its dietary restrictions."""
+    return normalize_key(goal) + "\x1f" + normalize_key(restrictions or "")
+
+
+class TTLCache:
+    """Size-bounded LRU with per-entry expiry and hit/miss counters."""
+
+    def __init__(self, maxsize: int = 1024, ttl_s: float = 3600.0) -> None:
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def miss(self) -> None:
+        """Count a lookup answered without get(), e.g. a similarity search that found nothing."""
+        with self._lock:
+            self.misses += 1
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_s, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """Live (unexpired) entries, oldest first."""
+        now = time.monotonic()
+        with self._lock:
+            return [(k, v) for k, (exp, v) in self._data.items() if exp >= now]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class PlanCache:
+    """Two-level cache for the expensive part of a plan (retrieval, evidence, workouts).
+
+    - exact: keyed on the normalized enriched goal string plus the dietary restrictions (flight_key)
+    - semantic: cosine similarity between goal embeddings, only among entries with
+      the same dietary restrictions, above `threshold`
+
+    Meals are never cached; callers re-draw them on every hit.
+    """
+
+    def __init__(self, maxsize: int = PLAN_CACHE_MAX_ENTRIES, ttl_s: float = PLAN_CACHE_TTL_S,
+                 threshold: float = PLAN_CACHE_SIM_THRESHOLD) -> None:
+        self.threshold = threshold
+        self.exact = TTLCache(maxsize, ttl_s)
+        self.semantic = TTLCache(maxsize, ttl_s)
+
+    def get_exact(self, goal: str, restrictions: Optional[str]) -> Optional[Dict[str, Any]]:
+        hit = self.exact.get(flight_key(goal, restrictions))
+        return copy.deepcopy(hit) if hit is not None else None
+
+    def get_similar(self, vec: Sequence[float], restrictions: Optional[str]) -> Optional[Dict[str, Any]]:
+        bucket = normalize_key(restrictions or "")
+        entries = [(k, v) for k, v in self.semantic.items() if v["restrictions"] == bucket]
+        if not entries:
+            self.semantic.miss()
+            return None
+        mat = np.stack([v["vec"] for _, v in entries])
+        q = np.asarray(vec, dtype=np.float32)
+        q /= (np.linalg.norm(q) or 1.0)
+        sims = mat @ q
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            self.semantic.miss()
+            return None
+        # go through get() so LRU order and counters stay consistent
+        hit = self.semantic.get(entries[best][0])
+        return copy.deepcopy(hit["value"]) if hit is not None else None
+
+    def put(self, goal: str, restrictions: Optional[str], value: Dict[str, Any],
+            vec: Optional[Sequence[float]] = None) -> None:
+        key = flight_key(goal, restrictions)
+        value = copy.deepcopy(value)
+        self.exact.set(key, value)
+        if vec is not None:
+            v = np.asarray(vec, dtype=np.float32)
+            v /= (np.linalg.norm(v) or 1.0)
+            self.semantic.set(key, {"vec": v, "restrictions": normalize_key(restrictions or ""), "value": value})
+
+    def clear(self) -> None:
+        self.exact.clear()
+        self.semantic.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"exact": self.exact.stats(), "semantic": self.semantic.stats(), "threshold": self.threshold}
+
+
+class _LeaderGone(Exception):
+    """The leader was cancelled before finishing; followers start over."""
+
+
+class SingleFlight:
+    """Coalesces concurrent computations of the same key.
+
+    The first caller for a key (the leader) runs the computation; callers that
+    arrive while it is in flight wait for its result instead of repeating it, and
+    get their own deep copy. A leader's error is raised in every waiter. If the
+    leader is cancelled (client went away), waiters retry and one of them leads.
+    The key is released as soon as the leader finishes, so nothing is cached here.
+
+    Works from threads (`do`) and coroutines (`ado`): the shared result is a
+    concurrent.futures.Future, already marked running so a waiter that is
+    cancelled can't cancel it for the others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[str, "Future[Any]"] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.saved: Dict[str, int] = {}
+
+    def _join(self, key: str) -> Tuple["Future[Any]", bool]:
+        with self._lock:
+            fut = self._calls.get(key)
+            if fut is not None:
+                self.coalesced += 1
+                return fut, False
+            fut = Future()
+            fut.set_running_or_notify_cancel()
+            self._calls[key] = fut
+            self.leaders += 1
+            return fut, True
+
+    def settle(self, key: str, fut: "Future[Any]", value: Any = None, exc: Optional[BaseException] = None) -> None:
+        """Leader only: release `key` and hand `value` (or `exc`) to the waiters."""
+        with self._lock:
+            if self._calls.get(key) is fut:
+                del self._calls[key]
+        if exc is not None:
+            fut.set_exception(exc)
+        else:
+            # the leader keeps (and mutates) `value`; waiters copy from a snapshot
+            fut.set_result(copy.deepcopy(value))
+
+    def abandon(self, key: str, fut: "Future[Any]") -> None:
+        """Leader only: give up without a result; waiters start over and one of them leads."""
+        self.settle(key, fut, exc=_LeaderGone())
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """(result, shared): fn()'s result, computed here or by a concurrent caller with the same key."""
+        while True:
+            fut, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return copy.deepcopy(fut.result()), True
+            except _LeaderGone:
+                continue
+        try:
+            value = fn()
+        except BaseException as e:
+            self.settle(key, fut, exc=e)
+            raise
+        self.settle(key, fut, value)
+        return value, False
+
+    async def await_or_lead(self, key: str) -> Tuple[Optional["Future[Any]"], Any]:
+        """(None, result) after waiting for an in-flight computation of `key`, or (future, None)
+        if the caller is now the leader and must `settle` or `abandon` that future.
+
+        For callers that can't hand `ado` a function, e.g. a streaming response.
+        """
+        while True:
+            fut, leader = self._join(key)
+            if leader:
+                return fut, None
+            try:
+                return None, copy.deepcopy(await asyncio.wrap_future(fut))
+            except _LeaderGone:
+                continue
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Async `do`."""
+        fut, shared = await self.await_or_lead(key)
+        if fut is None:
+            return shared, True
+        try:
+            value = await fn()
+        except asyncio.CancelledError:
+            self.abandon(key, fut)
+            raise
+        except BaseException as e:
+            self.settle(key, fut, exc=e)
+            raise
+        self.settle(key, fut, value)
+        return value, False
+
+    def note_saved(self, calls: Iterable[str]) -> None:
+        """Count upstream calls a waiter didn't have to make (the ones its leader made)."""
+        with self._lock:
+            for call in calls:
+                self.saved[call] = self.saved.get(call, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"in_flight": len(self._calls), "leaders": self.leaders, "coalesced": self.coalesced,
+                    "saved_calls": dict(self.saved)}
+
+
+plan_cache = PlanCache()
+# Concurrent identical plan requests (cohorts, retry storms) share one computation
+plan_flights = SingleFlight()
+
+
+@metrics.on_collect
+def _export_stats() -> None:
+    for name, c in (("plan_exact", plan_cache.exact), ("plan_semantic", plan_cache.semantic)):
+        total = c.hits + c.misses
+        metrics.CACHE_LOOKUPS.set_total(c.hits, cache=name, result="hit")
+        metrics.CACHE_LOOKUPS.set_total(c.misses, cache=name, result="miss")
+        metrics.CACHE_HIT_RATIO.set(c.hits / total if total else 0.0, cache=name)
+        metrics.CACHE_ENTRIES.set(len(c), cache=name)
+    metrics.CACHE_LOOKUPS.set_total(plan_flights.coalesced, cache="plan_inflight", result="hit")
+    metrics.CACHE_LOOKUPS.set_total(plan_flights.leaders, cache="plan_inflight", result="miss")
+    for call, n in plan_flights.stats()["saved_calls"].items():
+        metrics.UPSTREAM_CALLS_SAVED.set_total(n, call=call)
@@ -0,0 +1,172 @@
+# app/rag/embedding_store.py
+import hashlib, os, sqlite3, threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app import metrics
+from app.config import EMBED_CACHE_LRU, EMBED_CACHE_PATH, EMBED_MODEL, OPENAI_BASE_URL
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8", "ignore")).hexdigest()
+
+
+class EmbeddingStore:
+    """Content-addressed embedding cache: (model, sha1(text)) → float32 vector.
+
+    Vectors live as raw float32 blobs in SQLite, with an in-memory LRU in front.
+    Safe to share between threads and between the ingest and query paths.
+    """
+
+    def __init__(self, path: str = EMBED_CACHE_PATH, lru_size: int = EMBED_CACHE_LRU) -> None:
+        self.path = path
+        self.lru_size = lru_size
+        self._lru: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            parent = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(parent, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, key TEXT NOT NULL, vec BLOB NOT NULL,"
+                " PRIMARY KEY (model, key)) WITHOUT ROWID"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, k: Tuple[str, str], vec: np.ndarray) -> None:
+        self._lru[k] = vec
+        self._lru.move_to_end(k)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        keys = [text_key(t) for t in texts]
+        out: List[Optional[np.ndarray]] = [None] * len(texts)
+        with self._lock:
+            missing: Dict[str, List[int]] = {}
+            for i, k in enumerate(keys):
+                vec = self._lru.get((model, k))
+                if vec is not None:
+                    self._lru.move_to_end((model, k))
+                    out[i] = vec
+                    self.memory_hits += 1
+                else:
+                    missing.setdefault(k, []).append(i)
+            if missing:
+                db = self._db()
+                found = {}
+                ks = list(missing)
+                for j in range(0, len(ks), 500):  # stay under SQLite's bound-parameter limit
+                    part = ks[j:j + 500]
+                    rows = db.execute(
+                        f"SELECT key, vec FROM embeddings WHERE model = ? AND key IN ({','.join('?' * len(part))})",
+                        [model, *part],
+                    ).fetchall()
+                    found.update(rows)
+                for k, idxs in missing.items():
+                    blob = found.get(k)
+                    if blob is None:
+                        self.misses += len(idxs)
+                        continue
+                    vec = np.frombuffer(blob, dtype=np.float32)
+                    self._remember((model, k), vec)
+                    self.disk_hits += len(idxs)
+                    for i in idxs:
+                        out[i] = vec
+        return out
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        rows = []
+        with self._lock:
+            for t, v in zip(texts, vectors):
+                vec = np.asarray(v, dtype=np.float32)
+                k = text_key(t)
+                self._remember((model, k), vec)
+                rows.append((model, k, vec.tobytes()))
+            db = self._db()
+            db.executemany("INSERT OR REPLACE INTO embeddings (model, key, vec) VALUES (?, ?, ?)", rows)
+            db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "lru_size": len(self._lru),
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain Embeddings wrapper that serves repeated texts from an EmbeddingStore."""
+
+    def __init__(self, inner: Embeddings, store: EmbeddingStore, model: str = EMBED_MODEL) -> None:
+        self.inner = inner
+        self.store = store
+        self.model = model
+
+    def _split(self, texts: List[str]) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+        cached = self.store.get_many(self.model, texts)
+        return cached, [i for i, v in enumerate(cached) if v is None]
+
+    def _merge(self, texts: List[str], cached: List[Optional[np.ndarray]], todo: List[int],
+               fresh: List[List[float]]) -> List[List[float]]:
+        if todo:
+            self.store.put_many(self.model, [texts[i] for i in todo], fresh)
+            for i, v in zip(todo, fresh):
+                cached[i] = np.asarray(v, dtype=np.float32)
+        return [v.tolist() for v in cached]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached, todo = self._split(texts)
+        fresh = self.inner.embed_documents([texts[i] for i in todo]) if todo else []
+        return self._merge(texts, cached, todo, fresh)
+
+    def embed_query(self, text: str) -> List[float]:
+        cached, todo = self._split([text])
+        fresh = [self.inner.embed_query(text)] if todo else []
+        return self._merge([text], cached, todo, fresh)[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached, todo = self._split(texts)
+        fresh = await self.inner.aembed_documents([texts[i] for i in todo]) if todo else []
+        return self._merge(texts, cached, todo, fresh)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        cached, todo = self._split([text])
+        fresh = [await self.inner.aembed_query(text)] if todo else []
+        return self._merge([text], cached, todo, fresh)[0]
+
+
+embedding_store = EmbeddingStore()
+
+
+@metrics.on_collect
+def _export_stats() -> None:
+    s = embedding_store
+    for result, n in (("memory_hit", s.memory_hits), ("disk_hit", s.disk_hits), ("miss", s.misses)):
+        metrics.CACHE_LOOKUPS.set_total(n, cache="embeddings", result=result)
+    total = s.memory_hits + s.disk_hits + s.misses
+    metrics.CACHE_HIT_RATIO.set((s.memory_hits + s.disk_hits) / total if total else 0.0, cache="embeddings")
+    metrics.CACHE_ENTRIES.set(len(s._lru), cache="embeddings")
+
+def get_embeddings(model: str = EMBED_MODEL, **kwargs: Any) -> CachedEmbeddings:
+    """OpenAIEmbeddings for `model`, fronted by the shared on-disk embedding store."""
+    from langchain_openai import OpenAIEmbeddings  # pulls in openai + langchain chat models; only when needed
+    if OPENAI_BASE_URL:
+        kwargs.setdefault("base_url", OPENAI_BASE_URL)
+    return CachedEmbeddings(OpenAIEmbeddings(model=model, **kwargs), embedding_store, model)
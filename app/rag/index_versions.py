@@ -0,0 +1,104 @@
+# app/rag/index_versions.py
+"""Versioned index directories under CHROMA_PERSIST_DIR.
+
+    CHROMA_PERSIST_DIR/
+        CURRENT                                name of the active version
+        versions/20261017-153012004211-a1b2/   one complete index each: vector store, lexical/, manifest
+
+Readers resolve active_dir() when they open the index. A reindex builds a new
+version next to the live one, then flips CURRENT with os.replace, so a reader
+only ever sees a complete index. A tree without CURRENT (built before versioning)
+is read in place and used as the seed for the first version.
+"""
+import os, secrets, shutil, time
+from typing import Iterable, List, Optional
+
+from app.config import CHROMA_PERSIST_DIR
+
+CURRENT_FILE = "CURRENT"
+VERSIONS_SUBDIR = "versions"
+
+
+def version_dir(name: str, root: str = CHROMA_PERSIST_DIR) -> str:
+    return os.path.join(root, VERSIONS_SUBDIR, name)
+
+
+def current_version(root: str = CHROMA_PERSIST_DIR) -> Optional[str]:
+    """Name of the active version, or None for an unversioned (or empty) tree."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    return name if name and os.path.isdir(version_dir(name, root)) else None
+
+
+def active_dir(root: str = CHROMA_PERSIST_DIR) -> str:
+    """Directory holding the index readers should open right now."""
+    name = current_version(root)
+    return version_dir(name, root) if name else root
+
+
+def list_versions(root: str = CHROMA_PERSIST_DIR) -> List[str]:
+    """Version names, oldest first (names start with a UTC timestamp, to the microsecond)."""
+    try:
+        return sorted(d for d in os.listdir(os.path.join(root, VERSIONS_SUBDIR))
+                      if os.path.isdir(version_dir(d, root)))
+    except OSError:
+        return []
+
+
+def new_version(root: str = CHROMA_PERSIST_DIR) -> str:
+    """Create a new version directory holding a copy of the active index; returns its name.
+
+    The copy lets build_index stay incremental: only sources that changed since
+    the active version get embedded.
+    """
+    now = time.time()
+    name = time.strftime("%Y%m%d-%H%M%S", time.gmtime(now)) + f"{int(now % 1 * 1e6):06d}-" + secrets.token_hex(2)
+    dest = version_dir(name, root)
+    current = current_version(root)
+    if current:
+        shutil.copytree(version_dir(current, root), dest)
+    else:
+        os.makedirs(dest)
+        if os.path.isdir(root):
+            for entry in os.listdir(root):
+                if entry in (VERSIONS_SUBDIR, CURRENT_FILE, CURRENT_FILE + ".tmp"):
+                    continue
+                src = os.path.join(root, entry)
+                if os.path.isdir(src):
+                    shutil.copytree(src, os.path.join(dest, entry))
+                else:
+                    shutil.copy2(src, os.path.join(dest, entry))
+    return name
+
+
+def activate(name: str, root: str = CHROMA_PERSIST_DIR) -> None:
+    """Point CURRENT at `name` atomically."""
+    if not os.path.isdir(version_dir(name, root)):
+        raise FileNotFoundError(f"No index version {name!r}")
+    tmp = os.path.join(root, CURRENT_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(name + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(root, CURRENT_FILE))
+
+
+def discard(name: str, root: str = CHROMA_PERSIST_DIR) -> None:
+    """Delete a version directory (never the active one)."""
+    if name == current_version(root):
+        raise ValueError(f"{name!r} is the active index version")
+    shutil.rmtree(version_dir(name, root), ignore_errors=True)
+
+
+def prune(keep: int, root: str = CHROMA_PERSIST_DIR, protect: Iterable[Optional[str]] = ()) -> List[str]:
+    """Delete all but the active version and the `keep` newest others (never one in `protect`); returns what was removed."""
+    current = current_version(root)
+    others = [v for v in list_versions(root) if v != current]
+    spared = set(protect)
+    removed = [v for v in others[:max(len(others) - keep, 0)] if v not in spared]
+    for name in removed:
+        discard(name, root)
+    return removed
@@ -0,0 +1,116 @@
+# app/rag/lexical.py
+import json, os, re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.rag.index_versions import active_dir
+
+LEXICAL_SUBDIR = "lexical"  # inside the index directory
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or that the this to was were will with "
+    "day days plan my me i want get".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+class LexicalIndex:
+    """BM25 over chunk texts, stored as a CSR inverted index.
+
+    Term t's postings are rows indptr[t]:indptr[t+1] of `docs` (int32 row numbers) and
+    `weights` (float32, the full precomputed BM25 term weight). A query is then one
+    array slice + scatter-add per query term. Persisted as .npy files, memory-mapped on load.
+    """
+
+    def __init__(self, ids: List[str], vocab: Dict[str, int], indptr: np.ndarray,
+                 docs: np.ndarray, weights: np.ndarray) -> None:
+        self.ids = ids
+        self.vocab = vocab
+        self.indptr = indptr
+        self.docs = docs
+        self.weights = weights
+
+    @classmethod
+    def build(cls, ids: Sequence[str], texts: Sequence[str], k1: float = 1.5, b: float = 0.75) -> "LexicalIndex":
+        vocab: Dict[str, int] = {}
+        rows: List[int] = []
+        terms: List[int] = []
+        tfs: List[int] = []
+        lengths = np.zeros(len(ids), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts: Dict[int, int] = {}
+            toks = tokenize(text)
+            lengths[row] = len(toks)
+            for tok in toks:
+                t = vocab.setdefault(tok, len(vocab))
+                counts[t] = counts.get(t, 0) + 1
+            for t, tf in counts.items():
+                rows.append(row)
+                terms.append(t)
+                tfs.append(tf)
+
+        term_arr = np.asarray(terms, dtype=np.int32)
+        order = np.argsort(term_arr, kind="stable")  # group postings by term, rows stay ascending
+        docs = np.asarray(rows, dtype=np.int32)[order]
+        tf = np.asarray(tfs, dtype=np.float32)[order]
+        df = np.bincount(term_arr, minlength=len(vocab))
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(df, out=indptr[1:])
+
+        n = max(len(ids), 1)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avg_len = float(lengths.mean()) if len(ids) else 1.0
+        norm = k1 * (1 - b + b * lengths[docs] / (avg_len or 1.0))
+        weights = np.repeat(idf, df) * tf * (k1 + 1) / (tf + norm)
+        return cls(list(ids), vocab, indptr, docs, weights.astype(np.float32))
+
+    def search(self, query: str, n: int) -> Tuple[List[str], np.ndarray]:
+        """Top-n chunk ids for the query with their BM25 scores, best first."""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for tok in set(tokenize(query)):
+            t = self.vocab.get(tok)
+            if t is None:
+                continue
+            lo, hi = self.indptr[t], self.indptr[t + 1]
+            scores[self.docs[lo:hi]] += self.weights[lo:hi]
+        hit = np.flatnonzero(scores)
+        if n < len(hit):
+            hit = hit[np.argpartition(-scores[hit], n - 1)[:n]]
+        hit = hit[np.argsort(-scores[hit], kind="stable")]
+        return [self.ids[i] for i in hit], scores[hit]
+
+    # --- persistence ---
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        for name in ("indptr", "docs", "weights"):
+            tmp = os.path.join(path, f"{name}.tmp.npy")
+            np.save(tmp, getattr(self, name))
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+        # terms.json last: its presence marks a complete index
+        tmp = os.path.join(path, "terms.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "terms": sorted(self.vocab, key=self.vocab.get)}, f)
+        os.replace(tmp, os.path.join(path, "terms.json"))
+
+    @classmethod
+    def load(cls, path: str) -> Optional["LexicalIndex"]:
+        """The index saved at `path`, or None if there isn't one."""
+        try:
+            with open(os.path.join(path, "terms.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                      for name in ("indptr", "docs", "weights")]
+        except (OSError, ValueError):
+            return None
+        vocab = {term: i for i, term in enumerate(meta["terms"])}
+        return cls(meta["ids"], vocab, *arrays)
+
+
+def open_lexical_index(persist_dir: Optional[str] = None) -> Optional[LexicalIndex]:
+    """The lexical index written by build_index next to the vector store, if any."""
+    return LexicalIndex.load(os.path.join(persist_dir or active_dir(), LEXICAL_SUBDIR))
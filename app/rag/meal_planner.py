@@ -0,0 +1,156 @@
+# app/rag/meal_planner.py
+"""Constraint-aware day planning over the RecipeCatalog's NumPy arrays.
+
+Each day is chosen by scoring breakfast × lunch × dinner combinations in one
+broadcast expression. The catalog is never scanned in Python per slot. Rules
+follow prompts.SYSTEM_RULES:
+  - hard: no dish name twice in the same day; each slot draws from its meal type
+  - soft: meet the daily kcal / protein targets parsed from the goal
+  - soft: avoid repeating a dish from an earlier day
+  - soft: avoid the same cuisine twice in a day
+Protein and grain repeats are fine. Slot pools are capped at POOL_SIZE recipes.
+Half are the best fit for the per-meal share of the targets and half are random,
+and the score cube gets random tie-breaking noise. Plans therefore vary between
+requests, and the cost stays flat for 10k+ recipe catalogs.
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+MEALS = ("breakfast", "lunch", "dinner")
+POOL_SIZE = 40  # per slot → at most 40³ = 64k combinations scored per day
+
+# Penalty weights (lower total score wins)
+W_KCAL = 4.0          # per unit of relative kcal deviation outside the target range
+W_PROTEIN = 3.0       # per unit of relative protein shortfall
+W_REPEAT_DAY = 1.0    # per dish already used on an earlier day
+W_SAME_CUISINE = 0.1  # per pair of same-cuisine dishes in a day
+NOISE = 0.05          # random tie-breaking so equal plans vary
+
+# "2,200" (thousands separator) or "2200" / "2200.5" / "2200,5" (decimal comma)
+_NUM = r"(\d{1,2}(?:,\d{3})+(?:\.\d+)?(?!\d)|\d{3,4}(?:[.,]\d+)?)"
+_THOUSANDS = re.compile(r"\d{1,3}(?:,\d{3})+(?:\.\d+)?")
+_KCAL = r"\s*(?:k?cals?|kilocalories|calories)\b"
+_KCAL_RANGE = re.compile(_NUM + r"\s*(?:-|–|to)\s*" + _NUM + _KCAL)
+_KCAL_MAX = re.compile(r"(?:under|below|less than|max(?:imum)?|at most|up to|<=?|≤)\s*" + _NUM + _KCAL)
+_KCAL_MIN = re.compile(r"(?:over|above|more than|min(?:imum)?|at least|>=?|≥)\s*" + _NUM + _KCAL)
+_KCAL_ABOUT = re.compile(_NUM + _KCAL)
+_PROTEIN = re.compile(r"(\d{2,3})\s*(?:g|grams?)\s*(?:of\s+)?protein\b")
+
+def _f(s: str) -> float:
+    return float(s.replace(",", "") if _THOUSANDS.fullmatch(s) else s.replace(",", "."))
+
+def parse_targets(goal: Optional[str]) -> Dict[str, float]:
+    """Daily targets stated in a goal: any of kcal_min, kcal_max, protein_min.
+
+    "under 2200 kcal" → kcal_max 2200 (and a soft floor at 75% of it, so the plan
+    isn't simply the smallest meals); "1800-2000 calories" → both bounds;
+    "about 2000 kcal" → ±10%; "150g protein" → protein_min 150.
+    """
+    low = (goal or "").lower()
+    out: Dict[str, float] = {}
+    m = _KCAL_RANGE.search(low)
+    if m:
+        lo, hi = sorted((_f(m.group(1)), _f(m.group(2))))
+        out.update(kcal_min=lo, kcal_max=hi)
+    elif _KCAL_MAX.search(low):
+        hi = _f(_KCAL_MAX.search(low).group(1))
+        out.update(kcal_min=0.75 * hi, kcal_max=hi)
+    elif _KCAL_MIN.search(low):
+        out.update(kcal_min=_f(_KCAL_MIN.search(low).group(1)))
+    elif _KCAL_ABOUT.search(low):
+        mid = _f(_KCAL_ABOUT.search(low).group(1))
+        out.update(kcal_min=0.9 * mid, kcal_max=1.1 * mid)
+    m = _PROTEIN.search(low)
+    if m:
+        out["protein_min"] = float(m.group(1))
+    return out
+
+
+def _pool(catalog: Any, eligible: np.ndarray, targets: Dict[str, float], rng: np.random.Generator) -> np.ndarray:
+    """Up to POOL_SIZE candidate ids: the best per-meal fit to the targets plus a random draw."""
+    ids = np.flatnonzero(eligible)
+    if len(ids) <= POOL_SIZE:
+        return ids
+    # Random part drawn with replacement: O(pool) instead of a permutation of every id;
+    # a recipe occasionally appearing twice in a pool is harmless
+    if not targets:
+        return ids[rng.integers(0, len(ids), POOL_SIZE)]
+    fit = np.zeros(len(ids), dtype=np.float32)
+    share = [targets[k] / len(MEALS) for k in ("kcal_min", "kcal_max") if k in targets]
+    if share:
+        mid = sum(share) / len(share)
+        fit += np.abs(catalog.kcal[ids] - mid) / max(mid, 1.0)
+    if "protein_min" in targets:
+        per_meal = targets["protein_min"] / len(MEALS)
+        fit += np.maximum(per_meal - catalog.protein_g[ids], 0) / per_meal
+    half = POOL_SIZE // 2
+    best = ids[np.argpartition(fit, half)[:half]]
+    return np.concatenate([best, ids[rng.integers(0, len(ids), POOL_SIZE - half)]])
+
+
+def _range_penalty(total: np.ndarray, lo: Optional[float], hi: Optional[float]) -> np.ndarray:
+    pen = np.zeros_like(total)
+    if lo is not None:
+        pen += np.maximum(lo - total, 0) * np.float32(1.0 / max(lo, 1.0))
+    if hi is not None:
+        pen += np.maximum(total - hi, 0) * np.float32(1.0 / max(hi, 1.0))
+    return pen
+
+
+def _pair(values: np.ndarray, p: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """Equality matrix of values[p] vs values[q]."""
+    return values[p][:, None] == values[q][None, :]
+
+
+def plan_days(catalog: Any, allowed: np.ndarray, days: int = 3, goal: Optional[str] = None,
+              seed: Optional[int] = None) -> List[Dict[str, int]]:
+    """Recipe ids per day ({"breakfast": id, "lunch": id, "dinner": id}) for `days` days.
+
+    `allowed` is a boolean mask over catalog.recipes (e.g. the diet filter); nothing
+    is planned if it is empty. A slot with no allowed recipe of its meal type falls
+    back to every allowed recipe.
+    The breakfast × lunch × dinner score cube is built once per request; each day
+    takes an argmin, then bumps the slices holding the dishes it picked.
+    """
+    rng = np.random.default_rng(seed)
+    targets = parse_targets(goal)
+    n = len(catalog.recipes)
+    if n == 0 or not allowed.any():
+        return []
+    pools = []
+    for meal in MEALS:
+        m = catalog.meal_masks.get(meal, np.zeros(n, dtype=bool)) & allowed
+        pools.append(_pool(catalog, m if m.any() else allowed, targets, rng))
+    b, l, d = pools
+
+    # Pairwise terms: same dish name in one day (hard), same cuisine (soft); per-recipe noise rides along
+    names, cuisines = catalog.name_code, catalog.cuisine_code
+    noise = [NOISE * rng.random(len(p), dtype=np.float32) for p in pools]
+    bl = 1e6 * _pair(names, b, l) + W_SAME_CUISINE * _pair(cuisines, b, l) + noise[0][:, None] + noise[1][None, :]
+    bd = 1e6 * _pair(names, b, d) + W_SAME_CUISINE * _pair(cuisines, b, d) + noise[2][None, :]
+    ld = 1e6 * _pair(names, l, d) + W_SAME_CUISINE * _pair(cuisines, l, d)
+    score = bl.astype(np.float32)[:, :, None] + bd.astype(np.float32)[:, None, :]
+    score += ld.astype(np.float32)[None, :, :]
+    if "kcal_min" in targets or "kcal_max" in targets:
+        kcal = catalog.kcal
+        total = kcal[b][:, None, None] + kcal[l][None, :, None] + kcal[d][None, None, :]
+        score += W_KCAL * _range_penalty(total, targets.get("kcal_min"), targets.get("kcal_max"))
+    if "protein_min" in targets:
+        prot = catalog.protein_g
+        total = prot[b][:, None, None] + prot[l][None, :, None] + prot[d][None, None, :]
+        score += W_PROTEIN * _range_penalty(total, targets["protein_min"], None)
+
+    pool_names = [names[p] for p in pools]
+    out: List[Dict[str, int]] = []
+    for _ in range(days):
+        i, j, k = np.unravel_index(int(np.argmin(score)), score.shape)
+        day = {"breakfast": int(b[i]), "lunch": int(l[j]), "dinner": int(d[k])}
+        out.append(day)
+        # Repeat penalty for later days: only the slices holding a picked dish change
+        for rid in day.values():
+            for axis, slot_names in enumerate(pool_names):
+                for pos in np.flatnonzero(slot_names == names[rid]):
+                    score[(slice(None),) * axis + (pos,)] += W_REPEAT_DAY  # a view, so this is in place
+    return out
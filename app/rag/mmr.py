@@ -0,0 +1,40 @@
+# app/rag/mmr.py
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+
+def mmr_select(query: Optional[Sequence[float]], candidates: np.ndarray, k: int, lambda_mult: float = 0.5,
+               relevance: Optional[np.ndarray] = None) -> List[int]:
+    """Maximal marginal relevance over candidate vectors, vectorized with NumPy.
+
+    Returns up to k row indices of `candidates`, in selection order. Relevance is one
+    matrix-vector product; each pick then costs one more (n × d) product to update the
+    running max-similarity-to-selected, so the loop is O(k · n · d) with no Python
+    work per candidate.
+
+    `relevance` replaces the query cosine (e.g. fused or BM25 scores scaled to [0, 1]);
+    `query` may then be None.
+    """
+    cands = np.asarray(candidates, dtype=np.float32)
+    n = cands.shape[0] if cands.ndim == 2 else 0
+    if n == 0 or k <= 0:
+        return []
+    cands = cands / np.maximum(np.linalg.norm(cands, axis=1, keepdims=True), 1e-12)
+    if relevance is None:
+        q = np.asarray(query, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+        relevance = cands @ q
+    else:
+        relevance = np.asarray(relevance, dtype=np.float32)
+    max_sim = np.full(n, -np.inf, dtype=np.float32)
+    taken = np.zeros(n, dtype=bool)
+    picked: List[int] = []
+    for _ in range(min(k, n)):
+        score = lambda_mult * relevance - (1.0 - lambda_mult) * max_sim if picked else relevance.copy()
+        score[taken] = -np.inf
+        i = int(np.argmax(score))
+        picked.append(i)
+        taken[i] = True
+        max_sim = np.maximum(max_sim, cands @ cands[i])
+    return picked
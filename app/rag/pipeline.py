@@ -1,142 +1,25 @@
-import json, time
-from typing import List, Dict, Any
-from openai import OpenAI
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Chroma
-from app.config import CHROMA_PERSIST_DIR, EMBED_MODEL, CHAT_MODEL, TOP_K, OPENAI_API_KEY
-
-import re
-import os, random
-
-RECIPES_JSON = os.path.join(os.path.dirname(__file__), "..", "data", "recipes.json")
-
-def _load_recipes(path: str) -> List[Dict[str, Any]]:
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def _group_by_meal(recipes: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
-    groups: Dict[str, List[Dict[str, Any]]] = {"breakfast": [], "lunch": [], "dinner": []}
-    for r in recipes:
-        for m in (r.get("meal") or []):
-            if m in groups:
-                groups[m].append(r)
-    return groups
-
-def select_meal_skeleton(days: int = 3, seed: int | None = None, dietary_restrictions: str | None = None) -> List[Dict[str, Dict[str, Any]]]:
-    """Pick meals directly from recipes.json without any diversify module.
-    
-    Args:
-        days: Number of days to plan
-        seed: Random seed for reproducible selection
-        dietary_restrictions: String containing dietary restrictions (e.g., "vegan", "vegetarian", "gluten-free")
-    
-    Returns a list of day dicts like:
-    [{"breakfast": recipe, "lunch": recipe, "dinner": recipe}, ...]
-    """
-    rng = random.Random(seed or random.randint(0, 10_000))
-    recipes = _load_recipes(RECIPES_JSON)
-    
-    # Filter recipes based on dietary restrictions
-    if dietary_restrictions:
-        restrictions_lower = dietary_restrictions.lower()
-        filtered_recipes = []
-        
-        for recipe in recipes:
-            recipe_diets = [d.lower() for d in recipe.get("diet", [])]
-            
-            # Check if recipe matches dietary restrictions
-            if "vegan" in restrictions_lower:
-                if "vegan" in recipe_diets:
-                    filtered_recipes.append(recipe)
-            elif "vegetarian" in restrictions_lower:
-                if "vegetarian" in recipe_diets or "vegan" in recipe_diets:
-                    filtered_recipes.append(recipe)
-            elif "gluten-free" in restrictions_lower:
-                if "gluten-free" in recipe_diets:
-                    filtered_recipes.append(recipe)
-            elif "dairy-free" in restrictions_lower:
-                if "dairy-free" in recipe_diets:
-                    filtered_recipes.append(recipe)
-            elif "low-carb" in restrictions_lower:
-                if "low-carb" in recipe_diets:
-                    filtered_recipes.append(recipe)
-            elif "keto" in restrictions_lower:
-                if "keto" in recipe_diets:
-                    filtered_recipes.append(recipe)
-            elif "paleo" in restrictions_lower:
-                if "paleo" in recipe_diets:
-                    filtered_recipes.append(recipe)
-            else:
-                # If no specific diet match, include the recipe
-                filtered_recipes.append(recipe)
-        
-        recipes = filtered_recipes if filtered_recipes else recipes  # Fallback to all if no matches
-    
-    groups = _group_by_meal(recipes)
-
-    # fallback if any bucket is empty
-    breakfasts = groups.get("breakfast") or recipes
-    lunches = groups.get("lunch") or recipes
-    dinners = groups.get("dinner") or recipes
-
-    # avoid duplicates within the plan when possible
-    used_names = set()
-    out: List[Dict[str, Dict[str, Any]]] = []
-    for _ in range(days):
-        def pick(bucket: List[Dict[str, Any]]) -> Dict[str, Any]:
-            candidates = [r for r in bucket if r.get("name") not in used_names] or bucket
-            choice = rng.choice(candidates)
-            used_names.add(choice.get("name"))
-            return choice
-
-        out.append({
-            "breakfast": pick(breakfasts),
-            "lunch": pick(lunches),
-            "dinner": pick(dinners),
-        })
-    return out
-
-_SENT_END = re.compile(r'([.!?])\s+')
-CASE_TOKENS = (
-    "year-old", "case study", "scenario:", "profile:", "pregnan",  # pregnancy/pregnant
-    "he ", "she ", "his ", "her ", "their ", "jessica", "ines", "madison"
+import asyncio, copy, json, threading, time
+import numpy as np
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Any, Tuple
+from app import metrics
+from app.config import (
+    EMBED_MODEL, CHAT_MODEL, TOP_K, RETRIEVE_MAX_FETCH_K,
+    RETRIEVAL_MODE, RRF_K, EMBED_QUERY_TIMEOUT_S, EMBED_BREAKER_FAILURES, EMBED_BREAKER_COOLDOWN_S,
+    PLAN_BATCH_CONCURRENCY, OPENAI_BASE_URL, require_openai_key,
 )
-
-def _clip_to_sentences(text: str, max_chars: int = 900) -> str:
-    """Trim leading/trailing partial sentences and cap length."""
-    t = (text or "").strip()
-    if not t:
-        return t
-    # Snap start: drop up to first full stop if first sentence seems mid-way
-    first_dot = t.find(". ")
-    if 0 <= first_dot <= 80:  # early fragment → start after first complete sentence
-        t = t[first_dot+2:].lstrip()
-    # Snap end: cut at nearest sentence end under max_chars
-    if len(t) > max_chars:
-        cut = t.rfind(". ", 0, max_chars)
-        if cut == -1:
-            cut = t.rfind("? ", 0, max_chars)
-        if cut == -1:
-            cut = t.rfind("! ", 0, max_chars)
-        t = (t[: cut+1] if cut != -1 else t[: max_chars]).strip()
-    return t
-
-CASE_TOKENS = (
-    "year-old", "case study", "scenario:", "example:", "for example",
-    "patient", "subject", "participant", "individual", "client",
-    "male,", "female,", "he was", "she was", "they were", "his ", "her ",
-    "their ", "doctor", "physician", "nurse", "trainer"
-)
-
-def _looks_case_study(text: str) -> bool:
-    """
-    Detects text that looks like an anecdote, profile, or case study.
-    """
-    low = (text or "").lower()
-    # flag snippets that mention a personal narrative or singular subject
-    return any(tok in low for tok in CASE_TOKENS)
-
-
+from app.rag.cache import flight_key, plan_cache, plan_flights
+from app.rag.embedding_store import get_embeddings
+from app.rag.index_versions import active_dir
+from app.rag.lexical import open_lexical_index
+from app.rag.mmr import mmr_select
+from app.rag.quality import quality_flags
+from app.rag.recipes import plan_meals
+from app.rag.restrictions import NoMatchingRecipes
+from app.rag.streaming import JsonArrayStreamer
+from app.rag.vectorstore import open_vector_store
+
+# Only chunks enriched by build_index carry these flags; see _select_snippets for older indexes
+CLEAN_WHERE = {"is_boilerplate": False}
 
 SYSTEM_PROMPT = (
     "You are LifeSync, an evidence-aware wellness assistant. "
@@ -148,147 +31,662 @@ SYSTEM_PROMPT = (
     "plan.tips (array of 2–5 tips), plan.caution (string)."
 )
 
-class RagPlanner:
-    def __init__(self) -> None:
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
-        self.emb = OpenAIEmbeddings(model=EMBED_MODEL)
-        self.vs = Chroma(embedding_function=self.emb, persist_directory=CHROMA_PERSIST_DIR)
+@metrics.timed(metrics.STAGE_SECONDS, stage="parse_json")
+def _parse_plan_json(raw_content: str | None) -> Dict[str, Any]:
+    raw_content = raw_content or "{}"
+    try:
+        return json.loads(raw_content)
+    except Exception:
+        return {"plan": {"raw": raw_content}}
+
+def _fill_meals(out: Dict[str, Any], picks: List[Dict[str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """Fill plan.days[*].meals in place with the full recipe dicts from `picks`."""
+    for i, day in enumerate(out.get("plan", {}).get("days", [])):
+        if i < len(picks):
+            sel = picks[i]
+            day_meals = day.get("meals") or {}
+            # Include full meal details instead of just names
+            day_meals["breakfast"] = sel["breakfast"]
+            day_meals["lunch"] = sel["lunch"]
+            day_meals["dinner"] = sel["dinner"]
+            day["meals"] = day_meals
+    return out
 
-    def retrieve(self, query: str, k: int = TOP_K) -> List[Dict[str, Any]]:
-        docs = self.vs.max_marginal_relevance_search(
-            query, k=k, fetch_k=max(16, k * 4), lambda_mult=0.5
-        )
-        strong, weak = [], []  # strong = generalizable, weak = case-study-ish
-        seen = set()
-
-        for d in docs:
-            m = d.metadata or {}
-            raw = (d.page_content or "").strip()
-            low = raw.lower()
-
-            # Drop boilerplate
-            if any(tok in low for tok in (
-                "available at", "myplate.gov", "subscribe", "sign up", "privacy policy",
-                "newsletter", "back to top"
-            )):
-                continue
+def _upstream_calls(ctx: "PlanContext") -> List[str]:
+    """Embedding / vector search / LLM calls this request made, for single-flight accounting."""
+    calls = ["embed"] if ctx.results.get("embed") is not None else []
+    if "retrieve" in ctx.results:
+        calls.append("retrieve")
+        if ctx.results["retrieve"]:
+            calls.append("summarize")
+    return calls + (["generate"] if "generate" in ctx.results else [])
+
+
+def _stack(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    if not len(a):
+        return b
+    return np.vstack([a, b]) if len(b) else a
+
+def _select_snippets(docs: List[Any], vecs: Any, query_vec: List[float] | None, k: int,
+                     relevance: np.ndarray | None = None) -> Tuple[List[Dict[str, Any]], int]:
+    """Quality-filter candidates, then diversify the clean ones with MMR.
+
+    Returns (up to k snippets, number of clean candidates). Filtering happens before
+    MMR so dropped boilerplate never takes one of the k slots. `relevance` (one score
+    per doc) replaces the query cosine in MMR for hybrid/lexical retrieval. Clipped text and flags
+    come from ingest-time metadata; they are only recomputed for chunks indexed
+    before enrichment existed.
+    """
+    clean_rows, items, weak_flags = [], [], []
+    seen = set()
+
+    for i, d in enumerate(docs):
+        m = d.metadata or {}
+        if "clipped_text" not in m:
+            m = {**m, **quality_flags(d.page_content)}
+        if m["is_boilerplate"]:
+            continue
+        txt = m["clipped_text"]
+
+        # Dedup by (source, page, head)
+        sig = (m.get("source"), m.get("page"), txt[:220].lower())
+        if sig in seen:
+            continue
+        seen.add(sig)
+
+        clean_rows.append(i)
+        items.append({"text": txt, "source": m.get("source"), "page": m.get("page")})
+        weak_flags.append(m["is_case_study"])
+
+    rel = None if relevance is None else relevance[clean_rows]
+    picked = mmr_select(query_vec, vecs[clean_rows], k, lambda_mult=0.5, relevance=rel) if clean_rows else []
+    # Prefer generalizable evidence first, then fill with case-studies if needed
+    strong = [items[j] for j in picked if not weak_flags[j]]
+    weak = [items[j] for j in picked if weak_flags[j]]
+    return strong + weak, len(clean_rows)
+
+def _summary_messages(goal: str, snippets: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    bullet_context = "\n\n".join(
+        f"- {s['text']}\n  [Source: {s.get('source')} p.{s.get('page')}]"
+        for s in snippets
+    )
+    return [
+        {"role": "system", "content":
+            "You are an evidence summarizer. Turn excerpts into concise, universally applicable guidance. "
+            "Strip anecdotes/names; keep the general rule. Output 4–8 bullets. "
+            "KEEP the bracketed citations exactly as provided at the end of each bullet."
+        },
+        {"role": "user", "content":
+            f"GOAL: {goal}\n\nEXCERPTS WITH CITATIONS:\n{bullet_context}\n\n"
+            "Write general guidance bullets (no anecdotes), each ending with the supplied [Source: ...] citation."
+        }
+    ]
+
+def _plan_messages(goal: str, evidence: str) -> List[Dict[str, str]]:
+    user = (
+        f"GOAL: {goal}\n\n"
+        "EVIDENCE (generalized, cite-aware bullets):\n"
+        f"{evidence}\n\n"
+        "Now produce STRICT JSON (we will fill meals programmatically):\n"
+        "IMPORTANT: Provide detailed, specific workout descriptions for each day. Include exercise types, duration, sets/reps where applicable, and focus areas.\n"
+        "{\n"
+        '  "plan": {\n'
+        '    "days": [\n'
+        '      {"day":"Day 1","meals":{"breakfast":"","lunch":"","dinner":""},"workout":"Specific workout with exercises, duration, and focus"},\n'
+        '      {"day":"Day 2","meals":{"breakfast":"","lunch":"","dinner":""},"workout":"Specific workout with exercises, duration, and focus"},\n'
+        '      {"day":"Day 3","meals":{"breakfast":"","lunch":"","dinner":""},"workout":"Specific workout with exercises, duration, and focus"}\n'
+        "    ],\n"
+        '    "tips": ["Specific tip 1","Specific tip 2","Specific tip 3"],\n'
+        '    "caution": "Specific cautionary advice"\n'
+        "  }\n"
+        "}\n"
+    )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user},
+    ]
+
+class PlanContext:
+    """Request-scoped state for one /plan call.
+
+    Each named stage runs at most once per request; later lookups return the
+    memoized value. Wall-clock time per stage is recorded for the response.
+    """
 
-            # Clip to sentence boundaries
-            txt = _clip_to_sentences(raw)
+    def __init__(self, goal: str, profile: Dict[str, Any] | None = None) -> None:
+        self.goal = goal
+        self.profile = profile or {}
+        self.restrictions: str | None = self.profile.get("restrictions") or None
+        self.t0 = time.perf_counter()
+        self.results: Dict[str, Any] = {}
+        self.timings: Dict[str, int] = {}
+        self.cache = "miss"
+        self.meal_filter: Dict[str, Any] | None = None
+
+    def pick_meals(self) -> List[Dict[str, Dict[str, Any]]]:
+        """Three days of catalog recipes for this request; records how restrictions were applied."""
+        picks, self.meal_filter = plan_meals(days=3, dietary_restrictions=self.restrictions, goal=self.goal)
+        return picks
+
+    def record(self, name: str, t: float) -> None:
+        """Book the time since perf_counter() value `t` to stage `name`."""
+        elapsed = time.perf_counter() - t
+        self.timings[name] = int(elapsed * 1000)
+        metrics.STAGE_SECONDS.observe(elapsed, stage=name)
+
+    def stage(self, name: str, fn: Callable[[], Any]) -> Any:
+        if name not in self.results:
+            t = time.perf_counter()
+            self.results[name] = fn()
+            self.record(name, t)
+        return self.results[name]
+
+    async def astage(self, name: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if name not in self.results:
+            t = time.perf_counter()
+            self.results[name] = await fn()
+            self.record(name, t)
+        return self.results[name]
+
+    def response(self, out: Dict[str, Any], retrieved: List[Dict[str, Any]], evidence: str) -> Dict[str, Any]:
+        return {
+            "goal": self.goal,
+            **out,
+            "retrieved": retrieved,
+            "evidence_summary": evidence,
+            "latency_ms": int((time.perf_counter() - self.t0) * 1000),
+            "stage_ms": dict(self.timings),
+            "cache": self.cache,
+            "meal_filter": self.meal_filter,
+        }
 
-            # Dedup by (source, page, head)
-            sig = (m.get("source"), m.get("page"), txt[:220].lower())
-            if sig in seen or not txt:
+class RagPlanner:
+    def __init__(self) -> None:
+        from openai import AsyncOpenAI, OpenAI
+
+        api_key = require_openai_key()
+        self.client = OpenAI(api_key=api_key, base_url=OPENAI_BASE_URL)
+        self.aclient = AsyncOpenAI(api_key=api_key, base_url=OPENAI_BASE_URL)
+        # No retries: a slow or failing embedding endpoint should fail over to lexical within one timeout
+        self.emb = get_embeddings(EMBED_MODEL, request_timeout=EMBED_QUERY_TIMEOUT_S, max_retries=0)
+        # Breaker state, updated from the event loop and from threads running the sync plan()
+        self._embed_lock = threading.Lock()
+        self._embed_failures = 0
+        self._embed_skip_until = 0.0
+        self.reload_indexes()
+
+    def reload_indexes(self) -> None:
+        """(Re)open the vector store and the BM25 index of the active index version, e.g. after a reindex."""
+        persist_dir = active_dir()
+        store, lexical = open_vector_store(self.emb, persist_dir=persist_dir), open_lexical_index(persist_dir)
+        self.store, self.lexical = store, lexical  # swap both together
+
+    def _embed_enabled(self) -> bool:
+        """False when retrieval goes lexical-only: by config, or while the embedding breaker is open."""
+        if self.lexical is None:
+            return True
+        if RETRIEVAL_MODE == "lexical":
+            return False
+        with self._embed_lock:
+            return time.monotonic() >= self._embed_skip_until
+
+    def _embedding_ok(self) -> None:
+        with self._embed_lock:
+            self._embed_failures = 0
+
+    def _embedding_failed(self, e: Exception) -> None:
+        if self.lexical is None:
+            raise e
+        msg = f"[rag] query embedding failed ({type(e).__name__}: {e}); answering from the lexical index"
+        with self._embed_lock:
+            self._embed_failures += 1
+            failures = self._embed_failures
+            if failures >= EMBED_BREAKER_FAILURES:
+                # Half-open after the cooldown: the next request tries again, one more failure re-opens
+                self._embed_skip_until = time.monotonic() + EMBED_BREAKER_COOLDOWN_S
+                msg += f", without embedding for {EMBED_BREAKER_COOLDOWN_S:g}s after {failures} failures"
+        print(msg)
+
+    def _embed_query(self, query: str) -> List[float] | None:
+        """Query vector, or None when retrieval should (or must) go lexical-only."""
+        if not self._embed_enabled():
+            return None
+        try:
+            vec = self.emb.embed_query(query)
+        except Exception as e:
+            self._embedding_failed(e)
+            return None
+        self._embedding_ok()
+        return vec
+
+    async def _aembed_query(self, query: str) -> List[float] | None:
+        if not self._embed_enabled():
+            return None
+        try:
+            vec = await asyncio.wait_for(self.emb.aembed_query(query), EMBED_QUERY_TIMEOUT_S)
+        except Exception as e:
+            self._embedding_failed(e)
+            return None
+        self._embedding_ok()
+        return vec
+
+    def retrieve(self, query: str, k: int = TOP_K, vec: List[float] | None = None) -> List[Dict[str, Any]]:
+        if vec is None:
+            vec = self._embed_query(query)
+        return self._search(query, vec, k)
+
+    def _search(self, query: str, vec: List[float] | None, k: int,
+                first: Tuple[List[Any], np.ndarray] | None = None) -> List[Dict[str, Any]]:
+        """Fetch candidates, widening fetch_k until k clean snippets survive filtering.
+
+        `first` is an already-fetched vector hit list for the initial fetch_k (batch path).
+        """
+        fetch_k = max(16, k * 4)
+        where = CLEAN_WHERE
+        while True:
+            docs, vecs, relevance, exhausted = self._candidates(query, vec, fetch_k, where, first)
+            first = None
+            if not docs and where is not None and vec is not None and self.store.count():
+                # Index predates ingest-time enrichment → filter in Python instead
+                where = None
                 continue
-            seen.add(sig)
-
-            item = {"text": txt, "source": m.get("source"), "page": m.get("page")}
-            if _looks_case_study(txt):
-                weak.append(item)
-            else:
-                strong.append(item)
-
-        # Prefer generalizable evidence first, then fill with case-studies if needed
-        merged = strong + weak
-        return merged[:k]
+            snippets, n_clean = _select_snippets(docs, vecs, vec, k, relevance)
+            if n_clean >= k or exhausted or fetch_k >= RETRIEVE_MAX_FETCH_K:
+                return snippets
+            fetch_k = min(fetch_k * 2, RETRIEVE_MAX_FETCH_K)
+
+    def _candidates(self, query: str, vec: List[float] | None, n: int, where: Dict[str, Any] | None,
+                    vector_hits: Tuple[List[Any], np.ndarray] | None = None,
+                    ) -> Tuple[List[Any], np.ndarray, np.ndarray | None, bool]:
+        """Up to ~n candidates per source: (docs, vectors, relevance or None for cosine, exhausted).
+
+        Hybrid fuses the vector and BM25 rankings with reciprocal rank fusion; without a
+        query vector only BM25 is used. The lexical index never contains boilerplate chunks.
+        """
+        lexical = self.lexical if RETRIEVAL_MODE != "vector" else None
+        if vec is None:
+            if self.lexical is None:
+                raise RuntimeError("No query embedding and no lexical index; run build_index")
+            with metrics.timed(metrics.STAGE_SECONDS, stage="lexical_search"):
+                ids, scores = self.lexical.search(query, n)
+            with metrics.timed(metrics.STAGE_SECONDS, stage="vector_search"):
+                docs, vecs = self.store.get(ids)
+            by_id = dict(zip(ids, scores))
+            relevance = np.asarray([by_id[d.id] for d in docs], dtype=np.float32)
+            return docs, vecs, relevance / max(float(relevance.max(initial=0.0)), 1e-12), len(ids) < n
+
+        if vector_hits is not None:
+            docs, vecs = vector_hits
+        else:
+            with metrics.timed(metrics.STAGE_SECONDS, stage="vector_search"):
+                docs, vecs = self.store.candidates(vec, n, where=where)
+        if lexical is None:
+            return docs, vecs, None, len(docs) < n
+        with metrics.timed(metrics.STAGE_SECONDS, stage="lexical_search"):
+            lex_ids, _ = lexical.search(query, n)
+        fused: Dict[str, float] = {}
+        for rank, d in enumerate(docs):
+            fused[d.id] = 1.0 / (RRF_K + rank + 1)
+        for rank, cid in enumerate(lex_ids):
+            fused[cid] = fused.get(cid, 0.0) + 1.0 / (RRF_K + rank + 1)
+        seen = {d.id for d in docs}
+        extra_docs, extra_vecs = self.store.get([cid for cid in lex_ids if cid not in seen])
+        exhausted = len(docs) < n and len(lex_ids) < n
+        docs, vecs = docs + extra_docs, _stack(vecs, extra_vecs)
+        relevance = np.asarray([fused[d.id] for d in docs], dtype=np.float32)
+        return docs, vecs, relevance / max(float(relevance.max(initial=0.0)), 1e-12), exhausted
 
     def summarize_evidence(self, goal: str, snippets: List[Dict[str, Any]]) -> str:
         """Ask the model to generalize case-like snippets into universal guidance with bracket citations."""
         if not snippets:
             return ""
-        bullet_context = "\n\n".join(
-            f"- {s['text']}\n  [Source: {s.get('source')} p.{s.get('page')}]"
-            for s in snippets
-        )
-        messages = [
-            {"role": "system", "content":
-                "You are an evidence summarizer. Turn excerpts into concise, universally applicable guidance. "
-                "Strip anecdotes/names; keep the general rule. Output 4–8 bullets. "
-                "KEEP the bracketed citations exactly as provided at the end of each bullet."
-            },
-            {"role": "user", "content":
-                f"GOAL: {goal}\n\nEXCERPTS WITH CITATIONS:\n{bullet_context}\n\n"
-                "Write general guidance bullets (no anecdotes), each ending with the supplied [Source: ...] citation."
-            }
-        ]
         resp = self.client.chat.completions.create(
             model=CHAT_MODEL,
-            messages=messages,
+            messages=_summary_messages(goal, snippets),
             temperature=0.2
         )
+        metrics.record_usage("summarize", CHAT_MODEL, resp.usage)
         return resp.choices[0].message.content.strip()
 
+    def _to_messages(self, goal: str, evidence: str) -> List[Dict[str, str]]:
+        return _plan_messages(goal, evidence)
 
-    def _to_messages(self, goal: str, retrieved: List[Dict[str, Any]]) -> List[Dict[str, str]]:
-        evidence = self.summarize_evidence(goal, retrieved)
-        user = (
-            f"GOAL: {goal}\n\n"
-            "EVIDENCE (generalized, cite-aware bullets):\n"
-            f"{evidence}\n\n"
-            "Now produce STRICT JSON (we will fill meals programmatically):\n"
-            "IMPORTANT: Provide detailed, specific workout descriptions for each day. Include exercise types, duration, sets/reps where applicable, and focus areas.\n"
-            "{\n"
-            '  "plan": {\n'
-            '    "days": [\n'
-            '      {"day":"Day 1","meals":{"breakfast":"","lunch":"","dinner":""},"workout":"Specific workout with exercises, duration, and focus"},\n'
-            '      {"day":"Day 2","meals":{"breakfast":"","lunch":"","dinner":""},"workout":"Specific workout with exercises, duration, and focus"},\n'
-            '      {"day":"Day 3","meals":{"breakfast":"","lunch":"","dinner":""},"workout":"Specific workout with exercises, duration, and focus"}\n'
-            "    ],\n"
-            '    "tips": ["Specific tip 1","Specific tip 2","Specific tip 3"],\n'
-            '    "caution": "Specific cautionary advice"\n'
-            "  }\n"
-            "}\n"
+    def generate(self, goal: str, evidence: str) -> Dict[str, Any]:
+        resp = self.client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=self._to_messages(goal, evidence),
+            response_format={"type": "json_object"},
+            temperature=0.2,
         )
-        return [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user},
-        ]
-
+        metrics.record_usage("generate", CHAT_MODEL, resp.usage)
+        return _parse_plan_json(resp.choices[0].message.content)
+
+
+    def _plan_body(self, ctx: PlanContext) -> Dict[str, Any]:
+        """Evidence and workouts for ctx.goal: a semantic cache hit, or retrieve → summarize → generate."""
+        goal = ctx.goal
+        vec = ctx.stage("embed", lambda: self._embed_query(goal))
+        cached = plan_cache.get_similar(vec, ctx.restrictions) if vec is not None else None
+        if cached is not None:
+            ctx.cache = "semantic"
+            return {**cached, "calls": _upstream_calls(ctx)}
+        retrieved = ctx.stage("retrieve", lambda: self._search(goal, vec, TOP_K))
+        evidence_bullets = ctx.stage("summarize", lambda: self.summarize_evidence(goal, retrieved))
+        out = ctx.stage("generate", lambda: self.generate(goal, evidence_bullets))
+        value = {"retrieved": retrieved, "evidence_summary": evidence_bullets, "out": out}
+        plan_cache.put(goal, ctx.restrictions, value, vec)
+        return {**value, "calls": _upstream_calls(ctx)}
 
     def plan(self, goal: str, profile: Dict[str, Any] = None) -> Dict[str, Any]:
-        t0 = time.time()
-        retrieved = self.retrieve(goal, k=TOP_K)
-        evidence_bullets = self.summarize_evidence(goal, retrieved)
-        messages = self._to_messages(goal, retrieved)
+        ctx = PlanContext(goal, profile)
+        cached = plan_cache.get_exact(goal, ctx.restrictions)
+        if cached is not None:
+            ctx.cache = "exact"
+        else:
+            # Identical requests already in flight share one computation
+            t = time.perf_counter()
+            cached, shared = plan_flights.do(flight_key(goal, ctx.restrictions), lambda: self._plan_body(ctx))
+            if shared:
+                ctx.cache = "coalesced"
+                ctx.record("coalesced", t)
+                plan_flights.note_saved(cached["calls"])
+        retrieved, evidence_bullets, out = cached["retrieved"], cached["evidence_summary"], cached["out"]
+
+        # Meals are re-drawn on every request, cached or not
+        picks = ctx.stage("fill_meals", ctx.pick_meals)
+        _fill_meals(out, picks)
+        return ctx.response(out, retrieved, evidence_bullets)
+
+    # --- Async path (used by the FastAPI routes) ---
+
+    async def aretrieve(self, query: str, k: int = TOP_K, vec: List[float] | None = None) -> List[Dict[str, Any]]:
+        """Embed with the async client, then run the (blocking) search + MMR off the event loop."""
+        if vec is None:
+            vec = await self._aembed_query(query)
+        return await asyncio.to_thread(self._search, query, vec, k)
+
+    async def asummarize_evidence(self, goal: str, snippets: List[Dict[str, Any]]) -> str:
+        if not snippets:
+            return ""
+        resp = await self.aclient.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=_summary_messages(goal, snippets),
+            temperature=0.2
+        )
+        metrics.record_usage("summarize", CHAT_MODEL, resp.usage)
+        return resp.choices[0].message.content.strip()
 
-        resp = self.client.chat.completions.create(
+    async def agenerate(self, goal: str, evidence: str) -> Dict[str, Any]:
+        resp = await self.aclient.chat.completions.create(
             model=CHAT_MODEL,
-            messages=messages,
+            messages=self._to_messages(goal, evidence),
             response_format={"type": "json_object"},
             temperature=0.2,
         )
-        raw_content = resp.choices[0].message.content or "{}"
+        metrics.record_usage("generate", CHAT_MODEL, resp.usage)
+        return _parse_plan_json(resp.choices[0].message.content)
+
+    async def _aplan_body(self, ctx: PlanContext) -> Dict[str, Any]:
+        goal = ctx.goal
+        vec = await ctx.astage("embed", lambda: self._aembed_query(goal))
+        cached = plan_cache.get_similar(vec, ctx.restrictions) if vec is not None else None
+        if cached is not None:
+            ctx.cache = "semantic"
+            return {**cached, "calls": _upstream_calls(ctx)}
+        retrieved = await ctx.astage("retrieve", lambda: asyncio.to_thread(self._search, goal, vec, TOP_K))
+        evidence_bullets = await ctx.astage("summarize", lambda: self.asummarize_evidence(goal, retrieved))
+        out = await ctx.astage("generate", lambda: self.agenerate(goal, evidence_bullets))
+        value = {"retrieved": retrieved, "evidence_summary": evidence_bullets, "out": out}
+        plan_cache.put(goal, ctx.restrictions, value, vec)
+        return {**value, "calls": _upstream_calls(ctx)}
+
+    async def aplan(self, goal: str, profile: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Async counterpart of `plan`: meal selection runs concurrently with retrieval + LLM calls."""
+        ctx = PlanContext(goal, profile)
+        meals_task = asyncio.create_task(ctx.astage("fill_meals", lambda: asyncio.to_thread(ctx.pick_meals)))
         try:
-            out = json.loads(raw_content)
-        except Exception:
-            out = {"plan": {"raw": raw_content}}
-
-        # Extract dietary restrictions from profile
-        dietary_restrictions = None
-        if profile and profile.get("restrictions"):
-            dietary_restrictions = profile["restrictions"]
-        
-        # Fill meals from recipes.json with full details
-        picks = select_meal_skeleton(days=3, dietary_restrictions=dietary_restrictions)
+            cached = plan_cache.get_exact(goal, ctx.restrictions)
+            if cached is not None:
+                ctx.cache = "exact"
+            else:
+                t = time.perf_counter()
+                cached, shared = await plan_flights.ado(flight_key(goal, ctx.restrictions),
+                                                        lambda: self._aplan_body(ctx))
+                if shared:
+                    ctx.cache = "coalesced"
+                    ctx.record("coalesced", t)
+                    plan_flights.note_saved(cached["calls"])
+            retrieved, evidence_bullets, out = cached["retrieved"], cached["evidence_summary"], cached["out"]
+        except BaseException:
+            meals_task.cancel()
+            raise
+        _fill_meals(out, await meals_task)
+        return ctx.response(out, retrieved, evidence_bullets)
+
+    async def abatch_plan(self, items: List[Tuple[str, Dict[str, Any] | None]],
+                          concurrency: int = PLAN_BATCH_CONCURRENCY) -> AsyncIterator[Dict[str, Any]]:
+        """Plan many (goal, profile) requests; yields {"index", "type": "plan"|"error", ...} as each finishes.
+
+        Identical requests (same goal and restrictions) are planned once. Every cache miss is embedded in one batched call
+        and retrieved with one multi-query vector lookup; only the LLM calls fan out,
+        at most `concurrency` plans at a time. Meals are still drawn per request.
+        """
+        groups: Dict[str, List[int]] = {}
+        for i, (goal, profile) in enumerate(items):
+            groups.setdefault(flight_key(goal, (profile or {}).get("restrictions")), []).append(i)
+        ctxs = {key: PlanContext(*items[idxs[0]]) for key, idxs in groups.items()}
+        cached = {key: plan_cache.get_exact(ctx.goal, ctx.restrictions) for key, ctx in ctxs.items()}
+        for key, hit in cached.items():
+            if hit is not None:
+                ctxs[key].cache = "exact"
+
+        # One embedding request for every goal that missed the exact cache
+        misses = [key for key, hit in cached.items() if hit is None]
+        vecs: Dict[str, List[float] | None] = {key: None for key in misses}
+        if misses and self._embed_enabled():
+            t = time.perf_counter()
+            try:
+                for key, v in zip(misses, await self.emb.aembed_documents([ctxs[key].goal for key in misses])):
+                    vecs[key] = v
+            except Exception as e:
+                self._embedding_failed(e)
+            else:
+                self._embedding_ok()
+            for key in misses:
+                ctxs[key].timings["embed"] = int((time.perf_counter() - t) * 1000)
+        for key in misses:
+            if vecs[key] is not None:
+                cached[key] = plan_cache.get_similar(vecs[key], ctxs[key].restrictions)
+                if cached[key] is not None:
+                    ctxs[key].cache = "semantic"
+
+        # One multi-query vector lookup for everything still uncached
+        todo = [key for key in misses if cached[key] is None]
+        embedded = [key for key in todo if vecs[key] is not None]
+        t = time.perf_counter()
+        with metrics.timed(metrics.STAGE_SECONDS, stage="vector_search"):
+            hits = await asyncio.to_thread(
+                self.store.candidates_many, [vecs[key] for key in embedded], max(16, TOP_K * 4), CLEAN_WHERE,
+            )
+        first = dict(zip(embedded, hits))
+        retrieved = await asyncio.to_thread(
+            lambda: {key: self._search(ctxs[key].goal, vecs[key], TOP_K, first.get(key)) for key in todo}
+        )
+        for key in todo:
+            ctxs[key].timings["retrieve"] = int((time.perf_counter() - t) * 1000)
+
+        sem = asyncio.Semaphore(max(1, concurrency))
+
+        async def run(key: str) -> List[Dict[str, Any]]:
+            ctx = ctxs[key]
+            try:
+                if cached[key] is not None:
+                    hit = cached[key]
+                    snippets, evidence_bullets, out = hit["retrieved"], hit["evidence_summary"], hit["out"]
+                else:
+                    snippets = retrieved[key]
+                    async with sem:
+                        evidence_bullets = await ctx.astage("summarize", lambda: self.asummarize_evidence(ctx.goal, snippets))
+                        out = await ctx.astage("generate", lambda: self.agenerate(ctx.goal, evidence_bullets))
+                    plan_cache.put(ctx.goal, ctx.restrictions,
+                                   {"retrieved": snippets, "evidence_summary": evidence_bullets, "out": out}, vecs[key])
+            except Exception as e:
+                return [{"index": i, "type": "error", "detail": str(e)} for i in groups[key]]
+            events = []
+            for i in groups[key]:
+                try:
+                    picks = await asyncio.to_thread(ctx.pick_meals)
+                except NoMatchingRecipes as e:
+                    events.append({"index": i, "type": "error", "detail": str(e)})
+                    continue
+                plan = _fill_meals(copy.deepcopy(out), picks)
+                events.append({"index": i, "type": "plan", **ctx.response(plan, snippets, evidence_bullets)})
+            return events
+
+        for fut in asyncio.as_completed([run(key) for key in groups]):
+            for event in await fut:
+                yield event
+
+    async def astream_plan(self, goal: str, profile: Dict[str, Any] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield plan sections as events as soon as each one is available.
+
+        Order: meals (programmatic, instant) → retrieved → evidence_delta tokens →
+        evidence_summary → one `day` per completed plan.days element → final `plan`
+        (same payload as /plan).
+
+        Like `aplan`, a cached plan or an identical plan already in flight is used when
+        there is one; its sections then arrive at once, without evidence_delta events.
+        A stream that generates its plan stores it in the plan cache.
+        """
+        ctx = PlanContext(goal, profile)
+        picks = await ctx.astage("fill_meals", lambda: asyncio.to_thread(ctx.pick_meals))
+        yield {"type": "meals", "meals": picks, "meal_filter": ctx.meal_filter}
+
+        cached = plan_cache.get_exact(goal, ctx.restrictions)
+        if cached is not None:
+            ctx.cache = "exact"
+        else:
+            key = flight_key(goal, ctx.restrictions)
+            t = time.perf_counter()
+            flight, cached = await plan_flights.await_or_lead(key)
+            if flight is None:
+                ctx.cache = "coalesced"
+                ctx.record("coalesced", t)
+                plan_flights.note_saved(cached["calls"])
+            else:
+                # This stream leads: concurrent /plan and /plan/stream requests wait for its result
+                settled = False
+                try:
+                    vec = await ctx.astage("embed", lambda: self._aembed_query(goal))
+                    cached = plan_cache.get_similar(vec, ctx.restrictions) if vec is not None else None
+                    if cached is not None:
+                        ctx.cache = "semantic"
+                        plan_flights.settle(key, flight, {**cached, "calls": _upstream_calls(ctx)})
+                        settled = True
+                    else:
+                        async for event in self._astream_sections(ctx, picks, vec):
+                            if event["type"] == "plan":
+                                value = {k: event.pop(k) for k in ("retrieved", "evidence_summary", "out")}
+                                plan_cache.put(goal, ctx.restrictions, value, vec)
+                                plan_flights.settle(key, flight, {**value, "calls": _upstream_calls(ctx)})
+                                settled = True
+                                out = _fill_meals(value["out"], picks)
+                                event = {"type": "plan", **ctx.response(out, value["retrieved"], value["evidence_summary"])}
+                            yield event
+                        return
+                except Exception as e:
+                    if not settled:
+                        plan_flights.settle(key, flight, exc=e)
+                        settled = True
+                    raise
+                finally:
+                    if not settled:  # client went away mid-stream
+                        plan_flights.abandon(key, flight)
+
+        retrieved, evidence_bullets, out = cached["retrieved"], cached["evidence_summary"], cached["out"]
+        _fill_meals(out, picks)
+        yield {"type": "retrieved", "retrieved": retrieved}
+        yield {"type": "evidence_summary", "evidence_summary": evidence_bullets}
         for i, day in enumerate(out.get("plan", {}).get("days", [])):
-            if i < len(picks):
-                sel = picks[i]
-                day_meals = day.get("meals") or {}
-                # Include full meal details instead of just names
-                day_meals["breakfast"] = sel["breakfast"]
-                day_meals["lunch"] = sel["lunch"]
-                day_meals["dinner"] = sel["dinner"]
-                day["meals"] = day_meals
-
-        latency_ms = int((time.time() - t0) * 1000)
-        return {
-            "goal": goal,
-            **out,
-            "retrieved": retrieved,
-            "evidence_summary": evidence_bullets,
-            "latency_ms": latency_ms,
-        }
-
-
-# Singleton
-planner = RagPlanner()
+            yield {"type": "day", "index": i, "day": day}
+        yield {"type": "plan", **ctx.response(out, retrieved, evidence_bullets)}
+
+    async def _astream_sections(self, ctx: PlanContext, picks: List[Dict[str, Dict[str, Any]]],
+                                vec: List[float] | None) -> AsyncIterator[Dict[str, Any]]:
+        """astream_plan's uncached path: retrieved → evidence_delta… → evidence_summary → day…,
+        then {"type": "plan", "retrieved", "evidence_summary", "out"} with `out` not yet meal-filled."""
+        goal = ctx.goal
+        retrieved = await ctx.astage("retrieve", lambda: asyncio.to_thread(self._search, goal, vec, TOP_K))
+        yield {"type": "retrieved", "retrieved": retrieved}
+
+        t = time.perf_counter()
+        parts: List[str] = []
+        if retrieved:
+            stream = await self.aclient.chat.completions.create(
+                model=CHAT_MODEL,
+                messages=_summary_messages(goal, retrieved),
+                temperature=0.2,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    metrics.record_usage("summarize", CHAT_MODEL, chunk.usage)
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield {"type": "evidence_delta", "text": delta}
+        evidence_bullets = ctx.results["summarize"] = "".join(parts).strip()
+        ctx.record("summarize", t)
+        yield {"type": "evidence_summary", "evidence_summary": evidence_bullets}
+
+        t = time.perf_counter()
+        days = JsonArrayStreamer("days")
+        stream = await self.aclient.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=self._to_messages(goal, evidence_bullets),
+            response_format={"type": "json_object"},
+            temperature=0.2,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        n_days = 0
+        async for chunk in stream:
+            if chunk.usage is not None:
+                metrics.record_usage("generate", CHAT_MODEL, chunk.usage)
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            for day in days.feed(delta):
+                _fill_meals({"plan": {"days": [day]}}, picks[n_days:n_days + 1])
+                yield {"type": "day", "index": n_days, "day": day}
+                n_days += 1
+        out = ctx.results["generate"] = _parse_plan_json(days.text)
+        ctx.record("generate", t)
+        yield {"type": "plan", "retrieved": retrieved, "evidence_summary": evidence_bullets, "out": out}
+
+
+# Singleton, built on first use (or by the app's startup warm-up)
+_planner: RagPlanner | None = None
+_planner_lock = threading.Lock()
+
+def get_planner() -> RagPlanner:
+    """The shared RagPlanner, constructed once across threads. Raises if it can't be built
+    (e.g. no OPENAI_API_KEY); the next call tries again."""
+    global _planner
+    if _planner is None:
+        with _planner_lock:
+            if _planner is None:
+                t = time.perf_counter()
+                _planner = RagPlanner()
+                print(f"[rag] planner ready in {time.perf_counter() - t:.2f}s")
+    return _planner
+
+def planner_ready() -> bool:
+    return _planner is not None
+
+def __getattr__(name: str) -> Any:
+    # `from app.rag.pipeline import planner` keeps working, but now builds on first access
+    if name == "planner":
+        return get_planner()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
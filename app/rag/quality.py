@@ -0,0 +1,44 @@
+# app/rag/quality.py
+"""Per-chunk quality flags. They depend only on the chunk text, so build_index computes
+them once and stores them as metadata; retrieval reads them instead of rescanning."""
+from typing import Any, Dict
+
+from app.rag.text_filter import BOILERPLATE, CASE_STUDY
+
+def clip_to_sentences(text: str, max_chars: int = 900) -> str:
+    """Trim leading/trailing partial sentences and cap length."""
+    t = (text or "").strip()
+    if not t:
+        return t
+    # Snap start: drop up to first full stop if first sentence seems mid-way
+    first_dot = t.find(". ")
+    if 0 <= first_dot <= 80:  # early fragment → start after first complete sentence
+        t = t[first_dot+2:].lstrip()
+    # Snap end: cut at nearest sentence end under max_chars
+    if len(t) > max_chars:
+        cut = t.rfind(". ", 0, max_chars)
+        if cut == -1:
+            cut = t.rfind("? ", 0, max_chars)
+        if cut == -1:
+            cut = t.rfind("! ", 0, max_chars)
+        t = (t[: cut+1] if cut != -1 else t[: max_chars]).strip()
+    return t
+
+def looks_case_study(text: str) -> bool:
+    """
+    Detects text that looks like an anecdote, profile, or case study.
+    """
+    low = (text or "").lower()
+    # flag snippets that mention a personal narrative or singular subject
+    return CASE_STUDY.search(low)
+
+def quality_flags(text: str) -> Dict[str, Any]:
+    """Metadata stored with each chunk: clipped_text, is_boilerplate, is_case_study."""
+    raw = (text or "").strip()
+    low = raw.lower()
+    clipped = clip_to_sentences(raw)
+    return {
+        "clipped_text": clipped,
+        "is_boilerplate": not clipped or BOILERPLATE.search(low),
+        "is_case_study": looks_case_study(clipped),
+    }
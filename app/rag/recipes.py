@@ -0,0 +1,188 @@
+# app/rag/recipes.py
+import json, os, threading
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.config import DATA_DIR
+from app.rag.meal_planner import plan_days
+from app.rag.restrictions import NoMatchingRecipes, ingredient_tokens, resolve
+
+RECIPES_JSON = os.path.join(DATA_DIR, "recipes.json")
+
+LIST_FIELDS = ("meal", "protein", "grain", "veg", "fat", "seasonings", "diet")
+KCAL_BAND_WIDTH = 200  # kcal bands: 0-199, 200-399, ...
+
+def kcal_band(kcal: Any) -> int:
+    try:
+        return int(kcal) // KCAL_BAND_WIDTH
+    except (TypeError, ValueError):
+        return -1
+
+
+class RecipeCatalog:
+    """In-memory recipes.json with precomputed inverted indexes.
+
+    Every index maps a lowercase value to the frozenset of recipe ids (positions
+    in `recipes`), so lookups like "vegan lunch" are set intersections. The
+    numeric attributes the meal planner scores (kcal, protein grams, cuisine and
+    dish-name codes) and per-meal boolean masks are kept as NumPy arrays aligned
+    with the same ids. Diet tags and ingredient tokens also get packed bitsets
+    (one bit per recipe), which app/rag/restrictions.py ANDs together. The file is
+    re-read only when its mtime changes.
+    """
+
+    def __init__(self, path: str = RECIPES_JSON) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self.recipes: List[Dict[str, Any]] = []
+        self.all_ids: FrozenSet[int] = frozenset()
+        self.by_meal: Dict[str, FrozenSet[int]] = {}
+        self.by_diet: Dict[str, FrozenSet[int]] = {}
+        self.by_cuisine: Dict[str, FrozenSet[int]] = {}
+        self.by_protein: Dict[str, FrozenSet[int]] = {}
+        self.by_kcal_band: Dict[int, FrozenSet[int]] = {}
+        self.kcal = np.zeros(0, dtype=np.float32)
+        self.protein_g = np.zeros(0, dtype=np.float32)
+        self.cuisine_code = np.zeros(0, dtype=np.int32)
+        self.name_code = np.zeros(0, dtype=np.int32)
+        self.meal_masks: Dict[str, np.ndarray] = {}
+        self.all_bits = np.zeros(0, dtype=np.uint8)
+        self.diet_bits: Dict[str, np.ndarray] = {}
+        self.ingredient_bits: Dict[str, np.ndarray] = {}
+        self.maybe_reload()
+
+    def maybe_reload(self) -> bool:
+        """Rebuild the indexes if the file changed on disk. Returns True if it reloaded."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        with self._lock:
+            if mtime != self._mtime:
+                self._build()
+                self._mtime = mtime
+        return True
+
+    def _build(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            recipes = json.load(f)
+        # normalize: ensure array fields are lists
+        for r in recipes:
+            for key in LIST_FIELDS:
+                if key in r and not isinstance(r[key], list):
+                    r[key] = [r[key]]
+
+        def index(values_of) -> Dict[Any, FrozenSet[int]]:
+            idx: Dict[Any, Set[int]] = {}
+            for i, r in enumerate(recipes):
+                for v in values_of(r):
+                    idx.setdefault(v, set()).add(i)
+            return {k: frozenset(v) for k, v in idx.items()}
+
+        by_meal = index(lambda r: {str(m).lower() for m in r.get("meal") or []})
+        by_diet = index(lambda r: {str(d).lower() for d in r.get("diet") or []})
+        by_cuisine = index(lambda r: [str(r.get("cuisine") or "general").lower()])
+        by_protein = index(lambda r: {str(p).lower() for p in r.get("protein") or []})
+        by_kcal_band = index(lambda r: [kcal_band(r.get("approx_kcal"))])
+
+        def codes(values: List[str]) -> np.ndarray:
+            seen: Dict[str, int] = {}
+            return np.asarray([seen.setdefault(v, len(seen)) for v in values], dtype=np.int32)
+
+        def masks(idx: Dict[str, FrozenSet[int]]) -> Dict[str, np.ndarray]:
+            out = {}
+            for key, ids in idx.items():
+                m = np.zeros(len(recipes), dtype=bool)
+                m[list(ids)] = True
+                out[key] = m
+            return out
+
+        by_ingredient = index(ingredient_tokens)
+
+        kcal = np.asarray([_number(r.get("approx_kcal")) for r in recipes], dtype=np.float32)
+        protein_g = np.asarray([_number((r.get("macros") or {}).get("protein_g")) for r in recipes], dtype=np.float32)
+        # recipes without a kcal figure count as a typical meal rather than as 0 kcal
+        kcal[np.isnan(kcal)] = np.nanmedian(kcal) if np.isfinite(kcal).any() else 0.0
+        protein_g[np.isnan(protein_g)] = 0.0
+
+        # swap all at once so readers never see a half-built catalog
+        self.recipes = recipes
+        self.all_ids = frozenset(range(len(recipes)))
+        self.by_meal, self.by_diet = by_meal, by_diet
+        self.by_cuisine, self.by_protein, self.by_kcal_band = by_cuisine, by_protein, by_kcal_band
+        self.kcal, self.protein_g = kcal, protein_g
+        self.cuisine_code = codes([str(r.get("cuisine") or "general").lower() for r in recipes])
+        self.name_code = codes([str(r.get("name") or "").strip().lower() for r in recipes])
+        self.meal_masks = masks(by_meal)
+        self.all_bits = np.packbits(np.ones(len(recipes), dtype=bool))
+        self.diet_bits = {k: np.packbits(m) for k, m in masks(by_diet).items()}
+        self.ingredient_bits = {k: np.packbits(m) for k, m in masks(by_ingredient).items()}
+
+    def select(
+        self,
+        meal: Optional[str] = None,
+        diet: Optional[Iterable[str]] = None,
+        cuisine: Optional[str] = None,
+        protein: Optional[str] = None,
+        kcal_bands: Optional[Iterable[int]] = None,
+    ) -> FrozenSet[int]:
+        """Ids matching every given constraint. `diet` matches ANY of the given tags."""
+        ids = self.all_ids
+        if meal is not None:
+            ids = ids & self.by_meal.get(meal.lower(), frozenset())
+        if diet is not None:
+            ids = ids & frozenset().union(*(self.by_diet.get(d.lower(), frozenset()) for d in diet))
+        if cuisine is not None:
+            ids = ids & self.by_cuisine.get(cuisine.lower(), frozenset())
+        if protein is not None:
+            ids = ids & self.by_protein.get(protein.lower(), frozenset())
+        if kcal_bands is not None:
+            ids = ids & frozenset().union(*(self.by_kcal_band.get(b, frozenset()) for b in kcal_bands))
+        return ids
+
+    def get(self, ids: Iterable[int]) -> List[Dict[str, Any]]:
+        return [self.recipes[i] for i in sorted(ids)]
+
+
+
+def _number(v: Any) -> float:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+catalog = RecipeCatalog(RECIPES_JSON)
+
+def plan_meals(days: int = 3, seed: int | None = None, dietary_restrictions: str | None = None,
+               goal: str | None = None) -> Tuple[List[Dict[str, Dict[str, Any]]], Dict[str, Any]]:
+    """Pick a breakfast, lunch and dinner per day from recipes.json.
+
+    Args:
+        days: Number of days to plan
+        seed: Random seed for reproducible selection
+        dietary_restrictions: Free-text restrictions, combined (e.g. "vegan, gluten-free, no peanuts")
+        goal: The user's goal; kcal / protein targets in it ("under 2200 kcal", "150g protein")
+            steer the picks (see app/rag/meal_planner.py)
+
+    Returns (days, report): days is a list of day dicts like
+    [{"breakfast": recipe, "lunch": recipe, "dinner": recipe}, ...]; report says which
+    restrictions were applied and whether a fallback happened (see restrictions.resolve).
+    Raises NoMatchingRecipes if the ingredient exclusions rule out every recipe;
+    exclusions are never relaxed.
+    """
+    catalog.maybe_reload()
+    allowed, report = resolve(catalog, dietary_restrictions)
+    if catalog.recipes and not allowed.any():
+        raise NoMatchingRecipes(f"No recipes satisfy the exclusions: {', '.join(report['excluded'])}")
+    rows = plan_days(catalog, allowed, days=days, goal=goal, seed=seed)
+    return [{meal: catalog.recipes[i] for meal, i in day.items()} for day in rows], report
+
+def select_meal_skeleton(days: int = 3, seed: int | None = None, dietary_restrictions: str | None = None,
+                         goal: str | None = None) -> List[Dict[str, Dict[str, Any]]]:
+    """plan_meals without the restriction report."""
+    return plan_meals(days, seed, dietary_restrictions, goal)[0]
@@ -0,0 +1,139 @@
+# app/rag/restrictions.py
+"""Dietary-restriction parsing and resolution against the RecipeCatalog's bitsets.
+
+The catalog keeps one packed bitset (np.packbits, one bit per recipe) per diet tag
+and per ingredient token. A restriction string becomes a list of bitsets: each diet
+keyword contributes the OR of its accepted tags, and each excluded ingredient
+contributes the complement of its bitset. The allowed recipes are then one
+np.bitwise_and.reduce over that stack.
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Restriction keyword → accepted diet tags. Every keyword found applies (AND across keywords).
+DIET_RULES = (
+    ("vegan", ("vegan",)),
+    ("vegetarian", ("vegetarian", "vegan")),
+    ("gluten-free", ("gluten-free",)),
+    ("dairy-free", ("dairy-free",)),
+    ("low-carb", ("low-carb",)),
+    ("keto", ("keto",)),
+    ("paleo", ("paleo",)),
+)
+
+# Excluding a group name also excludes its members ("no nuts" → no almonds, no peanut butter, ...)
+INGREDIENT_GROUPS = {
+    "nut": ("nut", "almond", "walnut", "cashew", "pecan", "pistachio", "hazelnut", "macadamia", "peanut"),
+    "tree nut": ("almond", "walnut", "cashew", "pecan", "pistachio", "hazelnut", "macadamia"),
+    "shellfish": ("shrimp", "prawn", "crab", "lobster", "scallop", "mussel", "clam", "oyster"),
+    "fish": ("fish", "salmon", "tuna", "cod", "tilapia", "trout", "sardine", "mackerel", "anchovy"),
+    "soy": ("soy", "tofu", "tempeh", "edamame", "miso"),
+    "egg": ("egg",),
+    "dairy": ("milk", "cheese", "yogurt", "butter", "cream", "feta", "parmesan", "mozzarella", "paneer"),
+    "pork": ("pork", "bacon", "ham", "prosciutto", "chorizo"),
+    "red meat": ("beef", "steak", "lamb", "pork"),
+}
+
+# Recipe fields whose values count as ingredients (plus the dish name)
+INGREDIENT_FIELDS = ("protein", "grain", "veg", "fat", "seasonings")
+
+_WORD = re.compile(r"[a-z]+")
+_EXCLUDE = re.compile(
+    r"\b(?:no|without|avoid(?:ing)?|exclude|excluding|allergic to|allergy to|free of)\s+"
+    r"([a-z][a-z -]*?)(?=\s*(?:,|;|\.|$))"
+)
+_X_FREE = re.compile(r"\b([a-z]+)-free\b")
+_SPLIT = re.compile(r"\s*(?:,|/|\band\b|\bor\b)\s*")
+
+
+def singular(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith(("shes", "ches", "oes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def ingredient_tokens(recipe: Dict[str, Any]) -> set:
+    """Singular word tokens (and full two-word phrases) of a recipe's ingredients and name."""
+    values = [str(v) for key in INGREDIENT_FIELDS for v in (recipe.get(key) or [])]
+    values.append(str(recipe.get("name") or ""))
+    out = set()
+    for v in values:
+        words = [singular(w) for w in _WORD.findall(v.lower())]
+        out.update(words)
+        out.update(" ".join(words[i:i + 2]) for i in range(len(words) - 1))
+    return out
+
+
+def parse_restrictions(text: Optional[str]) -> Dict[str, List[Any]]:
+    """{"diets": [(keyword, tags), ...], "exclude": [term, ...]} from free text.
+
+    "vegan, gluten-free, no peanuts" → diets vegan + gluten-free, exclude ["peanut"].
+    "nut-free" (not a diet keyword) is an exclusion too.
+    """
+    low = (text or "").lower()
+    diets = [(keyword, tags) for keyword, tags in DIET_RULES if keyword in low]
+    diet_words = {keyword.split("-")[0] for keyword, _ in DIET_RULES}
+    terms: List[str] = []
+    for m in _EXCLUDE.finditer(low):
+        # "no peanuts and shellfish" → both; a diet keyword in the list ("no nuts and gluten-free") stays a diet
+        terms.extend(t for t in _SPLIT.split(m.group(1)) if t and not t.endswith("-free"))
+    for m in _X_FREE.finditer(low):
+        if m.group(1) not in diet_words:
+            terms.append(m.group(1))
+    exclude: List[str] = []
+    for t in terms:
+        term = " ".join(singular(w) for w in t.split())
+        if term and term not in exclude:
+            exclude.append(term)
+    return {"diets": diets, "exclude": exclude}
+
+
+class NoMatchingRecipes(ValueError):
+    """The ingredient exclusions rule out every recipe in the catalog."""
+
+
+def resolve(catalog: Any, text: Optional[str]) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """Boolean mask of recipes satisfying every restriction, plus a report for the response.
+
+    Exclusions are treated as allergies and are never relaxed. If diet tags plus
+    exclusions leave nothing, diet tags are dropped (recorded in report["fallback"]);
+    if exclusions alone leave nothing, the mask is empty and report["matched"] is 0.
+    """
+    n = len(catalog.recipes)
+    parsed = parse_restrictions(text)
+    report: Dict[str, Any] = {
+        "diets": [keyword for keyword, _ in parsed["diets"]],
+        "excluded": parsed["exclude"],
+        "matched": n,
+        "fallback": None,
+    }
+    if not parsed["diets"] and not parsed["exclude"]:
+        return np.ones(n, dtype=bool), report
+
+    empty = np.zeros_like(catalog.all_bits)
+    required = [
+        np.bitwise_or.reduce([catalog.diet_bits.get(tag, empty) for tag in tags], axis=0)
+        for _, tags in parsed["diets"]
+    ]
+    excluded = []
+    for term in parsed["exclude"]:
+        members = INGREDIENT_GROUPS.get(term, (term,))
+        hit = np.bitwise_or.reduce([catalog.ingredient_bits.get(t, empty) for t in members], axis=0)
+        excluded.append(~hit & catalog.all_bits)
+
+    def matching(bitsets: List[np.ndarray]) -> np.ndarray:
+        bits = np.bitwise_and.reduce([catalog.all_bits, *bitsets], axis=0)
+        return np.unpackbits(bits, count=n).astype(bool)
+
+    allowed = matching(required + excluded)
+    if not allowed.any() and required:
+        allowed = matching(excluded)
+        report["fallback"] = "no recipe matches every diet tag; kept only the ingredient exclusions"
+    report["matched"] = int(allowed.sum())
+    return allowed, report
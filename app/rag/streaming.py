@@ -0,0 +1,76 @@
+# app/rag/streaming.py
+import json
+from typing import Any, List, Optional
+
+
+class JsonArrayStreamer:
+    """Incrementally pull finished elements out of a JSON array while it is still streaming.
+
+    Feed raw text chunks as they arrive from the model; every object that completes
+    inside the array stored under `key` (e.g. plan.days) is parsed and returned right
+    away, without waiting for the rest of the document.
+    """
+
+    def __init__(self, key: str = "days") -> None:
+        self.key = key
+        self.buf = ""
+        self.pos = 0
+        self.in_string = False
+        self.escape = False
+        self.str_start = -1
+        self.last_string: Optional[str] = None
+        self.pending_key: Optional[str] = None
+        # stack of (container, key-that-opened-it)
+        self.stack: List[tuple] = []
+        self.item_start = -1
+
+    def _in_target_array(self) -> bool:
+        return bool(self.stack) and self.stack[-1] == ("[", self.key)
+
+    def feed(self, chunk: str) -> List[Any]:
+        self.buf += chunk
+        done: List[Any] = []
+        buf = self.buf
+        i = self.pos
+        n = len(buf)
+        while i < n:
+            ch = buf[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    try:
+                        self.last_string = json.loads(buf[self.str_start:i + 1])
+                    except ValueError:
+                        self.last_string = None
+            elif ch == '"':
+                self.in_string = True
+                self.str_start = i
+            elif ch == ":":
+                self.pending_key = self.last_string
+            elif ch in "{[":
+                if ch == "{" and self._in_target_array():
+                    self.item_start = i
+                self.stack.append((ch, self.pending_key if ch == "[" else None))
+                self.pending_key = None
+            elif ch in "}]":
+                if self.stack:
+                    self.stack.pop()
+                if ch == "}" and self._in_target_array() and self.item_start >= 0:
+                    try:
+                        done.append(json.loads(buf[self.item_start:i + 1]))
+                    except ValueError:
+                        pass
+                    self.item_start = -1
+            elif ch == ",":
+                self.pending_key = None
+            i += 1
+        self.pos = i
+        return done
+
+    @property
+    def text(self) -> str:
+        return self.buf
@@ -0,0 +1,134 @@
+# app/rag/text_filter.py
+"""Boilerplate / case-study rule sets, compiled once and shared by loaders, build_index and quality.
+
+A rule set is a list of lowercase substrings. `Matcher` compiles one:
+- Tokens that contain another token of the set are dropped, since they can never
+  decide a match on their own.
+- A check is then one C-level `in` / `find` scan of the whole text per token.
+  We keep this loop over a compiled `re.escape` alternation on purpose. sre tries
+  every branch at every offset, and `python -m benchmarks.bench_text_filter`
+  measures the alternation at about 2-5x slower, for both search and positions, on
+  every rule set here.
+
+`filter_lines` applies the line rules to a whole page in one pass instead of
+looping over lines:
+- Each token is scanned once over the page, and only tokens present are located.
+- URLs likewise.
+- Per-line letter counts come from one numpy lookup + reduceat over the page's code points.
+"""
+import bisect, functools, re
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+# Lines dropped by the loaders (nav, ads, sharing widgets)
+AD_LINE_TOKENS = (
+    "subscribe", "sign up", "cookie", "privacy", "terms",
+    "share this", "available at:", "myplate.gov", "myplate plan",
+    "back to top", "newsletter", "sponsored",
+)
+# Chunks dropped by build_index
+AD_CHUNK_TOKENS = (
+    "myplate", "available at", "subscribe", "sign up", "cookie", "privacy policy", "newsletter",
+    "back to top", "sponsored",
+)
+# Chunks stored with is_boilerplate=True (kept, but not cited)
+BOILERPLATE_TOKENS = (
+    "available at", "myplate.gov", "subscribe", "sign up", "privacy policy",
+    "newsletter", "back to top",
+)
+# Anecdotes, profiles, case studies
+CASE_TOKENS = (
+    "year-old", "case study", "scenario:", "example:", "for example",
+    "patient", "subject", "participant", "individual", "client",
+    "male,", "female,", "he was", "she was", "they were", "his ", "her ",
+    "their ", "doctor", "physician", "nurse", "trainer",
+)
+
+URL_RE = re.compile(r"https?://\S+")
+
+
+class Matcher:
+    """A substring rule set compiled for matching lowercased text."""
+
+    def __init__(self, tokens: Iterable[str]) -> None:
+        self.tokens = tuple(sorted(set(tokens)))
+        # "myplate" matches wherever "myplate.gov" does: scan only the minimal tokens
+        self._scan = tuple(t for t in self.tokens if not any(o != t and o in t for o in self.tokens))
+
+    def search(self, low: str) -> bool:
+        """True if any token occurs in `low` (already lowercased)."""
+        for tok in self._scan:
+            if tok in low:
+                return True
+        return False
+
+    def positions(self, low: str) -> List[int]:
+        """Start offsets of every token occurrence in `low`; cheap when (as usual) none occur."""
+        out: List[int] = []
+        for tok in self._scan:
+            i = low.find(tok)
+            while i != -1:
+                out.append(i)
+                i = low.find(tok, i + 1)
+        return out
+
+
+AD_LINES = Matcher(AD_LINE_TOKENS)
+AD_CHUNKS = Matcher(AD_CHUNK_TOKENS)
+BOILERPLATE = Matcher(BOILERPLATE_TOKENS)
+CASE_STUDY = Matcher(CASE_TOKENS)
+
+
+@functools.lru_cache(maxsize=1)
+def _alpha_table() -> np.ndarray:
+    """str.isalpha() for every BMP code point (64 KiB, built on first use)."""
+    return np.fromiter((chr(c).isalpha() for c in range(0x10000)), dtype=bool, count=0x10000)
+
+
+def _alpha_mask(text: str) -> np.ndarray:
+    if text.isascii():
+        return _alpha_table()[:128][np.frombuffer(text.encode("ascii"), dtype=np.uint8)]
+    cp = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+    mask = _alpha_table()[np.minimum(cp, 0xFFFF)]
+    astral = np.flatnonzero(cp > 0xFFFF)
+    if astral.size:
+        mask[astral] = [chr(c).isalpha() for c in cp[astral].tolist()]
+    return mask
+
+
+def count_alpha(text: str) -> int:
+    """sum(c.isalpha() for c in text), vectorized."""
+    return int(np.count_nonzero(_alpha_mask(text))) if text else 0
+
+
+def filter_lines(
+    text: str,
+    drop: Optional[Matcher] = AD_LINES,
+    min_chars: int = 30,
+    min_alpha: int = 10,
+    drop_urls: bool = True,
+) -> List[str]:
+    """Stripped non-empty lines of `text`, minus short ones, ones with a URL or a `drop` token, and ones with few letters."""
+    lines = [l for l in (l.strip() for l in text.splitlines()) if l]
+    if not lines:
+        return []
+    low = "\n".join(lines).lower()
+    if len(low) == sum(map(len, lines)) + len(lines) - 1:
+        lows = None
+    else:  # lower() changed some lengths (e.g. "İ"); offsets must come from the lowered lines
+        lows = [l.lower() for l in lines]
+        low = "\n".join(lows)
+    lens = np.fromiter(map(len, lows or lines), dtype=np.int64, count=len(lines))
+    starts = np.zeros(len(lines), dtype=np.int64)
+    np.cumsum(lens[:-1] + 1, out=starts[1:])
+
+    bad = lens < min_chars
+    hits = drop.positions(low) if drop is not None else []
+    if drop_urls and "http" in low:
+        hits.extend(m.start() for m in URL_RE.finditer(low))
+    if hits:
+        starts_list = starts.tolist()
+        bad[[bisect.bisect_right(starts_list, h) - 1 for h in hits]] = True
+    bad |= np.add.reduceat(_alpha_mask(low), starts) < min_alpha
+    return [l for l, b in zip(lines, bad.tolist()) if not b]
@@ -0,0 +1,345 @@
+# app/rag/vectorstore.py
+import json, os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.config import VECTOR_ANN, VECTOR_ANN_MIN_ROWS, VECTOR_BACKEND
+from app.rag.index_versions import active_dir
+from app.rag.mmr import mmr_select
+
+# Optional HNSW index for large corpora (auto-disabled if missing)
+try:
+    import hnswlib
+    _HAS_HNSWLIB = True
+except Exception:
+    _HAS_HNSWLIB = False
+
+UPSERT_BATCH = 1000
+
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    m = np.asarray(m, dtype=np.float32)
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+class VectorBackend:
+    """What build_index and RagPlanner need from a vector index."""
+
+    name = "base"
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def upsert(self, ids: Sequence[str], vectors: Sequence[Sequence[float]],
+               texts: Sequence[str], metadatas: Sequence[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def delete(self, ids: Sequence[str]) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def persist(self) -> None:
+        pass
+
+    def candidates(self, vec: Sequence[float], n: int,
+                   where: Optional[Dict[str, Any]] = None) -> Tuple[List[Document], np.ndarray]:
+        """The n nearest chunks, best first, with their stored vectors (n × d float32).
+
+        `where` keeps only chunks whose metadata equals every given key/value.
+        """
+        raise NotImplementedError
+
+    def candidates_many(self, vecs: Sequence[Sequence[float]], n: int,
+                        where: Optional[Dict[str, Any]] = None) -> List[Tuple[List[Document], np.ndarray]]:
+        """`candidates` for several query vectors at once, one result per query."""
+        return [self.candidates(v, n, where=where) for v in vecs]
+
+    def get(self, ids: Sequence[str]) -> Tuple[List[Document], np.ndarray]:
+        """Chunks by id (unknown ids are skipped), in the order given, with their vectors."""
+        raise NotImplementedError
+
+    def get_all(self) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+        """Every chunk's (ids, texts, metadatas), e.g. to build the lexical index."""
+        raise NotImplementedError
+
+    def mmr_search(self, vec: Sequence[float], k: int, fetch_k: int, lambda_mult: float = 0.5,
+                   where: Optional[Dict[str, Any]] = None) -> List[Document]:
+        docs, vecs = self.candidates(vec, fetch_k, where=where)
+        return [docs[i] for i in mmr_select(vec, vecs, k, lambda_mult)]
+
+
+class ChromaBackend(VectorBackend):
+    """The LangChain Chroma store, as before."""
+
+    name = "chroma"
+
+    def __init__(self, persist_dir: str, embedding: Optional[Embeddings] = None) -> None:
+        from langchain_community.vectorstores import Chroma
+        self._factory = lambda: Chroma(embedding_function=embedding, persist_directory=persist_dir)
+        self.vs = self._factory()
+
+    def count(self) -> int:
+        return self.vs._collection.count()
+
+    def upsert(self, ids, vectors, texts, metadatas) -> None:
+        for i in range(0, len(ids), UPSERT_BATCH):
+            self.vs._collection.upsert(
+                ids=list(ids[i:i + UPSERT_BATCH]),
+                embeddings=np.asarray(vectors[i:i + UPSERT_BATCH], dtype=np.float32).tolist(),
+                documents=list(texts[i:i + UPSERT_BATCH]),
+                metadatas=list(metadatas[i:i + UPSERT_BATCH]),
+            )
+
+    def delete(self, ids) -> None:
+        for i in range(0, len(ids), UPSERT_BATCH):
+            self.vs.delete(ids=list(ids[i:i + UPSERT_BATCH]))
+
+    def clear(self) -> None:
+        self.vs.delete_collection()
+        self.vs = self._factory()
+
+    def candidates(self, vec, n, where=None) -> Tuple[List[Document], np.ndarray]:
+        return self.candidates_many([vec], n, where=where)[0]
+
+    def candidates_many(self, vecs, n, where=None) -> List[Tuple[List[Document], np.ndarray]]:
+        n = min(n, self.count())
+        if n <= 0 or not len(vecs):
+            return [([], np.zeros((0, 0), dtype=np.float32)) for _ in vecs]
+        if where and len(where) > 1:
+            where = {"$and": [{key: value} for key, value in where.items()]}
+        res = self.vs._collection.query(
+            query_embeddings=np.asarray(vecs, dtype=np.float32).tolist(),
+            n_results=n,
+            where=where or None,
+            include=["documents", "metadatas", "embeddings"],
+        )
+        out = []
+        for q in range(len(vecs)):
+            docs = [
+                Document(id=cid, page_content=t or "", metadata=m or {})
+                for cid, t, m in zip(res["ids"][q], res["documents"][q], res["metadatas"][q])
+            ]
+            out.append((docs, np.asarray(res["embeddings"][q], dtype=np.float32)))
+        return out
+
+    def get(self, ids) -> Tuple[List[Document], np.ndarray]:
+        if not len(ids):
+            return [], np.zeros((0, 0), dtype=np.float32)
+        res = self.vs._collection.get(ids=list(ids), include=["documents", "metadatas", "embeddings"])
+        pos = {cid: i for i, cid in enumerate(res["ids"])}
+        rows = [pos[cid] for cid in ids if cid in pos]
+        docs = [
+            Document(id=res["ids"][i], page_content=res["documents"][i] or "", metadata=res["metadatas"][i] or {})
+            for i in rows
+        ]
+        vecs = np.asarray(res["embeddings"], dtype=np.float32)
+        return docs, vecs[rows] if rows else np.zeros((0, 0), dtype=np.float32)
+
+    def get_all(self):
+        ids, texts, metadatas = [], [], []
+        total = self.count()
+        for offset in range(0, total, UPSERT_BATCH):
+            res = self.vs._collection.get(include=["documents", "metadatas"], limit=UPSERT_BATCH, offset=offset)
+            ids.extend(res["ids"])
+            texts.extend(t or "" for t in res["documents"])
+            metadatas.extend(m or {} for m in res["metadatas"])
+        return ids, texts, metadatas
+
+
+class NumpyBackend(VectorBackend):
+    """In-process index: one contiguous float32 matrix of L2-normalized vectors.
+
+    Exact search is a single matrix-vector product. With `use_ann` and at least
+    VECTOR_ANN_MIN_ROWS rows, candidates come from an HNSW graph (hnswlib) instead.
+    Persisted as vectors.npy (memory-mapped on load) + docs.jsonl (+ hnsw.bin).
+    """
+
+    name = "numpy"
+
+    def __init__(self, path: str, use_ann: bool = VECTOR_ANN) -> None:
+        self.path = path
+        self.use_ann = use_ann and _HAS_HNSWLIB
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.rows: Dict[str, int] = {}
+        self.mat = np.zeros((0, 0), dtype=np.float32)
+        self._ann: Any = None
+        self._masks: Dict[Tuple, np.ndarray] = {}
+        if use_ann and not _HAS_HNSWLIB:
+            print("[vectorstore] VECTOR_ANN is on but hnswlib is not installed; using exact search")
+        self._load()
+
+    # --- persistence ---
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self) -> None:
+        if not os.path.exists(self._file("vectors.npy")):
+            return
+        self.mat = np.load(self._file("vectors.npy"), mmap_mode="r")
+        with open(self._file("docs.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                self.ids.append(row["id"])
+                self.texts.append(row["text"])
+                self.metadatas.append(row["metadata"])
+        self.rows = {cid: i for i, cid in enumerate(self.ids)}
+        if self.use_ann and os.path.exists(self._file("hnsw.bin")) and len(self.ids) >= VECTOR_ANN_MIN_ROWS:
+            ann = hnswlib.Index(space="ip", dim=self.mat.shape[1])
+            ann.load_index(self._file("hnsw.bin"), max_elements=len(self.ids))
+            self._ann = ann
+
+    def persist(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        tmp = self._file("vectors.tmp.npy")
+        np.save(tmp, np.ascontiguousarray(self.mat))
+        os.replace(tmp, self._file("vectors.npy"))
+        tmp = self._file("docs.jsonl.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for cid, t, m in zip(self.ids, self.texts, self.metadatas):
+                f.write(json.dumps({"id": cid, "text": t, "metadata": m}) + "\n")
+        os.replace(tmp, self._file("docs.jsonl"))
+        ann = self._get_ann()
+        if ann is not None:
+            ann.save_index(self._file("hnsw.bin"))
+        elif os.path.exists(self._file("hnsw.bin")):
+            os.remove(self._file("hnsw.bin"))
+
+    # --- mutation ---
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def upsert(self, ids, vectors, texts, metadatas) -> None:
+        if not len(ids):
+            return
+        vecs = _normalize(vectors)
+        mat = np.array(self.mat) if self.mat.size else np.zeros((0, vecs.shape[1]), dtype=np.float32)
+        new_rows = []
+        for j, cid in enumerate(ids):
+            i = self.rows.get(cid)
+            if i is None:
+                self.rows[cid] = len(self.ids)
+                self.ids.append(cid)
+                self.texts.append(texts[j])
+                self.metadatas.append(dict(metadatas[j]))
+                new_rows.append(j)
+            else:
+                mat[i] = vecs[j]
+                self.texts[i], self.metadatas[i] = texts[j], dict(metadatas[j])
+        self.mat = np.vstack([mat, vecs[new_rows]]) if new_rows else mat
+        self._ann = None
+        self._masks = {}
+
+    def delete(self, ids) -> None:
+        drop = {self.rows[cid] for cid in ids if cid in self.rows}
+        if not drop:
+            return
+        keep = [i for i in range(len(self.ids)) if i not in drop]
+        self.mat = np.asarray(self.mat)[keep]
+        self.ids = [self.ids[i] for i in keep]
+        self.texts = [self.texts[i] for i in keep]
+        self.metadatas = [self.metadatas[i] for i in keep]
+        self.rows = {cid: i for i, cid in enumerate(self.ids)}
+        self._ann = None
+        self._masks = {}
+
+    def clear(self) -> None:
+        self.ids, self.texts, self.metadatas, self.rows = [], [], [], {}
+        self.mat = np.zeros((0, 0), dtype=np.float32)
+        self._ann = None
+        self._masks = {}
+
+    # --- search ---
+
+    def _mask(self, where: Dict[str, Any]) -> np.ndarray:
+        """Boolean row mask for a metadata equality filter, cached until the next mutation."""
+        key = tuple(sorted(where.items()))
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = np.fromiter(
+                (all(m.get(f) == v for f, v in key) for m in self.metadatas), dtype=bool, count=len(self.metadatas),
+            )
+            self._masks[key] = mask
+        return mask
+
+    def _get_ann(self) -> Any:
+        if not self.use_ann or len(self.ids) < VECTOR_ANN_MIN_ROWS:
+            return None
+        if self._ann is None:
+            ann = hnswlib.Index(space="ip", dim=self.mat.shape[1])
+            ann.init_index(max_elements=len(self.ids), ef_construction=200, M=16)
+            ann.add_items(np.asarray(self.mat), np.arange(len(self.ids)))
+            self._ann = ann
+        return self._ann
+
+    def top_k(self, q: np.ndarray, n: int, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Row indices of the n nearest rows to the (normalized) query, best first.
+
+        Rows where `mask` is False are never returned.
+        """
+        n = min(n, len(self.ids) if mask is None else int(mask.sum()))
+        if n <= 0:
+            return np.zeros(0, dtype=np.int64)
+        ann = self._get_ann()
+        if ann is not None:
+            ann.set_ef(max(2 * n, 64))
+            allowed = None if mask is None else (lambda label: bool(mask[label]))
+            labels, _ = ann.knn_query(q, k=n, filter=allowed)
+            return labels[0].astype(np.int64)
+        scores = self.mat @ q
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        idx = np.argpartition(-scores, n - 1)[:n] if n < len(scores) else np.arange(len(scores))
+        return idx[np.argsort(-scores[idx])]
+
+    def candidates(self, vec, n, where=None) -> Tuple[List[Document], np.ndarray]:
+        idx = self.top_k(_normalize(vec), n, self._mask(where) if where else None)
+        return self._rows(idx)
+
+    def candidates_many(self, vecs, n, where=None) -> List[Tuple[List[Document], np.ndarray]]:
+        if self._get_ann() is not None or not len(vecs):
+            return super().candidates_many(vecs, n, where=where)
+        # Exact search: one (rows × queries) matrix product for the whole batch
+        mask = self._mask(where) if where else None
+        n = min(n, len(self.ids) if mask is None else int(mask.sum()))
+        if n <= 0:
+            return [self._rows([]) for _ in vecs]
+        scores = self.mat @ _normalize(vecs).T
+        if mask is not None:
+            scores[~mask] = -np.inf
+        idx = np.argpartition(-scores, n - 1, axis=0)[:n] if n < len(scores) else np.tile(
+            np.arange(len(scores))[:, None], (1, scores.shape[1]))
+        order = np.argsort(-np.take_along_axis(scores, idx, axis=0), axis=0)
+        idx = np.take_along_axis(idx, order, axis=0)
+        return [self._rows(idx[:, q]) for q in range(idx.shape[1])]
+
+    def _rows(self, idx: Sequence[int]) -> Tuple[List[Document], np.ndarray]:
+        docs = [Document(id=self.ids[i], page_content=self.texts[i], metadata=self.metadatas[i]) for i in idx]
+        return docs, np.asarray(self.mat[np.asarray(idx, dtype=np.int64)])
+
+    def get(self, ids) -> Tuple[List[Document], np.ndarray]:
+        return self._rows([self.rows[cid] for cid in ids if cid in self.rows])
+
+    def get_all(self):
+        return list(self.ids), list(self.texts), list(self.metadatas)
+
+
+def open_vector_store(embedding: Optional[Embeddings] = None, backend: str = VECTOR_BACKEND,
+                      persist_dir: Optional[str] = None) -> VectorBackend:
+    """The configured vector backend ('chroma' or 'numpy') rooted at persist_dir (default: the active index version)."""
+    persist_dir = persist_dir or active_dir()
+    if backend == "numpy":
+        return NumpyBackend(os.path.join(persist_dir, "numpy_index"))
+    if backend == "chroma":
+        return ChromaBackend(persist_dir, embedding)
+    raise ValueError(f"Unknown VECTOR_BACKEND: {backend!r} (expected 'chroma' or 'numpy')")
@@ -0,0 +1,43 @@
+# app/schemas.py
+"""Request models shared by the API routes and the batch CLI."""
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+class HealthProfile(BaseModel):
+    age: Optional[int] = None
+    weight_kg: Optional[float] = None
+    height_cm: Optional[float] = None
+    restrictions: Optional[str] = None
+
+class PlanRequest(BaseModel):
+    goal: str = Field(..., description="User's goal (e.g., '3-day muscle gain plan under 2200 kcal')")
+    profile: Optional[HealthProfile] = None
+
+class BatchPlanRequest(BaseModel):
+    requests: List[PlanRequest]
+    concurrency: Optional[int] = Field(None, ge=1,
+                                       description="Plans generated at once (default PLAN_BATCH_CONCURRENCY; larger values are capped to it)")
+
+def enrich_goal(req: PlanRequest) -> str:
+    enriched = req.goal
+    if req.profile:
+        tags = []
+        if req.profile.age is not None:        tags.append(f"Age {req.profile.age}")
+        if req.profile.weight_kg is not None:  tags.append(f"Weight {req.profile.weight_kg} kg")
+        if req.profile.height_cm is not None:  tags.append(f"Height {req.profile.height_cm} cm")
+        if req.profile.restrictions:           tags.append(f"Diet {req.profile.restrictions}")
+        if tags:
+            enriched += " | Profile: " + ", ".join(tags)
+    return enriched
+
+def profile_dict(req: PlanRequest) -> Optional[Dict[str, Any]]:
+    # Convert profile to dict for the planner
+    if not req.profile:
+        return None
+    return {
+        "age": req.profile.age,
+        "weight_kg": req.profile.weight_kg,
+        "height_cm": req.profile.height_cm,
+        "restrictions": req.profile.restrictions
+    }
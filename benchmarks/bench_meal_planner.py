@@ -0,0 +1,102 @@
+# benchmarks/bench_meal_planner.py
+"""Latency and target adherence of the vectorized meal planner on large synthetic catalogs.
+
+The bundled recipes.json is replicated with jittered kcal/protein (unique names) up to
+--recipes entries, then each goal is planned --n times. The rng.choice picker that
+select_meal_skeleton used before is run on the same catalog for comparison.
+
+    python -m benchmarks.bench_meal_planner [--recipes 10000] [--n 300]
+"""
+import argparse, json, os, random, tempfile, time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.rag.meal_planner import parse_targets, plan_days
+from app.rag.recipes import RECIPES_JSON, RecipeCatalog
+
+GOALS = [
+    "3-day plan under 2200 kcal",
+    "muscle gain, 1800-2000 calories with 150g protein",
+    "about 2000 kcal per day",
+    "general healthy eating",
+]
+
+
+def synth_catalog(n: int, seed: int = 0) -> RecipeCatalog:
+    rng = random.Random(seed)
+    with open(RECIPES_JSON, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    out: List[Dict[str, Any]] = []
+    for i in range(n):
+        r = json.loads(json.dumps(base[i % len(base)]))
+        r["name"] = f"{r['name']} #{i}"
+        r["approx_kcal"] = int(r.get("approx_kcal", 500) * rng.uniform(0.7, 1.3))
+        macros = r.setdefault("macros", {})
+        macros["protein_g"] = int(macros.get("protein_g", 20) * rng.uniform(0.7, 1.3))
+        out.append(r)
+    fd, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(out, f)
+    cat = RecipeCatalog(path)
+    os.remove(path)
+    return cat
+
+
+def random_days(cat: RecipeCatalog, allowed: np.ndarray, days: int, seed: int) -> List[Dict[str, int]]:
+    """The previous picker: rng.choice per slot, avoiding names already used."""
+    rng = random.Random(seed)
+    buckets = [list(np.flatnonzero(cat.meal_masks[m] & allowed)) for m in ("breakfast", "lunch", "dinner")]
+    used, out = set(), []
+    for _ in range(days):
+        day = {}
+        for meal, bucket in zip(("breakfast", "lunch", "dinner"), buckets):
+            cands = [i for i in bucket if cat.name_code[i] not in used] or bucket
+            day[meal] = int(rng.choice(cands))
+            used.add(cat.name_code[day[meal]])
+        out.append(day)
+    return out
+
+
+def hit_rate(cat: RecipeCatalog, plans: List[List[Dict[str, int]]], targets: Dict[str, float]) -> float:
+    ok = total = 0
+    for plan in plans:
+        for day in plan:
+            ids = list(day.values())
+            kcal, protein = cat.kcal[ids].sum(), cat.protein_g[ids].sum()
+            total += 1
+            ok += (kcal >= targets.get("kcal_min", 0) and kcal <= targets.get("kcal_max", float("inf"))
+                   and protein >= targets.get("protein_min", 0))
+    return ok / max(total, 1)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--recipes", type=int, default=10000)
+    ap.add_argument("--n", type=int, default=300)
+    args = ap.parse_args()
+
+    cat = synth_catalog(args.recipes)
+    allowed = np.ones(len(cat.recipes), dtype=bool)
+    print(f"recipes: {len(cat.recipes)}  plans per goal: {args.n}  (3 days each)")
+    for goal in GOALS:
+        targets = parse_targets(goal)
+        lat, plans = [], []
+        for i in range(args.n):
+            t = time.perf_counter()
+            plans.append(plan_days(cat, allowed, days=3, goal=goal, seed=i))
+            lat.append((time.perf_counter() - t) * 1000)
+        lat.sort()
+        baseline = [random_days(cat, allowed, 3, seed=i) for i in range(args.n)]
+        print(json.dumps({
+            "goal": goal,
+            "targets": targets,
+            "p50_ms": round(lat[len(lat) // 2], 3),
+            "p95_ms": round(lat[int(len(lat) * 0.95) - 1], 3),
+            "target_hit_rate": round(hit_rate(cat, plans, targets), 3),
+            "random_choice_hit_rate": round(hit_rate(cat, baseline, targets), 3),
+        }))
+
+
+if __name__ == "__main__":
+    main()
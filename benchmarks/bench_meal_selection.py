@@ -0,0 +1,89 @@
+# benchmarks/bench_meal_selection.py
+"""Per-request cost of select_meal_skeleton: legacy (re-parse recipes.json) vs RecipeCatalog.
+
+Run from the repo root:
+    python -m benchmarks.bench_meal_selection [--n 2000]
+"""
+import argparse, json, random, time
+from typing import Any, Dict, List
+
+from app.rag.recipes import RECIPES_JSON, catalog, select_meal_skeleton
+from app.rag.restrictions import resolve
+
+
+def legacy_select_meal_skeleton(days: int = 3, seed: int | None = None, dietary_restrictions: str | None = None) -> List[Dict[str, Any]]:
+    """The pre-catalog implementation (diet branches trimmed to the ones exercised below)."""
+    rng = random.Random(seed or random.randint(0, 10_000))
+    with open(RECIPES_JSON, "r", encoding="utf-8") as f:
+        recipes = json.load(f)
+    if dietary_restrictions:
+        restrictions_lower = dietary_restrictions.lower()
+        filtered_recipes = []
+        for recipe in recipes:
+            recipe_diets = [d.lower() for d in recipe.get("diet", [])]
+            if "vegan" in restrictions_lower:
+                if "vegan" in recipe_diets:
+                    filtered_recipes.append(recipe)
+            elif "vegetarian" in restrictions_lower:
+                if "vegetarian" in recipe_diets or "vegan" in recipe_diets:
+                    filtered_recipes.append(recipe)
+            elif "gluten-free" in restrictions_lower:
+                if "gluten-free" in recipe_diets:
+                    filtered_recipes.append(recipe)
+            else:
+                filtered_recipes.append(recipe)
+        recipes = filtered_recipes if filtered_recipes else recipes
+    groups: Dict[str, List[Dict[str, Any]]] = {"breakfast": [], "lunch": [], "dinner": []}
+    for r in recipes:
+        for m in (r.get("meal") or []):
+            if m in groups:
+                groups[m].append(r)
+    used_names = set()
+    out = []
+    for _ in range(days):
+        def pick(bucket):
+            candidates = [r for r in bucket if r.get("name") not in used_names] or bucket
+            choice = rng.choice(candidates)
+            used_names.add(choice.get("name"))
+            return choice
+        out.append({
+            "breakfast": pick(groups["breakfast"] or recipes),
+            "lunch": pick(groups["lunch"] or recipes),
+            "dinner": pick(groups["dinner"] or recipes),
+        })
+    return out
+
+
+def _time(fn, n: int) -> float:
+    restrictions = [None, "vegan", "vegetarian", "gluten-free"]
+    t = time.perf_counter()
+    for i in range(n):
+        fn(days=3, seed=i + 1, dietary_restrictions=restrictions[i % len(restrictions)])
+    return (time.perf_counter() - t) / n * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=2000)
+    args = ap.parse_args()
+
+    print(f"recipes: {len(catalog.recipes)}  iterations: {args.n}")
+    before = _time(legacy_select_meal_skeleton, args.n)
+    after = _time(select_meal_skeleton, args.n)
+    print(f"legacy  (parse per call): {before:9.1f} µs/request")
+    print(f"catalog (indexed)       : {after:9.1f} µs/request")
+    print(f"speedup                 : {before / after:9.1f}x")
+
+    t = time.perf_counter()
+    for _ in range(args.n):
+        catalog.select(meal="lunch", diet=["vegan"])
+    print(f"'vegan lunch' lookup    : {(time.perf_counter() - t) / args.n * 1e6:9.2f} µs")
+
+    t = time.perf_counter()
+    for _ in range(args.n):
+        resolve(catalog, "vegan, gluten-free, no peanuts or soy")
+    print(f"4-restriction resolve   : {(time.perf_counter() - t) / args.n * 1e6:9.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bench_startup.py
+"""Worker cold start: `python -X importtime -c "import app.main"` plus the planner build.
+
+Each measurement runs in a fresh interpreter. The import runs without OPENAI_API_KEY to
+show it doesn't need one. --planner additionally times get_planner() (needs a key and
+an index; no network calls are made while building it).
+
+    python -m benchmarks.bench_startup [--runs 5] [--top 15] [--planner]
+"""
+import argparse, os, re, statistics, subprocess, sys, time
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("openai", "langchain_openai", "langchain_community", "chromadb", "langchain.text_splitter", "pypdf", "bs4")
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _run(code: str, env: Dict[str, str], importtime: bool = False) -> Tuple[float, str, str]:
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    t = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - t
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr[-2000:])
+    return elapsed, proc.stdout, proc.stderr
+
+
+def top_imports(stderr: str, n: int) -> List[Tuple[int, str]]:
+    """(cumulative µs, module) of the slowest top-level-ish imports."""
+    rows = [(int(m.group(2)), len(m.group(3)), m.group(4)) for m in map(_LINE.match, stderr.splitlines()) if m]
+    return [(cum, name) for cum, depth, name in sorted(rows, reverse=True) if depth <= 5][:n]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--planner", action="store_true", help="also time get_planner() in a fresh process")
+    args = ap.parse_args()
+
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+    probe = f"import sys, app.main; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    walls = []
+    for _ in range(args.runs):
+        wall, heavy, _ = _run(probe, env)
+        walls.append(wall)
+    _, _, trace = _run("import app.main", env, importtime=True)
+
+    print(f"import app.main (no OPENAI_API_KEY): median {statistics.median(walls) * 1000:.0f} ms wall "
+          f"over {args.runs} fresh interpreters")
+    print(f"heavy modules loaded at import: {heavy.strip() or 'none'}")
+    print("slowest imports (cumulative):")
+    for cum, name in top_imports(trace, args.top):
+        print(f"  {cum / 1000:8.1f} ms  {name}")
+
+    if args.planner:
+        code = ("import time; t = time.perf_counter(); from app.rag.pipeline import get_planner; get_planner(); "
+                "print(f'{time.perf_counter() - t:.3f}')")
+        wall, out, _ = _run(code, dict(os.environ))
+        print(f"get_planner() cold: {float(out.strip().splitlines()[-1]) * 1000:.0f} ms "
+              f"({wall * 1000:.0f} ms process wall)")
+
+
+if __name__ == "__main__":
+    main()
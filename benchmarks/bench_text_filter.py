@@ -0,0 +1,116 @@
+# benchmarks/bench_text_filter.py
+"""Boilerplate filtering throughput on the bundled PDFs: legacy per-line loops vs app/rag/text_filter.
+
+Lines: the loaders' line filter (_strip_boilerplate) over every extracted page.
+Chunks: build_index's _bad_chunk plus the boilerplate/case-study flags over 700-char windows.
+Matchers: Matcher.search / Matcher.positions vs one compiled alternation of the same tokens.
+Outputs are checked to be identical before timing.
+
+    python -m benchmarks.bench_text_filter [--repeat 50]
+"""
+import argparse, bisect, glob, os, re, time
+from typing import Callable, List, Sequence
+
+from pypdf import PdfReader
+
+from app.config import DATA_DIR
+from app.ingest.build_index import _bad_chunk
+from app.ingest.loaders import _strip_boilerplate
+from app.rag.text_filter import (
+    AD_CHUNK_TOKENS, AD_CHUNKS, AD_LINE_TOKENS, AD_LINES, BOILERPLATE, BOILERPLATE_TOKENS, CASE_STUDY, CASE_TOKENS,
+    URL_RE, Matcher,
+)
+
+_WS = re.compile(r"\s+")
+
+
+def legacy_strip_boilerplate(text: str) -> str:
+    """The pre-text_filter loaders implementation."""
+    def looks_like_boilerplate(line: str) -> bool:
+        low = line.lower()
+        if len(low) < 30:
+            return True
+        if URL_RE.search(low):
+            return True
+        if any(tok in low for tok in AD_LINE_TOKENS):
+            return True
+        alpha = sum(c.isalpha() for c in low)
+        return alpha < 10
+
+    lines = [l.strip() for l in text.splitlines() if l.strip()]
+    keep = [l for l in lines if not looks_like_boilerplate(l)]
+    return _WS.sub(" ", "\n".join(keep)).strip()
+
+
+def legacy_chunk_checks(txt: str) -> tuple:
+    low = txt.lower()
+    bad = (len(low) < 250 or low.count("http") >= 2 or sum(c.isalpha() for c in low) < 100
+           or any(t in low for t in AD_CHUNK_TOKENS))
+    return bad, any(t in low for t in BOILERPLATE_TOKENS), any(t in low for t in CASE_TOKENS)
+
+
+def chunk_checks(txt: str) -> tuple:
+    low = txt.lower()
+    return _bad_chunk(txt), BOILERPLATE.search(low), CASE_STUDY.search(low)
+
+
+def alternation(matcher: Matcher) -> "re.Pattern[str]":
+    """The rejected alternative to Matcher's per-token scan: one regex over the same tokens."""
+    return re.compile("|".join(map(re.escape, matcher._scan)))
+
+
+def _lines_hit(low: str, hits: List[int]) -> List[int]:
+    starts = [0] + [i + 1 for i, c in enumerate(low) if c == "\n"]
+    return sorted({bisect.bisect_right(starts, h) for h in hits})
+
+
+def _rate(fn: Callable[[str], object], items: Sequence[str], units: int, repeat: int) -> float:
+    t = time.perf_counter()
+    for _ in range(repeat):
+        for x in items:
+            fn(x)
+    return units * repeat / (time.perf_counter() - t)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+
+    pages: List[str] = []
+    for path in sorted(glob.glob(os.path.join(os.fspath(DATA_DIR), "*.pdf"))):
+        pages += [p.extract_text() or "" for p in PdfReader(path).pages]
+    n_lines = sum(1 for p in pages for l in p.splitlines() if l.strip())
+    text = "\n".join(pages)
+    chunks = [text[i:i + 700] for i in range(0, len(text), 350)]
+
+    assert [legacy_strip_boilerplate(p) for p in pages] == [_strip_boilerplate(p) for p in pages]
+    assert [legacy_chunk_checks(c) for c in chunks] == [chunk_checks(c) for c in chunks]
+
+    print(f"{len(pages)} PDF pages, {n_lines} lines, {len(chunks)} chunks; identical output")
+    for name, items, units, old, new in (
+        ("lines", pages, n_lines, legacy_strip_boilerplate, _strip_boilerplate),
+        ("chunks", chunks, len(chunks), legacy_chunk_checks, chunk_checks),
+    ):
+        before = _rate(old, items, units, args.repeat)
+        after = _rate(new, items, units, args.repeat)
+        print(f"{name:>6}: legacy {before:>10,.0f}/s   text_filter {after:>10,.0f}/s   ({after / before:.1f}x)")
+
+    lows = [p.lower() for p in pages]
+    low_chunks = [c.lower() for c in chunks]
+    for name, matcher in (("ad_lines", AD_LINES), ("ad_chunks", AD_CHUNKS), ("boilerplate", BOILERPLATE), ("case", CASE_STUDY)):
+        rx = alternation(matcher)
+        assert [matcher.search(c) for c in low_chunks] == [rx.search(c) is not None for c in low_chunks]
+        # the alternation finds non-overlapping matches only; compare the lines they flag
+        assert ([_lines_hit(p, matcher.positions(p)) for p in lows]
+                == [_lines_hit(p, [m.start() for m in rx.finditer(p)]) for p in lows])
+        scan = _rate(matcher.search, low_chunks, len(chunks), args.repeat)
+        regex = _rate(rx.search, low_chunks, len(chunks), args.repeat)
+        scan_pos = _rate(matcher.positions, lows, len(pages), args.repeat)
+        regex_pos = _rate(lambda p: [m.start() for m in rx.finditer(p)], lows, len(pages), args.repeat)
+        print(f"{name:>11}: search    regex {regex:>10,.0f}/s   Matcher {scan:>10,.0f}/s   ({scan / regex:.1f}x)")
+        print(f"{'':>11}  positions regex {regex_pos:>10,.0f}/s   Matcher {scan_pos:>10,.0f}/s   ({scan_pos / regex_pos:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/bench_vector_store.py
+"""Query latency and memory of the vector backends (Chroma vs in-process NumPy).
+
+Each backend runs in its own subprocess so import cost and RSS are measured in isolation.
+Vectors are random unit vectors; no OpenAI calls are made.
+
+    python -m benchmarks.bench_vector_store [--rows 5000] [--dim 1536] [--queries 200]
+"""
+import argparse, json, os, resource, statistics, subprocess, sys, tempfile, time
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+
+def _rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return r / (1024 * 1024) if sys.platform == "darwin" else r / 1024
+
+
+def child(backend: str, rows: int, dim: int, queries: int, workdir: str) -> None:
+    import numpy as np
+
+    t = time.perf_counter()
+    from app.rag.vectorstore import open_vector_store
+    store = open_vector_store(backend=backend, persist_dir=workdir)
+    import_s = time.perf_counter() - t
+
+    rng = np.random.default_rng(0)
+    if not store.count():
+        vecs = rng.standard_normal((rows, dim), dtype=np.float32)
+        ids = [f"c{i}" for i in range(rows)]
+        texts = [f"chunk {i}" for i in range(rows)]
+        metas = [{"source": "bench", "page": i} for i in range(rows)]
+        t = time.perf_counter()
+        store.upsert(ids, vecs, texts, metas)
+        store.persist()
+        build_s = time.perf_counter() - t
+        del vecs
+        # reopen so the query phase sees the persisted (memory-mapped) index
+        store = open_vector_store(backend=backend, persist_dir=workdir)
+    else:
+        build_s = 0.0
+
+    qs = rng.standard_normal((queries, dim), dtype=np.float32)
+    lat = []
+    for q in qs:
+        t = time.perf_counter()
+        store.mmr_search(q.tolist(), k=4, fetch_k=16, lambda_mult=0.5)
+        lat.append((time.perf_counter() - t) * 1000)
+    lat.sort()
+    print(json.dumps({
+        "backend": backend,
+        "rows": store.count(),
+        "import_open_s": round(import_s, 3),
+        "build_s": round(build_s, 3),
+        "p50_ms": round(statistics.median(lat), 3),
+        "p95_ms": round(lat[int(len(lat) * 0.95) - 1], 3),
+        "max_rss_mb": round(_rss_mb(), 1),
+    }))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=5000)
+    ap.add_argument("--dim", type=int, default=1536)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--backends", default="chroma,numpy")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    ap.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        child(args.child, args.rows, args.dim, args.queries, args.workdir)
+        return
+
+    print(f"rows={args.rows} dim={args.dim} queries={args.queries} (MMR k=4, fetch_k=16)")
+    for backend in args.backends.split(","):
+        with tempfile.TemporaryDirectory() as d:
+            cmd = [sys.executable, "-m", "benchmarks.bench_vector_store", "--child", backend, "--workdir", d,
+                   "--rows", str(args.rows), "--dim", str(args.dim), "--queries", str(args.queries)]
+            # build in one process, query in a fresh one so RSS reflects serving, not ingest
+            built = subprocess.run(cmd + ["--queries", "1"], check=True, capture_output=True, text=True).stdout
+            served = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+            result = json.loads(served.strip().splitlines()[-1])
+            result["build_s"] = json.loads(built.strip().splitlines()[-1])["build_s"]
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# benchmarks/fake_openai.py
+"""Local stand-in for the OpenAI chat-completions and embeddings endpoints.
+
+No API key and no network needed. Point the app at it with
+OPENAI_BASE_URL=http://127.0.0.1:18080/v1. Latency follows a simple model:
+
+    chat:        ttft + completion_tokens / tokens_per_s   (streamed at that rate when stream=true)
+    embeddings:  embed_ms + embed_ms_per_input * len(input)
+
+Both get ± jitter. JSON-mode calls return a schema-valid 3-day plan; other chat
+calls return cited bullets. Each call is padded to its configured completion
+size. Embeddings hash words (or token ids) into `dim` buckets and L2-normalize.
+That makes them deterministic, and texts that share words land close together,
+so vector search and the semantic plan cache behave plausibly.
+GET /stats returns call and token counters; POST /stats/reset clears them.
+
+    python -m benchmarks.fake_openai [--port 18080] [--ttft-ms 250] [--tokens-per-s 150] [--dim 256]
+"""
+import argparse, json, math, random, threading, time, zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+FILLER = ("Spread protein across meals, favor whole grains and vegetables, hydrate through the day, "
+          "and progress training volume gradually while keeping one or two rest days each week. ")
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeOpenAI:
+    """Latency model + response builders + counters, shared by all handler threads."""
+
+    def __init__(self, ttft_ms: float = 250.0, tokens_per_s: float = 150.0, plan_tokens: int = 400,
+                 summary_tokens: int = 120, embed_ms: float = 40.0, embed_ms_per_input: float = 0.05,
+                 dim: int = 256, jitter: float = 0.1, error_rate: float = 0.0, seed: int = 0) -> None:
+        self.ttft_ms = ttft_ms
+        self.tokens_per_s = tokens_per_s
+        self.plan_tokens = plan_tokens
+        self.summary_tokens = summary_tokens
+        self.embed_ms = embed_ms
+        self.embed_ms_per_input = embed_ms_per_input
+        self.dim = dim
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stats: Dict[str, float] = {
+                "chat_requests": 0, "chat_stream_requests": 0, "embedding_requests": 0, "embedding_inputs": 0,
+                "prompt_tokens": 0, "completion_tokens": 0, "embedding_tokens": 0, "errors_injected": 0,
+            }
+
+    def count(self, **deltas: float) -> None:
+        with self._lock:
+            for k, v in deltas.items():
+                self.stats[k] += v
+
+    def _jittered(self, seconds: float) -> float:
+        with self._lock:
+            f = 1.0 + self._rng.uniform(-self.jitter, self.jitter)
+        return max(0.0, seconds * f)
+
+    def fail_now(self) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            hit = self._rng.random() < self.error_rate
+        if hit:
+            self.count(errors_injected=1)
+        return hit
+
+    def ttft_s(self) -> float:
+        return self._jittered(self.ttft_ms / 1000.0)
+
+    def token_s(self, tokens: int) -> float:
+        return self._jittered(tokens / self.tokens_per_s) if self.tokens_per_s > 0 else 0.0
+
+    def embed_s(self, n: int) -> float:
+        return self._jittered((self.embed_ms + self.embed_ms_per_input * n) / 1000.0)
+
+    # --- Responses ---
+
+    def chat_content(self, body: Dict[str, Any]) -> str:
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            return self._plan_json(self.plan_tokens)
+        lines = ["- Aim for a consistent protein intake at each meal [Source: guidelines p.1]"]
+        while estimate_tokens("\n".join(lines)) < self.summary_tokens:
+            lines.append(f"- {FILLER.strip()} [Source: guidelines p.{len(lines) + 1}]")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _plan_json(tokens: int) -> str:
+        days = [{"day": f"Day {i}", "meals": {"breakfast": f"Breakfast {i}", "lunch": f"Lunch {i}",
+                                              "dinner": f"Dinner {i}"},
+                 "workout": f"Full-body strength session {i}, 40 minutes, plus a 10 minute walk"}
+                for i in (1, 2, 3)]
+        out = {"plan": {"days": days}, "tips": [], "caution": "Check with a clinician before large changes."}
+        while estimate_tokens(json.dumps(out)) < tokens:
+            out["tips"].append(FILLER.strip())
+        return json.dumps(out)
+
+    def embed(self, item: Any) -> List[float]:
+        feats = item if isinstance(item, list) else str(item).lower().split()
+        v = [0.0] * self.dim
+        for f in feats:
+            h = zlib.crc32(str(f).encode("utf-8", "ignore"))
+            v[h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        norm = math.sqrt(sum(x * x for x in v)) or 1.0
+        return [x / norm for x in v]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake: FakeOpenAI
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def _json(self, obj: Any, status: int = 200, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path.rstrip("/").endswith("/stats"):
+            with self.fake._lock:
+                return self._json(dict(self.fake.stats))
+        if self.path.rstrip("/").endswith("/models"):
+            return self._json({"object": "list", "data": []})
+        self._json({"error": {"message": "not found"}}, 404)
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        path = self.path.rstrip("/")
+        if path.endswith("/stats/reset"):
+            self.fake.reset()
+            return self._json({"ok": True})
+        if path.endswith("/embeddings") or path.endswith("/chat/completions"):
+            if self.fake.fail_now():
+                return self._json({"error": {"message": "rate limited (injected)", "type": "rate_limit"}}, 429,
+                                  {"retry-after": "0.2"})
+        if path.endswith("/embeddings"):
+            return self._embeddings(body)
+        if path.endswith("/chat/completions"):
+            return self._chat(body)
+        self._json({"error": {"message": "not found"}}, 404)
+
+    def _embeddings(self, body: Dict[str, Any]) -> None:
+        inputs = body.get("input")
+        if isinstance(inputs, str) or (isinstance(inputs, list) and inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        inputs = inputs or []
+        tokens = sum(len(x) if isinstance(x, list) else estimate_tokens(str(x)) for x in inputs)
+        time.sleep(self.fake.embed_s(len(inputs)))
+        self.fake.count(embedding_requests=1, embedding_inputs=len(inputs), embedding_tokens=tokens)
+        self._json({
+            "object": "list", "model": body.get("model", "fake-embedding"),
+            "data": [{"object": "embedding", "index": i, "embedding": self.fake.embed(x)} for i, x in enumerate(inputs)],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    def _chat(self, body: Dict[str, Any]) -> None:
+        prompt_tokens = sum(estimate_tokens(str(m.get("content") or "")) for m in body.get("messages") or [])
+        content = self.fake.chat_content(body)
+        completion_tokens = estimate_tokens(content)
+        model = body.get("model", "fake-chat")
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        self.fake.count(chat_requests=1, chat_stream_requests=1 if body.get("stream") else 0,
+                        prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        time.sleep(self.fake.ttft_s())
+        if not body.get("stream"):
+            time.sleep(self.fake.token_s(completion_tokens))
+            return self._json({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(choices: List[Dict[str, Any]], extra: Optional[Dict[str, Any]] = None) -> None:
+            chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": choices, **(extra or {})}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+
+        piece = 32  # chars per chunk, ~8 tokens
+        for i in range(0, len(content), piece):
+            event([{"index": 0, "delta": {"content": content[i:i + piece]}, "finish_reason": None}])
+            time.sleep(self.fake.token_s(estimate_tokens(content[i:i + piece])))
+        event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (body.get("stream_options") or {}).get("include_usage"):
+            event([], {"usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def serve(fake: FakeOpenAI, host: str = "127.0.0.1", port: int = 18080) -> ThreadingHTTPServer:
+    handler = type("BoundHandler", (Handler,), {"fake": fake})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Fake OpenAI chat/embeddings server for offline benchmarks")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=18080)
+    ap.add_argument("--ttft-ms", type=float, default=250.0, help="chat: time to first token")
+    ap.add_argument("--tokens-per-s", type=float, default=150.0, help="chat: completion token rate (0 = instant)")
+    ap.add_argument("--plan-tokens", type=int, default=400, help="completion size of JSON-mode (plan) calls")
+    ap.add_argument("--summary-tokens", type=int, default=120, help="completion size of other chat calls")
+    ap.add_argument("--embed-ms", type=float, default=40.0, help="embeddings: fixed latency per request")
+    ap.add_argument("--embed-ms-per-input", type=float, default=0.05)
+    ap.add_argument("--dim", type=int, default=256, help="embedding dimension")
+    ap.add_argument("--jitter", type=float, default=0.1, help="± fraction applied to every latency")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with 429")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    fake = FakeOpenAI(args.ttft_ms, args.tokens_per_s, args.plan_tokens, args.summary_tokens, args.embed_ms,
+                      args.embed_ms_per_input, args.dim, args.jitter, args.error_rate, args.seed)
+    server = serve(fake, args.host, args.port)
+    print(f"[fake-openai] listening on http://{args.host}:{args.port}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# benchmarks/gen_corpus.py
+"""Synthetic corpus, recipes.json and goal mix for offline load tests.
+
+    python -m benchmarks.gen_corpus OUT_DIR [--chunks 100000] [--recipes 10000] [--requests 2000]
+
+Writes into OUT_DIR:
+    corpus/doc_00000.txt ...  guideline-style prose, about --chunks chunks once split by build_index
+    corpus/recipes.json       --recipes recipes in the app's schema, diet tags consistent with ingredients
+    goals.jsonl               --requests PlanRequest rows over --unique-goals goals with Zipf-skewed repeats
+
+Every sentence is assembled from independent slots, so chunks pass the quality
+filter and aren't near-duplicates of each other. Index it offline (with
+benchmarks/fake_openai.py running):
+
+    DATA_DIR=OUT_DIR/corpus CHROMA_PERSIST_DIR=OUT_DIR/index OPENAI_BASE_URL=http://127.0.0.1:18080/v1 \\
+        OPENAI_API_KEY=sk-fake python -m app.ingest.reindex
+
+benchmarks/load_test.py --data OUT_DIR does this (and the server) for you.
+"""
+import argparse, json, os, random
+from typing import Any, Dict, List
+
+CHARS_PER_CHUNK = 600  # 700-char chunks with 120 overlap, see build_index's splitter
+
+TOPICS = ("protein intake", "resistance training", "sleep duration", "hydration", "fiber intake", "step count",
+          "recovery days", "meal timing", "vegetable servings", "whole grains", "added sugar", "sodium",
+          "aerobic activity", "mobility work", "calorie balance", "breakfast quality", "late-night snacking",
+          "caffeine timing", "progressive overload", "healthy fats", "legume consumption", "portion size")
+SUBJECTS = ("Adults", "Older adults", "Beginners", "Most people", "Active adults", "Office workers",
+            "Endurance athletes", "Shift workers", "Parents", "Students", "Runners", "Lifters")
+VERBS = ("should aim for", "benefit from", "can improve", "tend to overlook", "often underestimate",
+         "can gradually increase", "should spread out", "may need to adjust", "can track", "should prioritize")
+QUALIFIERS = ("on most days", "across the week", "during busy periods", "after age fifty", "in the evening",
+              "around workouts", "on rest days", "over several months", "at each main meal", "when traveling")
+EVIDENCE = ("Observational data link this to", "Controlled trials associate this with", "Reviews connect this with",
+            "Cohort studies tie this to", "Meta-analyses relate this to", "Guidelines cite")
+OUTCOMES = ("lower blood pressure", "better glucose control", "improved mood", "stronger bones", "lean mass gains",
+            "steadier energy", "fewer injuries", "better sleep quality", "reduced cardiovascular risk",
+            "healthier body weight", "faster recovery", "improved focus")
+
+PROTEINS = {  # name → (kind, grams protein per serving)
+    "tofu": ("plant", 20), "tempeh": ("plant", 22), "lentils": ("legume", 18), "chickpeas": ("legume", 15),
+    "black beans": ("legume", 15), "seitan": ("gluten", 25), "edamame": ("plant", 17), "eggs": ("egg", 18),
+    "greek yogurt": ("dairy", 20), "cottage cheese": ("dairy", 24), "paneer": ("dairy", 18),
+    "chicken": ("meat", 38), "turkey": ("meat", 34), "beef": ("meat", 36), "pork": ("meat", 33),
+    "salmon": ("fish", 34), "tuna": ("fish", 36), "cod": ("fish", 30), "shrimp": ("shellfish", 28),
+}
+GRAINS = {"brown rice": True, "quinoa": True, "oats": True, "buckwheat": True, "corn tortillas": True,
+          "sweet potato": True, "whole wheat pasta": False, "barley": False, "sourdough bread": False, "": True}
+VEG = ("spinach", "broccoli", "bell pepper", "zucchini", "kale", "tomato", "cucumber", "carrot", "cauliflower",
+       "mushrooms", "green beans", "asparagus", "cabbage", "onion", "snap peas", "lettuce", "beets")
+FATS = {"olive oil": "", "avocado": "", "tahini": "", "almonds": "nut", "walnuts": "nut", "peanut butter": "nut",
+        "feta": "dairy", "butter": "dairy", "coconut oil": "", "pumpkin seeds": ""}
+SEASONINGS = ("garlic", "ginger", "cumin", "paprika", "lemon", "soy sauce", "chili", "oregano", "basil", "turmeric",
+              "black pepper", "cilantro", "rosemary", "miso", "lime")
+CUISINES = ("mediterranean", "mexican", "japanese", "indian", "thai", "american", "middle-eastern", "korean",
+            "italian", "greek", "ethiopian", "peruvian")
+STYLES = ("Bowl", "Stir-Fry", "Salad", "Wrap", "Skillet", "Curry", "Traybake", "Stew", "Tacos", "Plate",
+          "Scramble", "Parfait", "Soup", "Skewers")
+ADJECTIVES = ("Smoky", "Zesty", "Herbed", "Spiced", "Roasted", "Garlicky", "Citrus", "Golden", "Crispy", "Savory",
+              "Fresh", "Charred", "Sesame", "Tangy")
+
+GOALS = ("muscle gain", "fat loss", "endurance training", "better sleep", "weight maintenance", "lower blood pressure",
+         "more energy", "marathon prep", "strength for beginners", "healthy aging")
+RESTRICTIONS = (None, None, None, "vegan", "vegetarian", "gluten-free", "dairy-free", "vegetarian, no nuts",
+                "no shellfish", "gluten-free and dairy-free", "pescatarian", "vegan, no soy")
+
+
+def sentence(rng: random.Random) -> str:
+    if rng.random() < 0.5:
+        return (f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(TOPICS)} {rng.choice(QUALIFIERS)}, "
+                f"about {rng.randint(2, 60)} {rng.choice(('minutes', 'grams', 'servings', 'percent', 'sessions'))} "
+                f"more than the {rng.choice(('median', 'typical', 'baseline', 'reported'))} level.")
+    return (f"{rng.choice(EVIDENCE)} {rng.choice(OUTCOMES)} in {rng.randint(3, 95)} of {rng.randint(100, 999)} "
+            f"{rng.choice(('participants', 'adults', 'respondents', 'volunteers'))} tracked for "
+            f"{rng.randint(2, 52)} weeks, especially alongside {rng.choice(TOPICS)}.")
+
+
+def write_corpus(out_dir: str, chunks: int, per_file: int, rng: random.Random) -> int:
+    os.makedirs(out_dir, exist_ok=True)
+    n_files = max(1, -(-chunks // per_file))
+    for i in range(n_files):
+        target = CHARS_PER_CHUNK * min(per_file, chunks - i * per_file)
+        parts: List[str] = [f"Nutrition and Activity Notes, volume {i + 1}"]
+        size = 0
+        while size < target:
+            para = " ".join(sentence(rng) for _ in range(rng.randint(3, 6)))
+            parts.append(para)
+            size += len(para) + 2
+        with open(os.path.join(out_dir, f"doc_{i:05d}.txt"), "w", encoding="utf-8") as f:
+            f.write("\n\n".join(parts) + "\n")
+    return n_files
+
+
+def make_recipe(rng: random.Random, names: set) -> Dict[str, Any]:
+    protein = rng.choice(list(PROTEINS))
+    kind, grams = PROTEINS[protein]
+    grain = rng.choice(list(GRAINS))
+    fat = rng.choice(list(FATS))
+    style = rng.choice(STYLES)
+    meals = ["breakfast"] if style in ("Scramble", "Parfait") else rng.sample(["lunch", "dinner"], rng.randint(1, 2))
+    base = f"{rng.choice(ADJECTIVES)} {protein.title()} {style}"
+    name, n = base, 2
+    while name in names:
+        name, n = f"{base} No. {n}", n + 1
+    names.add(name)
+
+    diet = []
+    dairy = kind == "dairy" or FATS[fat] == "dairy"
+    if kind in ("plant", "legume", "gluten") and not dairy:
+        diet.append("vegan")
+    if kind in ("plant", "legume", "gluten", "egg", "dairy"):
+        diet.append("vegetarian")
+    if GRAINS[grain] and kind != "gluten":
+        diet.append("gluten-free")
+    if not dairy:
+        diet.append("dairy-free")
+    if not grain:
+        diet.append("low-carb")
+        if kind not in ("legume", "gluten"):
+            diet.append("keto")
+            if kind in ("meat", "fish", "shellfish", "egg") and not dairy:
+                diet.append("paleo")
+
+    carbs = rng.randint(35, 80) if grain else rng.randint(8, 20)
+    fat_g = rng.randint(10, 35)
+    protein_g = grams + rng.randint(-4, 8)
+    return {
+        "name": name,
+        "meal": meals,
+        "protein": [protein],
+        "grain": [grain] if grain else [],
+        "veg": rng.sample(VEG, rng.randint(2, 4)),
+        "fat": [fat],
+        "seasonings": rng.sample(SEASONINGS, rng.randint(2, 4)),
+        "cuisine": rng.choice(CUISINES),
+        "diet": diet,
+        "approx_kcal": 4 * (carbs + protein_g) + 9 * fat_g,
+        "macros": {"protein_g": protein_g, "carbs_g": carbs, "fat_g": fat_g},
+    }
+
+
+def make_goals(rng: random.Random, unique: int, requests: int, zipf_s: float) -> List[Dict[str, Any]]:
+    pool = []
+    for i in range(unique):
+        goal = f"{rng.choice((3, 3, 3, 5, 7))}-day {rng.choice(GOALS)} plan"
+        if rng.random() < 0.4:
+            goal += f" under {rng.randrange(1600, 3200, 100)} kcal"
+        if rng.random() < 0.3:
+            goal += f" with {rng.randrange(90, 200, 10)} g protein"
+        profile = {"age": rng.randint(18, 75), "weight_kg": round(rng.uniform(50, 110), 1),
+                   "restrictions": rng.choice(RESTRICTIONS)}
+        pool.append({"goal": goal, "profile": profile})
+    weights = [1.0 / (rank + 1) ** zipf_s for rank in range(unique)]
+    return rng.choices(pool, weights=weights, k=requests)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Generate a synthetic corpus, recipes.json and goal mix")
+    ap.add_argument("out_dir")
+    ap.add_argument("--chunks", type=int, default=100_000, help="approximate chunks after splitting")
+    ap.add_argument("--chunks-per-file", type=int, default=200)
+    ap.add_argument("--recipes", type=int, default=10_000)
+    ap.add_argument("--requests", type=int, default=2_000, help="rows in goals.jsonl")
+    ap.add_argument("--unique-goals", type=int, default=300)
+    ap.add_argument("--zipf", type=float, default=1.1, help="skew of goal repeats (0 = uniform)")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = os.path.join(args.out_dir, "corpus")
+    n_files = write_corpus(corpus, args.chunks, args.chunks_per_file, rng)
+    names: set = set()
+    recipes = [make_recipe(rng, names) for _ in range(args.recipes)]
+    with open(os.path.join(corpus, "recipes.json"), "w", encoding="utf-8") as f:
+        json.dump(recipes, f)
+    goals = make_goals(rng, args.unique_goals, args.requests, args.zipf)
+    with open(os.path.join(args.out_dir, "goals.jsonl"), "w", encoding="utf-8") as f:
+        for row in goals:
+            f.write(json.dumps(row) + "\n")
+    print(f"[gen] {n_files} corpus files (~{args.chunks} chunks), {len(recipes)} recipes, "
+          f"{len(goals)} requests over {args.unique_goals} goals → {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+# benchmarks/load_test.py
+"""Offline load test of app.main:app: fake OpenAI server + (optional) index build + uvicorn + a replayed goal mix.
+
+    python -m benchmarks.gen_corpus /tmp/ht-bench --chunks 100000 --recipes 10000
+    python -m benchmarks.load_test --data /tmp/ht-bench --concurrency 32 --duration 60
+
+Without --data it uses app/data, with an index built under .bench/ (the fake server's
+embeddings don't match the real model's, so it never touches your real index) and a
+built-in goal mix. --url targets a server that is already running instead, and
+--no-fake spends real OpenAI tokens.
+
+Reports:
+- p50/p95/p99/max latency (full body; time to first byte too for --endpoint stream)
+- RPS and status counts
+- the server's RSS (start / peak / end, read from /proc)
+- OpenAI calls and tokens per request, from the fake server's counters
+
+Appends one JSON object per run to --out (default benchmarks/results/load_test.jsonl),
+so runs can be compared over time.
+"""
+import argparse, asyncio, itertools, json, os, platform, shlex, socket, subprocess, sys, tempfile, threading, time
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUT = os.path.join(ROOT, "benchmarks", "results", "load_test.jsonl")
+
+BUILTIN_MIX = [
+    {"goal": "3-day muscle gain plan", "profile": {"age": 28, "weight_kg": 75, "restrictions": None}},
+    {"goal": "3-day fat loss plan under 1800 kcal", "profile": {"age": 41, "restrictions": "vegetarian"}},
+    {"goal": "3-day endurance training plan", "profile": {"restrictions": "gluten-free"}},
+    {"goal": "3-day better sleep plan", "profile": {"age": 55, "restrictions": "vegan, no nuts"}},
+    {"goal": "5-day weight maintenance plan with 140 g protein", "profile": {"restrictions": "no shellfish"}},
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_http(url: str, timeout: float, ok: Tuple[int, ...] = (200,), proc: Optional[subprocess.Popen] = None) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise SystemExit(f"process for {url} exited with {proc.returncode}")
+        try:
+            if httpx.get(url, timeout=2).status_code in ok:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise SystemExit(f"timed out waiting for {url}")
+
+
+def _rss_kb(pid: int) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    out[line.split(":")[0]] = int(line.split()[1])
+    except OSError:
+        pass
+    return out
+
+
+class RssSampler(threading.Thread):
+    """Samples a process's VmRSS every `interval` seconds until stopped."""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.5) -> None:
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples: List[int] = []
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while self.pid and not self._stop_event.is_set():
+            rss = _rss_kb(self.pid).get("VmRSS")
+            if rss is not None:
+                self.samples.append(rss)
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> Dict[str, Optional[float]]:
+        self._stop_event.set()
+        self.join(timeout=2)
+        hwm = _rss_kb(self.pid).get("VmHWM") if self.pid else None
+        mb = lambda kb: round(kb / 1024, 1) if kb else None
+        return {"start_mb": mb(self.samples[0] if self.samples else None), "end_mb": mb(self.samples[-1] if self.samples else None),
+                "max_sampled_mb": mb(max(self.samples) if self.samples else None), "peak_mb": mb(hwm)}
+
+
+def read_mix(path: Optional[str]) -> List[Dict[str, Any]]:
+    if not path:
+        return BUILTIN_MIX
+    with open(path, "r", encoding="utf-8") as f:
+        raw = f.read().strip()
+    return json.loads(raw) if raw.startswith("[") else [json.loads(line) for line in raw.splitlines() if line.strip()]
+
+
+async def drive(url: str, endpoint: str, mix: List[Dict[str, Any]], concurrency: int, duration: float,
+                count: Optional[int], timeout: float) -> Tuple[List[Dict[str, Any]], float]:
+    """Replay `mix` in order (cycling) from `concurrency` workers; returns per-request records and wall time."""
+    path = "/plan/stream" if endpoint == "stream" else "/plan"
+    rows = itertools.cycle(mix)
+    records: List[Dict[str, Any]] = []
+    issued = 0
+    t0 = time.perf_counter()
+    deadline = t0 + duration
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal issued
+        while (count is None and time.perf_counter() < deadline) or (count is not None and issued < count):
+            issued += 1
+            body = next(rows)
+            start = time.perf_counter()
+            rec: Dict[str, Any] = {"status": None, "ttfb_s": None}
+            try:
+                async with client.stream("POST", path, json=body) as resp:
+                    async for _ in resp.aiter_bytes():
+                        if rec["ttfb_s"] is None:
+                            rec["ttfb_s"] = time.perf_counter() - start
+                    rec["status"] = resp.status_code
+            except httpx.HTTPError as e:
+                rec["error"] = type(e).__name__
+            rec["latency_s"] = time.perf_counter() - start
+            records.append(rec)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return records, time.perf_counter() - t0
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    a = np.asarray(values) * 1000.0
+    p50, p95, p99 = np.percentile(a, [50, 95, 99])
+    return {"p50": round(float(p50), 1), "p95": round(float(p95), 1), "p99": round(float(p99), 1),
+            "mean": round(float(a.mean()), 1), "max": round(float(a.max()), 1)}
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Offline load test for /plan")
+    ap.add_argument("--data", help="output dir of benchmarks.gen_corpus (corpus/, goals.jsonl); default app/data")
+    ap.add_argument("--index", help="index dir (default DATA/index, or .bench/index for app/data)")
+    ap.add_argument("--rebuild", action="store_true", help="rebuild the index even if one exists")
+    ap.add_argument("--requests", help="JSON lines of PlanRequest bodies to replay (default DATA/goals.jsonl)")
+    ap.add_argument("--endpoint", choices=("plan", "stream"), default="plan")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=30.0, help="seconds of load (ignored with --count)")
+    ap.add_argument("--count", type=int, help="send exactly this many requests")
+    ap.add_argument("--warmup", type=int, default=5, help="requests sent before measuring")
+    ap.add_argument("--timeout", type=float, default=120.0)
+    ap.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra server env (repeatable)")
+    ap.add_argument("--fake-args", default="", help='extra benchmarks.fake_openai flags, e.g. "--ttft-ms 500"')
+    ap.add_argument("--no-fake", action="store_true", help="use the real OpenAI API (costs money)")
+    ap.add_argument("--url", help="load an already running server instead of starting one")
+    ap.add_argument("--pid", type=int, help="with --url: server pid, for RSS")
+    ap.add_argument("--label", default="", help="free-form tag stored with the result")
+    ap.add_argument("--out", default=DEFAULT_OUT, help="results file (JSON lines, appended)")
+    args = ap.parse_args()
+
+    data_dir = os.path.join(args.data, "corpus") if args.data else os.path.join(ROOT, "app", "data")
+    index_dir = args.index or (os.path.join(args.data, "index") if args.data else os.path.join(ROOT, ".bench", "index"))
+    requests_path = args.requests or (os.path.join(args.data, "goals.jsonl") if args.data else None)
+    mix = read_mix(requests_path)
+
+    procs: List[subprocess.Popen] = []
+    log_dir = tempfile.mkdtemp(prefix="ht-load-")
+    env = dict(os.environ, DATA_DIR=data_dir, CHROMA_PERSIST_DIR=index_dir, PLANNER_WARMUP="blocking",
+               EMBED_CACHE_PATH=os.path.join(index_dir, "..", "embed_cache.sqlite3"))
+    fake_url = None
+
+    def spawn(name: str, cmd: List[str], proc_env: Dict[str, str]) -> subprocess.Popen:
+        log = open(os.path.join(log_dir, f"{name}.log"), "w")
+        proc = subprocess.Popen(cmd, cwd=ROOT, env=proc_env, stdout=log, stderr=subprocess.STDOUT)
+        procs.append(proc)
+        return proc
+
+    try:
+        url, pid = args.url, args.pid
+        if url is None:
+            if not args.no_fake:
+                port = _free_port()
+                fake = spawn("fake_openai", [sys.executable, "-m", "benchmarks.fake_openai", "--port", str(port),
+                                             *shlex.split(args.fake_args)], env)
+                fake_url = f"http://127.0.0.1:{port}/v1"
+                _wait_http(f"{fake_url}/stats", 30, proc=fake)
+                env.update(OPENAI_BASE_URL=fake_url, OPENAI_API_BASE=fake_url,
+                           OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY_FAKE", "sk-fake"))
+                env["EMBED_CACHE_PATH"] = os.path.join(index_dir, "..", "embed_cache.fake.sqlite3")
+            env.update(kv.split("=", 1) for kv in args.env)
+            os.makedirs(index_dir, exist_ok=True)
+
+            if args.rebuild or not os.path.exists(os.path.join(index_dir, "CURRENT")):
+                print(f"[load] building index for {data_dir} → {index_dir}")
+                t = time.time()
+                build = subprocess.run([sys.executable, "-m", "app.ingest.reindex"] + (["--full"] if args.rebuild else []),
+                                       cwd=ROOT, env=env, capture_output=True, text=True)
+                if build.returncode != 0:
+                    raise SystemExit(build.stdout[-2000:] + build.stderr[-2000:])
+                print(f"[load] index built in {time.time() - t:.1f}s")
+
+            port = _free_port()
+            server = spawn("server", [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+                                      "--port", str(port), "--log-level", "warning"], env)
+            url, pid = f"http://127.0.0.1:{port}", server.pid
+            t = time.time()
+            _wait_http(f"{url}/ready", 600, proc=server)
+            print(f"[load] server ready in {time.time() - t:.1f}s (logs in {log_dir})")
+        elif not args.no_fake:
+            fake_url = None  # external server: its OpenAI endpoint is unknown
+
+        if args.warmup:
+            asyncio.run(drive(url, args.endpoint, mix, min(args.concurrency, args.warmup), 0, args.warmup, args.timeout))
+        if fake_url:
+            httpx.post(f"{fake_url}/stats/reset", timeout=5)
+        sampler = RssSampler(pid)
+        sampler.start()
+        records, wall = asyncio.run(drive(url, args.endpoint, mix, args.concurrency, args.duration, args.count,
+                                          args.timeout))
+        rss = sampler.stop()
+        fake_stats = httpx.get(f"{fake_url}/stats", timeout=5).json() if fake_url else None
+        try:
+            server_cache = httpx.get(f"{url}/admin/cache", timeout=5).json()
+        except (httpx.HTTPError, ValueError):
+            server_cache = None
+    finally:
+        for proc in reversed(procs):
+            proc.terminate()
+        for proc in procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    ok = [r for r in records if r["status"] == 200]
+    statuses: Dict[str, int] = {}
+    for r in records:
+        key = str(r["status"]) if r["status"] is not None else r.get("error", "error")
+        statuses[key] = statuses.get(key, 0) + 1
+    n = len(records)
+    result = {
+        "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_rev": _git_rev(),
+        "label": args.label,
+        "host": {"python": platform.python_version(), "cpus": os.cpu_count(), "platform": platform.platform()},
+        "config": {"endpoint": args.endpoint, "concurrency": args.concurrency, "duration_s": args.duration,
+                   "count": args.count, "warmup": args.warmup, "data_dir": data_dir, "requests_file": requests_path,
+                   "mix_size": len(mix), "unique_goals": len({json.dumps(m, sort_keys=True) for m in mix}),
+                   "env": args.env, "fake_args": args.fake_args if fake_url else None},
+        "requests": n,
+        "ok": len(ok),
+        "statuses": statuses,
+        "wall_s": round(wall, 2),
+        "rps": round(len(ok) / wall, 2) if wall else None,
+        "latency_ms": _percentiles([r["latency_s"] for r in ok]),
+        "ttfb_ms": _percentiles([r["ttfb_s"] for r in ok if r["ttfb_s"] is not None]),
+        "server_rss": rss,
+        "openai": None,
+        "plan_cache": server_cache,
+    }
+    if fake_stats is not None:
+        per = lambda k: round(fake_stats[k] / n, 2) if n else None
+        result["openai"] = {**fake_stats, "chat_per_request": per("chat_requests"),
+                            "embedding_requests_per_request": per("embedding_requests"),
+                            "completion_tokens_per_request": per("completion_tokens")}
+
+    lat = result["latency_ms"]
+    print(f"[load] {n} requests ({len(ok)} ok) in {wall:.1f}s → {result['rps']} req/s at concurrency {args.concurrency}")
+    print(f"[load] latency ms p50 {lat['p50']}  p95 {lat['p95']}  p99 {lat['p99']}  max {lat['max']}")
+    print(f"[load] server RSS MB start {rss['start_mb']}  peak {rss['peak_mb']}  end {rss['end_mb']}")
+    if result["openai"]:
+        print(f"[load] OpenAI per request: {result['openai']['chat_per_request']} chat, "
+              f"{result['openai']['embedding_requests_per_request']} embedding calls")
+    if statuses.keys() - {"200"}:
+        print(f"[load] statuses: {statuses}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result) + "\n")
+    print(f"[load] result appended to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# tests/conftest.py
+import hashlib, json
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.ingest import build_index
+from app.rag import recipes
+from app.rag.embedding_store import CachedEmbeddings, EmbeddingStore
+from app.rag.recipes import RecipeCatalog
+from app.rag.vectorstore import open_vector_store
+
+
+def _recipe(name, meal, protein, diet):
+    return {"name": name, "meal": [meal], "protein": [protein], "grain": ["brown rice"], "veg": ["spinach"],
+            "fat": ["olive oil"], "seasonings": ["garlic"], "cuisine": "thai", "diet": diet,
+            "approx_kcal": 500, "macros": {"protein_g": 30, "carbs_g": 50, "fat_g": 15}}
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    path = tmp_path / "recipes.json"
+    path.write_text(json.dumps([
+        _recipe("Tofu Scramble", "breakfast", "tofu", ["vegan", "vegetarian"]),
+        _recipe("Tofu Bowl", "lunch", "tofu", ["vegan", "vegetarian"]),
+        _recipe("Tofu Curry", "dinner", "tofu", ["vegan", "vegetarian"]),
+    ]))
+    cat = RecipeCatalog(str(path))
+    monkeypatch.setattr(recipes, "catalog", cat)
+    return cat
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic 8-d vectors derived from sha1(text); records every batch it is asked to embed."""
+
+    def __init__(self) -> None:
+        self.batches = []
+
+    @staticmethod
+    def _vec(text):
+        return [b / 255.0 for b in hashlib.sha1(text.encode("utf-8")).digest()[:8]]
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [self._vec(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vec(text)
+
+
+@pytest.fixture
+def ingest_env(tmp_path, monkeypatch):
+    """build_index over tmp_path/data: numpy backend, a fresh embedding store and FakeEmbeddings, no network."""
+    data = tmp_path / "data"
+    data.mkdir()
+    embedder = FakeEmbeddings()
+    store = EmbeddingStore(str(tmp_path / "embeddings.sqlite3"))
+    monkeypatch.setattr(build_index, "DATA_DIR", data)
+    monkeypatch.setattr(build_index, "HTTP_CACHE_DIR", str(tmp_path / "http_cache"))
+    monkeypatch.setattr(build_index, "URL_FETCH_PER_HOST_RPS", 0)
+    monkeypatch.setattr(build_index, "VECTOR_BACKEND", "numpy")
+    monkeypatch.setattr(build_index, "open_vector_store",
+                        lambda embedding, persist_dir: open_vector_store(embedding, "numpy", persist_dir))
+    monkeypatch.setattr(build_index, "get_embeddings", lambda model, **kw: CachedEmbeddings(embedder, store, model))
+    monkeypatch.setattr(build_index, "embedding_store", store)
+    monkeypatch.setattr(build_index, "_token_counter", lambda: lambda t: len(t) // 4 + 1)
+    return SimpleNamespace(data=data, index=str(tmp_path / "index"), embedder=embedder, store=store)
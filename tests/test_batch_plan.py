@@ -0,0 +1,50 @@
+# tests/test_batch_plan.py
+import asyncio
+
+from app.rag.cache import plan_cache
+from app.rag.pipeline import RagPlanner
+
+
+class _NoOpenAI(RagPlanner):
+    """RagPlanner with the index and both LLM calls replaced by fixed answers."""
+
+    def __init__(self) -> None:
+        self.lexical = None
+
+    def _embed_enabled(self) -> bool:
+        return False
+
+    def _search(self, query, vec, k, first=None):
+        return []
+
+    async def asummarize_evidence(self, goal, snippets):
+        return ""
+
+    async def agenerate(self, goal, evidence):
+        return {"plan": {"days": [{"day": f"Day {i}", "meals": {}, "workout": "walk"} for i in (1, 2, 3)]}}
+
+
+class _Store:
+    def candidates_many(self, vecs, n, where=None):
+        return [[] for _ in vecs]
+
+
+def test_batch_reports_unsatisfiable_exclusions_per_request(catalog):
+    plan_cache.clear()
+    planner = _NoOpenAI()
+    planner.store = _Store()
+    items = [
+        ("3-day plan | Profile: Diet no tofu", {"restrictions": "no tofu"}),
+        ("3-day plan", {"restrictions": None}),
+        ("3-day plan | Profile: Diet no tofu", {"restrictions": "no tofu"}),
+    ]
+
+    async def collect():
+        return [event async for event in planner.abatch_plan(items)]
+
+    events = {e["index"]: e for e in asyncio.run(collect())}
+    assert sorted(events) == [0, 1, 2]
+    assert events[0]["type"] == events[2]["type"] == "error"
+    assert "no recipes satisfy" in events[0]["detail"].lower()
+    assert events[1]["type"] == "plan"
+    assert events[1]["plan"]["days"][0]["meals"]["lunch"]["name"] == "Tofu Bowl"
@@ -0,0 +1,23 @@
+# tests/test_cache.py
+from app.rag.cache import PlanCache
+
+
+def test_exact_hits_require_the_same_restrictions():
+    cache = PlanCache(threshold=0.9)
+    cache.put("3-day  Plan", "No Tofu", {"out": {"n": 1}})
+    assert cache.get_exact("3-day plan", "no tofu") == {"out": {"n": 1}}
+    assert cache.get_exact("3-day plan", None) is None
+    assert cache.get_exact("3-day plan", "vegan") is None
+
+    cache.put("3-day plan", None, {"out": {"n": 2}})
+    assert cache.get_exact("3-day plan", "no tofu") == {"out": {"n": 1}}
+    assert cache.get_exact("3-day plan", "") == {"out": {"n": 2}}
+
+
+def test_semantic_misses_are_counted():
+    cache = PlanCache(threshold=0.9)
+    assert cache.get_similar([1.0, 0.0], None) is None  # empty bucket
+    cache.put("plan a", None, {"out": {}}, vec=[1.0, 0.0])
+    assert cache.get_similar([0.0, 1.0], None) is None  # below threshold
+    assert cache.get_similar([1.0, 0.1], None) == {"out": {}}
+    assert (cache.semantic.hits, cache.semantic.misses) == (1, 2)
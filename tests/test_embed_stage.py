@@ -0,0 +1,69 @@
+# tests/test_embed_stage.py
+import pytest
+from langchain_core.documents import Document
+
+from app.ingest import build_index
+from app.ingest.build_index import _embed_with_backoff, embed_and_upsert
+from app.ingest.streaming import iter_batches
+from app.rag.embedding_store import CachedEmbeddings
+from app.rag.vectorstore import open_vector_store
+
+
+class _Transient(Exception):
+    status_code = 429
+
+
+def test_iter_batches_honours_item_and_token_limits():
+    texts = ["aaaa", "bb", "c", "dddddd", "eee", "f", "g", "h"]
+    batches = list(iter_batches(texts, lambda t: t, 3, 8, len))
+    # cut by tokens (7 + 6 > 8, 6 + 3 > 8), then by count (3 items)
+    assert batches == [["aaaa", "bb", "c"], ["dddddd"], ["eee", "f", "g"], ["h"]]
+    # a single item over the token limit still goes out, on its own
+    assert list(iter_batches(["x" * 20, "y"], lambda t: t, 3, 8, len)) == [["x" * 20], ["y"]]
+
+
+def test_backoff_retries_transient_errors(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(build_index.time, "sleep", sleeps.append)
+    calls = []
+
+    def embed(texts):
+        calls.append(texts)
+        if len(calls) < 3:
+            raise _Transient("rate limited")
+        return [[1.0] for _ in texts]
+
+    assert _embed_with_backoff(embed, ["a", "b"], max_retries=3) == [[1.0], [1.0]]
+    assert len(calls) == 3
+    assert 1.0 <= sleeps[0] < 2.0 <= sleeps[1] < 4.0  # jittered exponential backoff
+
+    def bad_input(texts):
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        _embed_with_backoff(bad_input, ["a"])
+    assert len(sleeps) == 2
+
+
+def test_rerun_after_failure_embeds_only_what_is_missing(ingest_env, tmp_path):
+    cached = CachedEmbeddings(ingest_env.embedder, ingest_env.store, "test-model")
+    chunks = [(f"id{i}", Document(page_content=f"chunk number {i}", metadata={"source": "s"})) for i in range(10)]
+    calls = []
+
+    def crash_on_third(texts):
+        calls.append(texts)
+        if len(calls) == 3:
+            raise RuntimeError("process killed")
+        return cached.embed_documents(texts)
+
+    store = open_vector_store(None, "numpy", str(tmp_path / "index"))
+    with pytest.raises(RuntimeError):
+        embed_and_upsert(iter(chunks), store, crash_on_third, batch_size=2, concurrency=1, count_tokens=len)
+    done = [t for batch in ingest_env.embedder.batches for t in batch]
+    assert len(done) == 4
+
+    ingest_env.embedder.batches.clear()
+    assert embed_and_upsert(iter(chunks), store, cached.embed_documents, batch_size=2, concurrency=1, count_tokens=len) == 10
+    redone = [t for batch in ingest_env.embedder.batches for t in batch]
+    assert sorted(redone) == sorted(c.page_content for _, c in chunks[4:])
+    assert store.count() == 10
@@ -0,0 +1,125 @@
+# tests/test_fetch.py
+import json, os, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.ingest import build_index
+from app.ingest.fetch import UrlFetcher
+from app.rag.vectorstore import open_vector_store
+
+ARTICLE = " ".join([
+    "Strength training twice a week helps adults keep muscle mass and bone density as they age.",
+    "Combine it with regular walking, enough sleep and a diet rich in vegetables, legumes and whole grains.",
+    "Start with light loads, focus on good form, and increase the weight slowly over several weeks.",
+])
+
+
+class _Site:
+    """Pages served on localhost: path → {"status", "body", "etag", "last_modified"}; logs every request."""
+
+    def __init__(self) -> None:
+        self.pages = {}
+        self.log = []  # (path, monotonic arrival time, request headers)
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site.log.append((self.path, time.monotonic(), dict(self.headers)))
+                page = site.pages.get(self.path, {"status": 404})
+                etag, modified = page.get("etag"), page.get("last_modified")
+                if (etag and self.headers.get("If-None-Match") == etag) or (
+                        modified and self.headers.get("If-Modified-Since") == modified):
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                body = page.get("body", "").encode("utf-8")
+                self.send_response(page["status"])
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                if etag:
+                    self.send_header("ETag", etag)
+                if modified:
+                    self.send_header("Last-Modified", modified)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+
+    def hits(self, path):
+        return [entry for entry in self.log if entry[0] == path]
+
+
+@pytest.fixture
+def site():
+    s = _Site()
+    thread = threading.Thread(target=s.server.serve_forever, daemon=True)
+    thread.start()
+    yield s
+    s.server.shutdown()
+    s.server.server_close()
+
+
+def _html(title, text=ARTICLE):
+    return f"<html><body><h1>{title}</h1><p>{text}</p><p>{text}</p></body></html>"
+
+
+@pytest.mark.parametrize("validator", [{"etag": '"v1"'}, {"last_modified": "Wed, 01 Oct 2025 08:00:00 GMT"}])
+def test_not_modified_reuses_cached_text(site, tmp_path, validator):
+    site.pages["/guide"] = {"status": 200, "body": _html("Guide"), **validator}
+    parsed = []
+    fetcher = UrlFetcher(parse=lambda html: parsed.append(html) or html.upper(), cache_dir=str(tmp_path), per_host_rps=0)
+
+    first, text1 = fetcher.fetch(site.base + "/guide")
+    second, text2 = fetcher.fetch(site.base + "/guide")
+
+    assert (first["status"], first["from_cache"]) == (200, False)
+    assert (second["status"], second["from_cache"], second["bytes"]) == (304, True, 0)
+    assert text1 == text2 == _html("Guide").upper()
+    assert len(parsed) == 1
+    sent = site.hits("/guide")[1][2]
+    assert sent.get("If-None-Match") == validator.get("etag")
+    assert sent.get("If-Modified-Since") == validator.get("last_modified")
+
+
+def test_per_host_rate_limit_spaces_requests(site):
+    for i in range(4):
+        site.pages[f"/p{i}"] = {"status": 200, "body": _html(f"Page {i}")}
+    fetcher = UrlFetcher(workers=4, per_host_rps=10)
+
+    results = list(fetcher.iter_fetch(f"{site.base}/p{i}" for i in range(4)))
+
+    assert [r["status"] for r, _ in results] == [200] * 4
+    arrivals = sorted(t for _, t, _ in site.log)
+    gaps = [b - a for a, b in zip(arrivals, arrivals[1:])]
+    assert min(gaps) >= 0.08  # 10 rps → one request per 100 ms, with some clock slack
+
+
+def test_unfetched_listed_url_keeps_its_chunks(site, ingest_env):
+    site.pages["/a"] = {"status": 200, "body": _html("Lifting basics")}
+    site.pages["/b"] = {"status": 200, "body": _html("Walking basics", ARTICLE.replace("Strength", "Endurance"))}
+    (ingest_env.data / "urls.txt").write_text(f"{site.base}/a\n{site.base}/b\n")
+
+    build_index.build_index(persist_dir=ingest_env.index)
+    with open(os.path.join(ingest_env.index, build_index.MANIFEST_FILE)) as f:
+        before = json.load(f)["sources"]
+    b_ids = before[f"{site.base}/b"]["chunk_ids"]
+    assert b_ids
+
+    site.pages["/b"] = {"status": 500, "body": "upstream error"}
+    build_index.build_index(persist_dir=ingest_env.index)
+    with open(os.path.join(ingest_env.index, build_index.MANIFEST_FILE)) as f:
+        after = json.load(f)["sources"]
+
+    assert after[f"{site.base}/b"] == before[f"{site.base}/b"]
+    stored, _, _ = open_vector_store(None, "numpy", ingest_env.index).get_all()
+    assert set(b_ids) <= set(stored)
+
+    (ingest_env.data / "urls.txt").write_text(f"{site.base}/a\n")
+    build_index.build_index(persist_dir=ingest_env.index)
+    stored, _, _ = open_vector_store(None, "numpy", ingest_env.index).get_all()
+    assert not set(b_ids) & set(stored)
@@ -0,0 +1,24 @@
+# tests/test_loaders.py
+from app.ingest.loaders import iter_folder, list_corpus_files, load_files
+
+TEXT = ("Adults should aim for about thirty minutes of moderate activity on most days of the week, "
+        "spread across several sessions.")
+
+
+def test_same_named_files_in_subfolders_are_distinct_sources(tmp_path):
+    for sub, extra in (("a", "Walking counts."), ("b", "Cycling counts too.")):
+        (tmp_path / sub).mkdir()
+        (tmp_path / sub / "notes.txt").write_text(f"{TEXT} {extra}\n")
+    docs = list(iter_folder(str(tmp_path), workers=1))
+    assert [d.metadata["source"] for d in docs] == ["a/notes.txt", "b/notes.txt"]
+
+
+def test_load_files_is_deterministic_and_dedups_pages(tmp_path):
+    for i in range(4):
+        (tmp_path / f"doc{i}.txt").write_text(f"{TEXT} Document number {i} of the set.\n")
+    paths = list_corpus_files(str(tmp_path))
+    inline = [(p, [d.page_content for d in docs]) for p, docs in load_files(paths, 1, base_dir=str(tmp_path))]
+    pooled = [(p, [d.page_content for d in docs]) for p, docs in load_files(paths, 2, base_dir=str(tmp_path))]
+    assert inline == pooled
+    assert [p for p, _ in inline] == paths
+    assert all(len(pages) == 1 for _, pages in inline)
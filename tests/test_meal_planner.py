@@ -0,0 +1,18 @@
+# tests/test_meal_planner.py
+import pytest
+
+from app.rag.meal_planner import parse_targets
+
+
+@pytest.mark.parametrize("goal, kcal_max", [
+    ("3-day plan under 2200 kcal", 2200),
+    ("3-day plan under 2,200 kcal", 2200),
+    ("3-day plan under 2200,5 kcal", 2200.5),
+    ("3-day plan under 2200.5 kcal", 2200.5),
+])
+def test_kcal_numbers_with_thousands_separator_or_decimal_comma(goal, kcal_max):
+    assert parse_targets(goal)["kcal_max"] == kcal_max
+
+
+def test_kcal_range_with_thousands_separators():
+    assert parse_targets("1,800-2,000 calories, 150g protein") == {"kcal_min": 1800, "kcal_max": 2000, "protein_min": 150}
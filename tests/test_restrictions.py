@@ -0,0 +1,22 @@
+# tests/test_restrictions.py
+import pytest
+
+from app.rag.recipes import plan_meals
+from app.rag.restrictions import NoMatchingRecipes, resolve
+
+
+def test_exclusions_matching_every_recipe_are_not_relaxed(catalog):
+    allowed, report = resolve(catalog, "vegan, no tofu")
+    assert not allowed.any()
+    assert report["matched"] == 0
+    assert report["excluded"] == ["tofu"]
+    with pytest.raises(NoMatchingRecipes):
+        plan_meals(days=3, dietary_restrictions="vegan, no tofu")
+
+
+def test_unmatched_diet_tags_fall_back_to_exclusions(catalog):
+    allowed, report = resolve(catalog, "keto, no shrimp")
+    assert allowed.all()
+    assert report["fallback"]
+    days, _ = plan_meals(days=3, dietary_restrictions="keto, no shrimp")
+    assert len(days) == 3